@@ -1,10 +1,29 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import csv
 import re
 from collections import defaultdict
 
+import compressed_io
+import csv_chunks
+import normalization_cache
+import profiling
+import vector_match
+from carrier_store import CarrierStore
+from gazetteer import GAZETTEER_PATH, Gazetteer, GridIndex
+from multipattern import AhoCorasick
+
+ARCHIVO_CARRIERS = '/home/user/carriers-fr8/carriers/Carrires.csv'
+ARCHIVO_SALIDA = '/home/user/carriers-fr8/carriers_12_rutas.csv'
+
+# Campos de cada carrier y su columna en el CSV
+CAMPOS_CARRIER = ('id', 'tipo', 'nombre', 'email', 'telefono', 'ciudad', 'estado', 'pais', 'origen_data')
+COLUMNAS_CSV = (0, 1, 2, 4, 5, 7, 8, 9, 10)
+# Campos con pocos valores distintos, codificados por diccionario en el almacén
+CAMPOS_CODIFICADOS = ('tipo', 'ciudad', 'estado', 'pais', 'origen_data')
+
 # Definición de las rutas con sus estados de origen y destino
 rutas = {
     "RUTA 1": {
@@ -123,6 +142,7 @@ rutas = {
     }
 }
 
+@normalization_cache.cached('normalizar_texto')
 def normalizar_texto(texto):
     """Normaliza texto para comparación: lowercase, sin acentos, sin espacios extra"""
     if not texto or texto == '':
@@ -194,95 +214,370 @@ def analizar_carrier(carrier_data, ruta_info):
 
     return coincidencias
 
-# Leer el archivo CSV de carriers
-carriers_por_ruta = defaultdict(list)
-todos_carriers = []
+# Roles de coincidencia en el orden en que analizar_carrier los reporta:
+# (rol, campo de estados, campo de ciudades, campo de país)
+# Con --radio-km, una ruta puede fijar el radio de un rol con '<campo de estados>_radio_km'
+ROLES = (
+    ('ORIGEN', 'origen', 'origen_ciudades', 'pais_origen'),
+    ('DESTINO', 'destino', 'destino_ciudades', 'pais_destino'),
+    ('CRUCE', 'cruce', 'cruce_ciudades', None),
+)
+
+class TablaAlias:
+    """Alias normalizados de estados o ciudades con índice de subcadenas.
+
+    Resuelve la coincidencia en ambos sentidos de estado_coincide/ciudad_coincide:
+    'texto in alias' se responde con el índice de subcadenas y 'alias in texto'
+    con un autómata de Aho-Corasick sobre todos los alias, en una pasada lineal
+    sobre el texto. El resultado se memoriza por texto normalizado.
+    """
+
+    def __init__(self):
+        self.automata = AhoCorasick()       # alias normalizado → roles
+        self.subcadenas = defaultdict(set)  # subcadena de algún alias → roles
+        self.memo = {}
+
+    def agregar(self, alias, rol_id):
+        alias_norm = normalizar_texto(alias)
+        self.automata.add(alias_norm, rol_id)
+        for i in range(len(alias_norm) + 1):
+            for j in range(i, len(alias_norm) + 1):
+                self.subcadenas[alias_norm[i:j]].add(rol_id)
+
+    def roles(self, texto_norm):
+        """Roles con algún alias que contiene a texto_norm o está contenido en él"""
+        encontrados = self.memo.get(texto_norm)
+        if encontrados is None:
+            encontrados = self.automata.search(texto_norm)
+            encontrados.update(self.subcadenas.get(texto_norm, ()))
+            encontrados = frozenset(encontrados)
+            self.memo[texto_norm] = encontrados
+        return encontrados
+
+class IndiceRutas:
+    """Tabla de rutas compilada una sola vez: token normalizado → (ruta, rol).
+
+    analizar() devuelve lo mismo que aplicar analizar_carrier a cada ruta, pero con
+    una normalización por campo y unas pocas consultas a diccionarios por carrier.
 
-print("Leyendo archivo de carriers...")
+    Con radio_km, además, las ciudades de cada rol se ubican en el gazetteer y un
+    carrier a menos de ese radio coincide con el rol (tipo '<ROL>_RADIO') aunque
+    su estado no coincida; la distancia al punto más cercano se devuelve aparte.
+    """
 
-with open('/home/user/carriers-fr8/carriers/Carrires.csv', 'r', encoding='utf-8') as f:
-    # Probar si la primera línea es un header
-    primera_linea = f.readline()
-    f.seek(0)
+    def __init__(self, rutas, radio_km=None, gazetteer_path=GAZETTEER_PATH):
+        self.roles = []  # rol_id → (ruta_nombre, rol), en orden de rutas y de ROLES
+        self.estados = TablaAlias()
+        self.ciudades = TablaAlias()
+        self.memo = {}
 
-    # Si no tiene header claro, no saltamos línea
-    reader = csv.reader(f)
+        self.gazetteer = None
+        self.geo = None
+        self.sin_coordenadas = []  # ciudades de rutas que no están en el gazetteer
+        self.memo_radio = {}
+        if radio_km is not None:
+            self.gazetteer = Gazetteer(gazetteer_path)
+            self.geo = GridIndex(cell_km=radio_km)
 
-    for row_num, row in enumerate(reader, 1):
+        for ruta_nombre, ruta_info in rutas.items():
+            for rol, campo_estados, campo_ciudades, campo_pais in ROLES:
+                if campo_estados not in ruta_info:
+                    continue
+                rol_id = len(self.roles)
+                self.roles.append((ruta_nombre, rol))
+                for estado in ruta_info[campo_estados]:
+                    self.estados.agregar(estado, rol_id)
+                for ciudad in ruta_info.get(campo_ciudades, []):
+                    self.ciudades.agregar(ciudad, rol_id)
+                if self.geo is not None:
+                    radio = ruta_info.get(campo_estados + '_radio_km', radio_km)
+                    self.agregar_puntos(rol_id, ruta_info.get(campo_ciudades, []),
+                                        ruta_info.get(campo_pais) if campo_pais else None, radio)
+
+    def agregar_puntos(self, rol_id, ciudades, paises, radio_km):
+        """Ubica las ciudades de un rol en el gazetteer y las agrega al índice espacial"""
+        if not isinstance(paises, list):
+            paises = [paises]
+        for ciudad in ciudades:
+            for pais in paises:
+                ubicacion = self.gazetteer.resolve(ciudad, pais)
+                if ubicacion is not None:
+                    self.geo.add(ubicacion[1], ubicacion[2], radio_km, rol_id)
+                    break
+            else:
+                ruta_nombre, rol = self.roles[rol_id]
+                self.sin_coordenadas.append(f"{ciudad} ({ruta_nombre} {rol})")
+
+    def roles_cercanos(self, estado, ciudad, pais):
+        """{rol_id: distancia_km} de los roles a cuyo radio llega el carrier"""
+        ubicacion = self.gazetteer.locate(ciudad, pais, estado)
+        if ubicacion is None:
+            return {}
+        cercanos = self.memo_radio.get(ubicacion)
+        if cercanos is None:
+            cercanos = {}
+            for distancia, rol_id in self.geo.within(ubicacion[1], ubicacion[2]):
+                cercanos.setdefault(rol_id, distancia)
+            self.memo_radio[ubicacion] = cercanos
+        return cercanos
+
+    def analizar(self, carrier_data):
+        """
+        Devuelve [(ruta_nombre, tipo_coincidencia, distancia_km)] para las rutas
+        que coinciden (distancia_km es None salvo en coincidencias por radio)
+        """
+        return self.analizar_ubicacion(carrier_data.get('estado', ''), carrier_data.get('ciudad', ''),
+                                       carrier_data.get('pais', ''))
+
+    def analizar_ubicacion(self, estado, ciudad, pais=''):
+        """Igual que analizar() a partir del estado, la ciudad y el país del carrier"""
+        cercanos = self.roles_cercanos(estado, ciudad, pais) if self.geo is not None else {}
+        roles_estado = frozenset()
+        if estado:
+            roles_estado = self.estados.roles(normalizar_texto(estado))
+        if not roles_estado and not cercanos:
+            return ()
+
+        # La ciudad solo cuenta en los roles cuyo estado ya coincidió
+        roles_ciudad = frozenset()
+        if ciudad and roles_estado:
+            ciudad_norm = normalizar_texto(ciudad)
+            if ciudad_norm != '':
+                roles_ciudad = self.ciudades.roles(ciudad_norm) & roles_estado
+
+        clave = (roles_estado, roles_ciudad, tuple(sorted(cercanos.items())))
+        resultado = self.memo.get(clave)
+        if resultado is None:
+            por_ruta = {}
+            distancias = {}
+            for rol_id in sorted(roles_estado | cercanos.keys()):
+                ruta_nombre, rol = self.roles[rol_id]
+                tipos = por_ruta.setdefault(ruta_nombre, [])
+                if rol_id in roles_estado:
+                    tipos.append(rol)
+                    if rol_id in roles_ciudad:
+                        tipos.append(rol + '_CIUDAD')
+                if rol_id in cercanos:
+                    tipos.append(rol + '_RADIO')
+                    distancias[ruta_nombre] = min(cercanos[rol_id], distancias.get(ruta_nombre, cercanos[rol_id]))
+            resultado = tuple((ruta_nombre, ', '.join(tipos), distancias.get(ruta_nombre))
+                              for ruta_nombre, tipos in por_ruta.items())
+            self.memo[clave] = resultado
+        return resultado
+
+def carrier_desde_fila(row):
+    """Extrae los valores de CAMPOS_CARRIER de un registro del CSV de carriers"""
+    return tuple(row[i] if len(row) > i else '' for i in COLUMNAS_CSV)
+
+def analizar_filas(filas, indice_rutas):
+    """
+    Genera (registro, [(ruta_nombre, tipo_coincidencia, distancia_km)]) por cada
+    registro válido; carrier_desde_fila queda para los que coinciden
+    """
+    for row in filas:
         if len(row) < 10:
+            profiling.count('rows_skipped')
             continue
+        yield row, indice_rutas.analizar_ubicacion(row[8], row[7], row[9])
 
-        carrier_data = {
-            'id': row[0] if len(row) > 0 else '',
-            'tipo': row[1] if len(row) > 1 else '',
-            'nombre': row[2] if len(row) > 2 else '',
-            'email': row[4] if len(row) > 4 else '',
-            'telefono': row[5] if len(row) > 5 else '',
-            'ciudad': row[7] if len(row) > 7 else '',
-            'estado': row[8] if len(row) > 8 else '',
-            'pais': row[9] if len(row) > 9 else '',
-            'origen_data': row[10] if len(row) > 10 else ''
-        }
-
-        todos_carriers.append(carrier_data)
-
-        # Analizar contra cada ruta
-        for ruta_nombre, ruta_info in rutas.items():
-            coincidencias = analizar_carrier(carrier_data, ruta_info)
+def agregar_coincidencias(carriers_por_ruta, indice, coincidencias):
+    """Registra la fila 'indice' del almacén en cada ruta con la que coincide"""
+    for ruta_nombre, tipo_coincidencia, distancia in coincidencias:
+        carriers_por_ruta[ruta_nombre].append((indice, tipo_coincidencia, distancia))
 
+# Índice de rutas de cada proceso worker (modo --workers)
+_indice_worker = None
+
+def iniciar_worker(cache_size, radio_km, gazetteer_path, perfil=False, cprofile_path=None):
+    """Inicializa un proceso worker: caché de normalización, índice de rutas y perfil"""
+    global _indice_worker
+    normalization_cache.configure(cache_size)
+    _indice_worker = IndiceRutas(rutas, radio_km, gazetteer_path)
+    if perfil:
+        # El volcado de cProfile lo escribe el proceso principal con lo que devuelve take()
+        profiling.enable(cprofile_path)
+
+def analizar_chunk(path, inicio, fin):
+    """Worker: analiza un rango de bytes del CSV y devuelve solo los carriers que coinciden"""
+    cache_antes = normalization_cache.stats()
+    leidos = 0
+    resultados = []
+    with csv_chunks.read_chunk(path, inicio, fin) as f:
+        filas = analizar_filas(profiling.iterate('parse', csv.reader(f)), _indice_worker)
+        for row, coincidencias in profiling.iterate('match', filas):
+            leidos += 1
             if coincidencias:
-                carriers_por_ruta[ruta_nombre].append({
-                    'carrier': carrier_data,
-                    'tipo_coincidencia': ', '.join(coincidencias),
-                    'descripcion_ruta': ruta_info['descripcion']
-                })
-
-print(f"Total de carriers leídos: {len(todos_carriers)}")
-print("\nGenerando archivo de resultados...")
-
-# Generar archivo CSV con resultados
-with open('/home/user/carriers-fr8/carriers_12_rutas.csv', 'w', encoding='utf-8', newline='') as f:
-    writer = csv.writer(f)
-
-    # Header
-    writer.writerow([
-        'RUTA',
-        'DESCRIPCION_RUTA',
-        'CARRIER_ID',
-        'CARRIER_NOMBRE',
-        'CIUDAD',
-        'ESTADO',
-        'PAIS',
-        'EMAIL',
-        'TELEFONO',
-        'TIPO_COINCIDENCIA',
-        'ORIGEN_DATA'
-    ])
-
-    # Escribir resultados por ruta
+                resultados.append((carrier_desde_fila(row), coincidencias))
+    return leidos, resultados, normalization_cache.stats_since(cache_antes), profiling.take()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mapea carriers con las 12 rutas")
+    parser.add_argument('--input', default=ARCHIVO_CARRIERS, help="archivo CSV de carriers (puede estar comprimido con gzip, bz2 o xz)")
+    parser.add_argument('--output', default=ARCHIVO_SALIDA,
+                        help="archivo CSV de resultados (.gz, .bz2 o .xz para comprimirlo)")
+    parser.add_argument('--cache-size', type=int, default=normalization_cache.DEFAULT_MAXSIZE,
+                        help="entradas máximas de la caché de normalización")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos para leer y analizar el CSV por chunks")
+    parser.add_argument('--radio-km', type=float, default=None,
+                        help="aceptar carriers a esta distancia de las ciudades de origen, destino o cruce")
+    parser.add_argument('--gazetteer', default=GAZETTEER_PATH,
+                        help="CSV de coordenadas de ciudades para --radio-km")
+    parser.add_argument('--engine', choices=('python', 'numpy'), default='python',
+                        help="motor de coincidencias: fila por fila en Python o vectorizado con NumPy "
+                             "sobre las columnas codificadas (mismo resultado)")
+    parser.add_argument('--profile', default=None, metavar='JSON',
+                        help="guardar tiempos por etapa y contadores en este archivo JSON")
+    parser.add_argument('--profile-cprofile', default=None, metavar='PSTATS',
+                        help="(con --profile) volcado de cProfile de la etapa de coincidencias "
+                             "(con --workers, sumando la de todos los procesos worker)")
+    args = parser.parse_args(argv)
+    if args.radio_km is not None and args.radio_km <= 0:
+        parser.error("--radio-km debe ser mayor que 0")
+    if args.engine == 'numpy':
+        if not vector_match.available():
+            parser.error("--engine numpy requiere NumPy (pip install numpy)")
+        incompatibles = [opcion for opcion, activa in (('--workers', args.workers > 1),
+                                                       ('--radio-km', args.radio_km is not None)) if activa]
+        if incompatibles:
+            parser.error(f"--engine numpy no se puede combinar con {', '.join(incompatibles)}")
+    return args
+
+def registrar_contadores(carriers_por_ruta, total_leidos):
+    """Contadores de filas y de coincidencias por ruta y tipo para --profile"""
+    profiling.set_counter('rows_valid', total_leidos)
+    profiling.set_counter('rows_read', total_leidos + profiling.get_counter('rows_skipped'))
+    for ruta_nombre in sorted(carriers_por_ruta):
+        coincidencias = carriers_por_ruta[ruta_nombre]
+        profiling.set_counter(f"matches.{ruta_nombre}", len(coincidencias))
+        for tipo_coincidencia in (t for _, tipos, _ in coincidencias for t in tipos.split(', ')):
+            profiling.count(f"matches.{ruta_nombre}.{tipo_coincidencia}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1 and compressed_io.input_compression(args.input):
+        # Los chunks son rangos de bytes: un archivo comprimido se lee en un solo proceso
+        print("Entrada comprimida: se lee en un solo proceso (la descompresión corre en un hilo aparte)")
+        args.workers = 1
+    normalization_cache.configure(args.cache_size)
+    if args.profile:
+        profiling.enable(args.profile_cprofile)
+
+    # Compilar las rutas una sola vez antes de leer el archivo
+    with profiling.stage('setup'):
+        indice_rutas = IndiceRutas(rutas, args.radio_km, args.gazetteer)
+    if indice_rutas.sin_coordenadas:
+        print(f"Sin coordenadas en el gazetteer: {', '.join(indice_rutas.sin_coordenadas)}")
+
+    # Leer el archivo CSV de carriers
+    carriers_por_ruta = defaultdict(list)
+    todos_carriers = CarrierStore(CAMPOS_CARRIER, encoded=CAMPOS_CODIFICADOS)
+    total_leidos = 0
+
+    print("Leyendo archivo de carriers...")
+
+    if args.workers > 1:
+        # Chunks en paralelo; se combinan en orden del archivo (sin header: se analiza todo).
+        # Solo los carriers que coinciden llegan al almacén.
+        chunks = csv_chunks.map_chunks(args.input, analizar_chunk, args.workers,
+                                       initializer=iniciar_worker,
+                                       initargs=(args.cache_size, args.radio_km, args.gazetteer,
+                                                 bool(args.profile), args.profile_cprofile))
+        for leidos, resultados, cache_stats, perfil in profiling.iterate('workers', chunks):
+            total_leidos += leidos
+            normalization_cache.add_worker_stats(cache_stats)
+            profiling.merge(perfil)
+            for valores, coincidencias in resultados:
+                agregar_coincidencias(carriers_por_ruta, todos_carriers.append(valores), coincidencias)
+    elif args.engine == 'numpy':
+        # Primero se cargan todas las filas; luego una matriz de roles para todas a la vez
+        with compressed_io.open_input(args.input) as f, profiling.stage('store'):
+            for row in profiling.iterate('parse', csv.reader(f)):
+                if len(row) < 10:
+                    profiling.count('rows_skipped')
+                    continue
+                todos_carriers.append(carrier_desde_fila(row))
+        with profiling.stage('match'):
+            carriers_por_ruta.update(vector_match.match_store(indice_rutas, todos_carriers.column('estado'),
+                                                              todos_carriers.column('ciudad'), normalizar_texto))
+        total_leidos = len(todos_carriers)
+    else:
+        with compressed_io.open_input(args.input) as f:
+            # Si no tiene header claro, no saltamos línea
+            reader = csv.reader(f)
+
+            # Analizar contra todas las rutas a través del índice; solo los que coinciden llegan al almacén
+            with profiling.stage('store'):
+                filas = analizar_filas(profiling.iterate('parse', reader), indice_rutas)
+                for row, coincidencias in profiling.iterate('match', filas):
+                    total_leidos += 1
+                    if coincidencias:
+                        agregar_coincidencias(carriers_por_ruta, todos_carriers.append(carrier_desde_fila(row)),
+                                              coincidencias)
+
+    print(f"Total de carriers leídos: {total_leidos}")
+    print("\nGenerando archivo de resultados...")
+
+    # Generar archivo CSV con resultados
+    with profiling.stage('write'), compressed_io.open_output(args.output) as f:
+        writer = csv.writer(f)
+
+        # Header
+        header = [
+            'RUTA',
+            'DESCRIPCION_RUTA',
+            'CARRIER_ID',
+            'CARRIER_NOMBRE',
+            'CIUDAD',
+            'ESTADO',
+            'PAIS',
+            'EMAIL',
+            'TELEFONO',
+            'TIPO_COINCIDENCIA',
+            'ORIGEN_DATA'
+        ]
+        if indice_rutas.geo is not None:
+            header.append('DISTANCIA_KM')
+        writer.writerow(header)
+
+        # Escribir resultados por ruta
+        for ruta_nombre in sorted(rutas.keys()):
+            coincidencias = carriers_por_ruta.get(ruta_nombre, [])
+
+            print(f"\n{ruta_nombre}: {len(coincidencias)} carriers encontrados")
+
+            descripcion_ruta = rutas[ruta_nombre]['descripcion']
+            for indice, tipo_coincidencia, distancia in coincidencias:
+                carrier = todos_carriers.record(indice)
+                fila = [
+                    ruta_nombre,
+                    descripcion_ruta,
+                    carrier['id'],
+                    carrier['nombre'],
+                    carrier['ciudad'],
+                    carrier['estado'],
+                    carrier['pais'],
+                    carrier['email'],
+                    carrier['telefono'],
+                    tipo_coincidencia,
+                    carrier['origen_data']
+                ]
+                if indice_rutas.geo is not None:
+                    fila.append('' if distancia is None else f"{distancia:.1f}")
+                writer.writerow(fila)
+
+    print("\n✓ Archivo 'carriers_12_rutas.csv' generado exitosamente!")
+    print("\nResumen por ruta:")
     for ruta_nombre in sorted(rutas.keys()):
-        coincidencias = carriers_por_ruta.get(ruta_nombre, [])
-
-        print(f"\n{ruta_nombre}: {len(coincidencias)} carriers encontrados")
-
-        for match in coincidencias:
-            carrier = match['carrier']
-            writer.writerow([
-                ruta_nombre,
-                match['descripcion_ruta'],
-                carrier['id'],
-                carrier['nombre'],
-                carrier['ciudad'],
-                carrier['estado'],
-                carrier['pais'],
-                carrier['email'],
-                carrier['telefono'],
-                match['tipo_coincidencia'],
-                carrier['origen_data']
-            ])
-
-print("\n✓ Archivo 'carriers_12_rutas.csv' generado exitosamente!")
-print("\nResumen por ruta:")
-for ruta_nombre in sorted(rutas.keys()):
-    count = len(carriers_por_ruta.get(ruta_nombre, []))
-    print(f"  {ruta_nombre}: {count} carriers")
+        count = len(carriers_por_ruta.get(ruta_nombre, []))
+        print(f"  {ruta_nombre}: {count} carriers")
+
+    normalization_cache.print_stats()
+
+    if args.profile:
+        registrar_contadores(carriers_por_ruta, total_leidos)
+        profiling.write_report(args.profile, script='analyze_carriers', input=args.input,
+                               workers=args.workers, engine=args.engine)
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,64 @@
 Analiza carriers y los mapea con 12 rutas específicas
 """
 
+import argparse
+import contextlib
 import csv
-from collections import defaultdict
+import itertools
+import os
+import tempfile
+from collections import Counter, defaultdict, namedtuple
+
+import compressed_io
+import csv_chunks
+import diff_results
+import incremental
+import lazy_csv
+import normalization_cache
+import profiling
+import sqlite_store
+from carrier_groups import CarrierGroups
+from carrier_store import CarrierStore, file_fingerprint, fingerprint_matches, load_store, save_store
+from external_sort import DEFAULT_RUN_SIZE, ExternalSorter
+from fuzzy_index import DEFAULT_THRESHOLD, TrigramIndex
+from gazetteer import GAZETTEER_PATH, Gazetteer, GridIndex
+from ranking import TopK, match_score
+
+ARCHIVO_CARRIERS = '/home/user/carriers-fr8/carriers/Carriers.csv'
+ARCHIVO_SALIDA = '/home/user/carriers-fr8/carriers_12_rutas.csv'
+
+# Columnas de Carriers.csv que se conservan en memoria y las codificadas por diccionario
+STORE_COLUMNS = ('BAN', 'COMPANY NAME', 'CITY', 'STATE', 'COUNTRY', 'EMAIL', 'PHONE #', 'DATA ORIGIN')
+STORE_ENCODED = ('CITY', 'STATE', 'COUNTRY', 'DATA ORIGIN')
+
+# Columnas que se decodifican al leer Carriers.csv para comparar contra las rutas;
+# el resto de la fila se decodifica solo si el carrier se usa (ver lazy_csv)
+MATCH_COLUMNS = ('COMPANY TYPE', 'CITY', 'STATE', 'COUNTRY')
+
+# Columnas del archivo de salida
+OUTPUT_FIELDNAMES = ['RUTA', 'DESCRIPCION_RUTA', 'TIPO_RUTA', 'BAN', 'CARRIER', 'CITY',
+                     'STATE', 'STATE_NORMALIZADO', 'COUNTRY', 'UBICACION_EN_RUTA',
+                     'EMAIL', 'PHONE', 'DATA_ORIGIN']
+
+# Backend SQLite (--sqlite): columnas normalizadas que se guardan junto a STORE_COLUMNS
+# e índices con los que se responde cada ubicación de RUTAS
+SQLITE_NORMALIZED = ('NORM_COUNTRY', 'NORM_STATE', 'NORM_CITY')
+SQLITE_INDEXES = (('NORM_COUNTRY', 'NORM_STATE'), ('NORM_COUNTRY', 'NORM_CITY'))
+
+# Columnas que el archivo agrupado (--grouped-output) reemplaza por la lista de valores
+# distintos del carrier en la ruta, y separador de esas listas
+GROUPED_COLUMNS = {'EMAIL': 'EMAILS', 'PHONE': 'PHONES', 'DATA_ORIGIN': 'DATA_ORIGINS'}
+GROUP_SEPARATOR = '; '
+
+# Columna que el modo --top agrega a la salida
+SCORE_FIELD = 'PUNTAJE'
+
+# Columna de salida que copia cada columna de STORE_COLUMNS (para el modo incremental)
+OUTPUT_STORE_FIELDS = ['BAN', 'CARRIER', 'CITY', 'STATE', 'COUNTRY', 'EMAIL', 'PHONE', 'DATA_ORIGIN']
 
 # Definición de las rutas con sus ubicaciones de origen y destino
+# (cruce_ciudades: ciudades de cruce con su estado y país, que solo cuentan como
+# coincidencia en el modo --top y exigen país, estado y ciudad)
 RUTAS = {
     "RUTA 1": {
         "descripcion": "Cuautitlán, EM → San Antonio, TX",
@@ -25,13 +79,15 @@ RUTAS = {
         "descripcion": "Pico Rivera, CA → Tlalnepantla, MX (cruce por McAllen y Laredo)",
         "tipo": "DV53, semanal",
         "origen": {"ciudad": "Pico Rivera", "estado": "California", "pais": "United States"},
-        "destino": {"ciudad": "Tlalnepantla", "estado": "Estado de México", "pais": "Mexico"}
+        "destino": {"ciudad": "Tlalnepantla", "estado": "Estado de México", "pais": "Mexico"},
+        "cruce_ciudades": {"ciudad": "McAllen|Laredo", "estado": "Texas", "pais": "United States"}
     },
     "RUTA 4": {
         "descripcion": "San Nicolás de los Garza, NL → El Paso, TX (cruce por Laredo)",
         "tipo": "DV53, semanal",
         "origen": {"ciudad": "San Nicolás de los Garza", "estado": "Nuevo León", "pais": "Mexico"},
-        "destino": {"ciudad": "El Paso", "estado": "Texas", "pais": "United States"}
+        "destino": {"ciudad": "El Paso", "estado": "Texas", "pais": "United States"},
+        "cruce_ciudades": {"ciudad": "Laredo", "estado": "Texas", "pais": "United States"}
     },
     "RUTA 5": {
         "descripcion": "Independence, MO → San Mateo Atenco, EDOMX",
@@ -79,201 +135,745 @@ RUTAS = {
         "descripcion": "Hidalgo del Parral, CHIH → Houston, TX (cruce por El Paso)",
         "tipo": "DV53, semanal",
         "origen": {"ciudad": "Hidalgo del Parral", "estado": "Chihuahua", "pais": "Mexico"},
-        "destino": {"ciudad": "Houston", "estado": "Texas", "pais": "United States"}
+        "destino": {"ciudad": "Houston", "estado": "Texas", "pais": "United States"},
+        "cruce_ciudades": {"ciudad": "El Paso", "estado": "Texas", "pais": "United States"}
     }
 }
 
-# Mapeo de abreviaciones y variaciones de estados
+# Nombres de estados y sus variaciones (valen en cualquier país)
 ESTADO_MAPPING = {
     # México
-    "EM": "Estado de México",
-    "EDOMX": "Estado de México",
-    "MX": "Estado de México",
     "Estado de México": "Estado de México",
-    "NL": "Nuevo León",
     "Nuevo León": "Nuevo León",
     "Nuevo Leon": "Nuevo León",  # Sin acento
-    "Newfoundland and Labrador": "Nuevo León",  # Parece ser un error en los datos
-    "MICH": "Michoacán",
-    "MC": "Michoacán",
     "Michoacán": "Michoacán",
     "Michoacan": "Michoacán",  # Sin acento
-    "QRO": "Querétaro",
-    "QE": "Querétaro",
     "Querétaro": "Querétaro",
     "Queretaro": "Querétaro",  # Sin acento
-    "COAH": "Coahuila",
     "Coahuila": "Coahuila",
-    "CHIH": "Chihuahua",
-    "CH": "Chihuahua",
     "Chihuahua": "Chihuahua",
-    "TL": "Tlaxcala",
     "Tlaxcala": "Tlaxcala",
-    "PU": "Puebla",
     "Puebla": "Puebla",
-    "TM": "Tamaulipas",
     "Tamaulipas": "Tamaulipas",
-    "BN": "Baja California",
     "Baja California": "Baja California",
-    "CL": "Colima",
     "Colima": "Colima",
 
     # Estados Unidos
-    "TX": "Texas",
     "Texas": "Texas",
-    "CA": "California",
     "California": "California",
-    "MO": "Missouri",
     "Missouri": "Missouri",
-    "MI": "Michigan",
     "Michigan": "Michigan",
-    "NY": "New York",
     "New York": "New York",
 
     # Canadá
-    "ON": "Ontario",
     "Ontario": "Ontario",
-    "QC": "Quebec",
     "Quebec": "Quebec",
 }
 
-def normalize_state(state):
-    """Normaliza el nombre del estado"""
+# Abreviaciones de estados por país (COUNTRY normalizado): el mismo código puede
+# ser otro estado en otro país ("MI" es Michoacán en México y Michigan en
+# Estados Unidos), así que solo se resuelven con el país del carrier
+CODIGOS_ESTADO = {
+    "Mexico": {
+        "EM": "Estado de México",
+        "EDOMX": "Estado de México",
+        "MX": "Estado de México",
+        "NL": "Nuevo León",
+        "Newfoundland and Labrador": "Nuevo León",  # Parece ser un error en los datos
+        "MICH": "Michoacán",
+        "MC": "Michoacán",
+        "MI": "Michoacán",
+        "QRO": "Querétaro",
+        "QE": "Querétaro",
+        "COAH": "Coahuila",
+        "CHIH": "Chihuahua",
+        "CH": "Chihuahua",
+        "TL": "Tlaxcala",
+        "PU": "Puebla",
+        "TM": "Tamaulipas",
+        "BN": "Baja California",
+        "CL": "Colima",
+    },
+    "United States": {
+        "TX": "Texas",
+        "CA": "California",
+        "MO": "Missouri",
+        "MI": "Michigan",
+        "NY": "New York",
+    },
+    "Canada": {
+        "ON": "Ontario",
+        "QC": "Quebec",
+    },
+}
+
+@normalization_cache.cached('normalize_state')
+def normalize_state(state, country=None):
+    """Normaliza el nombre del estado (las abreviaciones, según el país del carrier)"""
     if state is None or state == "" or state == "None":
         return None
     state = str(state).strip()
+    codigos = CODIGOS_ESTADO.get(normalize_country(country))
+    if codigos and state in codigos:
+        return codigos[state]
     return ESTADO_MAPPING.get(state, state)
 
+@normalization_cache.cached('normalize_city')
 def normalize_city(city):
     """Normaliza el nombre de la ciudad"""
     if city is None or city == "" or city == "None":
         return None
     return str(city).strip().lower()
 
+@normalization_cache.cached('normalize_country')
 def normalize_country(country):
     """Normaliza el nombre del país"""
     if country is None or country == "" or country == "None":
         return None
     return str(country).strip()
 
-def carrier_matches_location(carrier, location):
+# Ubicación de RUTAS compilada: conjuntos inmutables de países, estados y ciudades
+# normalizados, y los nombres de ciudad tal como están en la ruta
+RouteLocation = namedtuple('RouteLocation', ['paises', 'estados', 'ciudades', 'nombres_ciudad'])
+
+# Ruta compilada: ubicaciones de origen, destino y ciudades de cruce (None si no tiene)
+CompiledRoute = namedtuple('CompiledRoute', ['origen', 'destino', 'cruce_ciudades'])
+
+def compile_location(location):
     """
-    Verifica si un carrier tiene base en una ubicación específica
-    location puede tener múltiples valores separados por |
+    Compila una ubicación {ciudad, estado, pais} con valores separados por |.
+    Cada estado se normaliza con cada país de la ubicación, así las
+    abreviaciones se resuelven en el país correcto.
     """
-    carrier_state = normalize_state(carrier.get('STATE'))
-    carrier_city = normalize_city(carrier.get('CITY'))
-    carrier_country = normalize_country(carrier.get('COUNTRY'))
+    paises = frozenset(normalize_country(p.strip()) for p in location.get('pais', '').split('|'))
+    estados = frozenset(normalize_state(e.strip(), pais)
+                        for e in location.get('estado', '').split('|') for pais in paises)
+    nombres_ciudad = tuple(c.strip() for c in location.get('ciudad', '').split('|'))
+    ciudades = frozenset(normalize_city(c) for c in nombres_ciudad)
+    return RouteLocation(paises, estados - {None}, ciudades - {None}, nombres_ciudad)
 
-    # Manejar múltiples estados/ciudades en la ubicación
-    estados = location['estado'].split('|')
-    ciudades = location['ciudad'].split('|')
-    paises = location['pais'].split('|')
+def compile_routes(rutas):
+    """{ruta: CompiledRoute} de un dict con la forma de RUTAS"""
+    return {
+        ruta_nombre: CompiledRoute(compile_location(ruta_info['origen']), compile_location(ruta_info['destino']),
+                                   compile_location(ruta_info['cruce_ciudades'])
+                                   if ruta_info.get('cruce_ciudades') else None)
+        for ruta_nombre, ruta_info in rutas.items()
+    }
 
-    # Normalizar estados de la ubicación
-    estados_normalizados = [normalize_state(e.strip()) for e in estados]
-    ciudades_normalizadas = [normalize_city(c.strip()) for c in ciudades]
-    paises_normalizados = [normalize_country(p.strip()) for p in paises]
+def carrier_matches_location(carrier, location):
+    """
+    Verifica si un carrier tiene base en una ubicación específica: mismo país y
+    mismo estado o misma ciudad. location es una RouteLocation o una ubicación
+    de RUTAS (que se compila en cada llamada)
+    """
+    if not isinstance(location, RouteLocation):
+        location = compile_location(location)
 
     # Verificar si el país coincide
-    if carrier_country not in paises_normalizados:
+    carrier_country = normalize_country(carrier.get('COUNTRY'))
+    if carrier_country not in location.paises:
         return False
 
-    # Verificar si el estado coincide
-    if carrier_state and carrier_state in estados_normalizados:
+    # Verificar si el estado coincide (la abreviación se resuelve con el país del carrier)
+    carrier_state = normalize_state(carrier.get('STATE'), carrier_country)
+    if carrier_state and carrier_state in location.estados:
         return True
 
     # Verificar si la ciudad coincide (aunque el estado no esté mapeado correctamente)
-    if carrier_city and carrier_city in ciudades_normalizadas:
-        return True
+    carrier_city = normalize_city(carrier.get('CITY'))
+    return bool(carrier_city and carrier_city in location.ciudades)
 
-    return False
+def carrier_in_crossing(carrier, location):
+    """
+    Verifica si un carrier está en una de las ciudades de cruce de una ruta
+    (RouteLocation de cruce_ciudades): a diferencia de carrier_matches_location
+    deben coincidir el país, el estado y la ciudad, para que una ciudad homónima
+    en otro estado o país (p. ej. Laredo, Tamaulipas) no cuente como cruce
+    """
+    if location is None:
+        return False
+    carrier_country = normalize_country(carrier.get('COUNTRY'))
+    if carrier_country not in location.paises:
+        return False
+    if normalize_state(carrier.get('STATE'), carrier_country) not in location.estados:
+        return False
+    carrier_city = normalize_city(carrier.get('CITY'))
+    return bool(carrier_city and carrier_city in location.ciudades)
 
-def main():
-    print("Leyendo archivo carriers.csv...")
+# RUTAS compiladas una sola vez
+COMPILED_ROUTES = compile_routes(RUTAS)
 
-    # Leer el archivo CSV
-    carriers = []
-    with open('/home/user/carriers-fr8/carriers/Carriers.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Filtrar solo carriers
-            if row['COMPANY TYPE'] == 'CARRIER':
-                carriers.append(row)
+# Índice de trigramas de las ciudades de RUTAS; None = solo coincidencia exacta
+FUZZY_INDEX = None
 
-    print(f"Total de registros de carriers encontrados: {len(carriers)}")
+# Gazetteer e índice espacial de los puntos de RUTAS (modo --radius-km); None = desactivado
+GAZETTEER = None
+GEO_INDEX = None
+GEO_RADIUS_KM = None
 
-    # Analizar cada ruta
-    resultados = defaultdict(list)
+def configure_fuzzy(threshold):
+    """Activa (threshold) o desactiva (None) la coincidencia aproximada de ciudades"""
+    global FUZZY_INDEX
+    if threshold is None:
+        FUZZY_INDEX = None
+        return
+    ciudades = [ciudad.strip()
+                for ruta_info in RUTAS.values()
+                for location in (ruta_info['origen'], ruta_info['destino'])
+                for ciudad in location['ciudad'].split('|')]
+    FUZZY_INDEX = TrigramIndex(ciudades, threshold)
 
+def configure_geo(radio_km, path=GAZETTEER_PATH, verbose=False):
+    """
+    Activa (radio_km) o desactiva (None) la coincidencia por distancia. Cada
+    ciudad de origen/destino de RUTAS se ubica en el gazetteer y se indexa con
+    su radio: el de la ubicación ('radio_km') o radio_km.
+    """
+    global GAZETTEER, GEO_INDEX, GEO_RADIUS_KM
+    GEO_RADIUS_KM = radio_km
+    if radio_km is None:
+        GAZETTEER = GEO_INDEX = None
+        return
+    GAZETTEER = Gazetteer(path)
+    GEO_INDEX = GridIndex(cell_km=radio_km)
+    faltantes = []
     for ruta_nombre, ruta_info in RUTAS.items():
-        print(f"\nAnalizando {ruta_nombre}...")
-        carriers_unicos = set()
-        registros_agregados = 0
+        for lado in ('origen', 'destino'):
+            location = ruta_info[lado]
+            radio = location.get('radio_km', radio_km)
+            for ciudad in location['ciudad'].split('|'):
+                ciudad = ciudad.strip()
+                for pais in location['pais'].split('|'):
+                    ubicacion = GAZETTEER.resolve(ciudad, pais.strip())
+                    if ubicacion is not None:
+                        GEO_INDEX.add(ubicacion[1], ubicacion[2], radio, (ruta_nombre, lado, ciudad))
+                        break
+                else:
+                    faltantes.append(f"{ciudad} ({ruta_nombre} {lado})")
+    if verbose and faltantes:
+        print(f"Sin coordenadas en el gazetteer: {', '.join(faltantes)}")
+
+def init_worker(cache_size, fuzzy_threshold, radio_km, gazetteer_path, perfil=False, cprofile_path=None):
+    """Inicializador de los procesos worker: cachés, modo de coincidencia y perfil"""
+    normalization_cache.configure(cache_size)
+    configure_fuzzy(fuzzy_threshold)
+    configure_geo(radio_km, gazetteer_path)
+    if perfil:
+        # El volcado de cProfile lo escribe el proceso principal con lo que devuelve take()
+        profiling.enable(cprofile_path)
+
+def output_fieldnames():
+    """Columnas del archivo de salida (con el detalle de la coincidencia en modo --fuzzy/--radius-km)"""
+    if FUZZY_INDEX is None and GEO_INDEX is None:
+        return OUTPUT_FIELDNAMES
+    fieldnames = list(OUTPUT_FIELDNAMES)
+    if FUZZY_INDEX is not None:
+        fieldnames.append('PUNTAJE_COINCIDENCIA')
+    fieldnames.append('CIUDAD_COINCIDENTE')
+    if GEO_INDEX is not None:
+        fieldnames.append('DISTANCIA_KM')
+    return fieldnames
+
+def grouped_fieldnames():
+    """Columnas del archivo agrupado: las de salida con listas de contactos y REGISTROS"""
+    return [GROUPED_COLUMNS.get(campo, campo) for campo in output_fieldnames()] + ['REGISTROS']
+
+def match_settings():
+    """Parámetros de coincidencia que afectan el resultado (para el estado incremental)"""
+    return {
+        'fuzzy_threshold': FUZZY_INDEX and FUZZY_INDEX.threshold,
+        'radius_km': GEO_RADIUS_KM,
+        'gazetteer': GAZETTEER and incremental.output_fingerprint(GAZETTEER.path),
+    }
+
+def nearby_route_points(carrier):
+    """{(ruta_nombre, lado): (distancia_km, ciudad)} de los puntos de RUTAS a cuyo radio llega el carrier"""
+    pais = normalize_country(carrier.get('COUNTRY'))
+    ubicacion = GAZETTEER.locate(carrier.get('CITY'), pais, normalize_state(carrier.get('STATE'), pais))
+    if ubicacion is None:
+        return {}
+    cercanos = {}
+    for distancia, (ruta_nombre, lado, ciudad) in GEO_INDEX.within(ubicacion[1], ubicacion[2]):
+        cercanos.setdefault((ruta_nombre, lado), (distancia, ciudad))
+    return cercanos
+
+def location_detail(carrier, location, cercano=None):
+    """
+    Como carrier_matches_location (location es una RouteLocation), pero devuelve
+    el detalle de la coincidencia (puntaje, ciudad de la ruta, distancia_km) o None:
+      - exacta: puntaje 1.0; la ciudad queda vacía si fue solo por estado
+      - --fuzzy: ciudad parecida del mismo país, con su similitud como puntaje
+      - --radius-km: carrier dentro del radio de un punto de la ubicación
+        (cercano), sin puntaje
+    La distancia es la del punto más cercano de la ubicación, si está en el radio.
+    """
+    distancia = cercano[0] if cercano else None
+    ciudades = location.nombres_ciudad
+    if carrier_matches_location(carrier, location):
+        carrier_city = normalize_city(carrier.get('CITY'))
+        for ciudad in ciudades:
+            if carrier_city and normalize_city(ciudad) == carrier_city:
+                return 1.0, ciudad, distancia
+        return 1.0, cercano[1] if cercano else '', distancia
+
+    if FUZZY_INDEX is not None:
+        if normalize_country(carrier.get('COUNTRY')) in location.paises:
+            candidatas = FUZZY_INDEX.lookup(carrier.get('CITY') or '')
+            mejor = max(((candidatas[c], c) for c in ciudades if c in candidatas), default=None)
+            if mejor is not None:
+                return mejor[0], mejor[1], distancia
 
-        origen = ruta_info['origen']
-        destino = ruta_info['destino']
+    if cercano:
+        return None, cercano[1], distancia
+    return None
 
-        for carrier in carriers:
-            # Verificar si el carrier tiene base en origen o destino
-            en_origen = carrier_matches_location(carrier, origen)
-            en_destino = carrier_matches_location(carrier, destino)
+def _detail_rank(detalle):
+    """Orden de preferencia entre el detalle de origen y de destino: puntaje y luego cercanía"""
+    puntaje, ciudad, distancia = detalle
+    return (-1.0 if puntaje is None else puntaje,
+            float('-inf') if distancia is None else -distancia,
+            ciudad)
 
+def match_columns(detalle):
+    """Columnas adicionales de salida para el detalle de una coincidencia"""
+    puntaje, ciudad, distancia = detalle
+    columnas = {'CIUDAD_COINCIDENTE': ciudad}
+    if FUZZY_INDEX is not None:
+        columnas['PUNTAJE_COINCIDENCIA'] = '' if puntaje is None else f"{puntaje:.3f}"
+    if GEO_INDEX is not None:
+        columnas['DISTANCIA_KM'] = '' if distancia is None else f"{distancia:.1f}"
+    return columnas
+
+def carrier_rows(rows):
+    """Filas cuyo COMPANY TYPE es CARRIER (las demás se cuentan para --profile)"""
+    for row in rows:
+        if row['COMPANY TYPE'] == 'CARRIER':
+            yield row
+        else:
+            profiling.count('rows_not_carrier')
+
+def iter_carriers(path, columnas=MATCH_COLUMNS):
+    """
+    Genera las filas de Carriers.csv cuyo COMPANY TYPE es CARRIER, como registros
+    de lazy_csv con 'columnas' ya decodificadas
+    """
+    registros = lazy_csv.read_records(path, ('COMPANY TYPE',) + tuple(columnas))
+    yield from carrier_rows(profiling.iterate('parse', registros))
+
+def iter_matches(carriers, cruces=False):
+    """
+    Genera (carrier, coincidencias de match_location) por carrier; con 'cruces',
+    también las de crossing_matches. Como en match_routes, se evalúa una vez por
+    combinación distinta de CITY/STATE/COUNTRY (las listas se comparten entre carriers).
+    """
+    memo = {}
+    for carrier in carriers:
+        # match_location solo usa CITY/STATE/COUNTRY, que ya están decodificadas en 'campos'
+        campos = carrier.campos
+        ubicacion = (campos.get('CITY'), campos.get('STATE'), campos.get('COUNTRY'))
+        matches = memo.get(ubicacion)
+        if matches is None:
+            matches = match_location(campos)
+            if cruces:
+                matches = matches + crossing_matches(campos, matches)
+            memo[ubicacion] = matches
+        yield carrier, matches
+
+def route_location(en_origen, en_destino):
+    """
+    Valor de UBICACION_EN_RUTA: ORIGEN, DESTINO u ORIGEN y DESTINO; CRUCE si no
+    coincide ninguno de los dos (coincidencia de crossing_matches)
+    """
+    ubicacion = "ORIGEN" if en_origen else ""
+    ubicacion += " y " if (en_origen and en_destino) else ""
+    ubicacion += "DESTINO" if en_destino else ""
+    return ubicacion or "CRUCE"
+
+def count_route_matches(ruta_nombre, ubicacion, n=1):
+    """Contadores de --profile: coincidencias por ruta y por ubicación en la ruta"""
+    profiling.count(f"matches.{ruta_nombre}", n)
+    profiling.count(f"matches.{ruta_nombre}.{ubicacion}", n)
+
+def build_output_row(ruta_nombre, ruta_info, carrier, en_origen, en_destino, detalle=None):
+    """
+    Construye la fila de salida de un carrier que coincide con una ruta
+    (detalle: columnas adicionales de match_columns, en modo --fuzzy/--radius-km)
+    """
+    row = {
+        'RUTA': ruta_nombre,
+        'DESCRIPCION_RUTA': ruta_info['descripcion'],
+        'TIPO_RUTA': ruta_info['tipo'],
+        'BAN': carrier['BAN'],
+        'CARRIER': carrier['COMPANY NAME'],
+        'CITY': carrier.get('CITY', ''),
+        'STATE': carrier.get('STATE', ''),
+        'STATE_NORMALIZADO': normalize_state(carrier.get('STATE', ''), carrier.get('COUNTRY')),
+        'COUNTRY': carrier.get('COUNTRY', ''),
+        'UBICACION_EN_RUTA': route_location(en_origen, en_destino),
+        'EMAIL': carrier.get('EMAIL', ''),
+        'PHONE': carrier.get('PHONE #', ''),
+        'DATA_ORIGIN': carrier.get('DATA ORIGIN', '')
+    }
+    if detalle:
+        row.update(detalle)
+    return row
+
+def build_match_row(carrier, match):
+    """Fila de salida de una coincidencia devuelta por match_location"""
+    ruta_nombre, en_origen, en_destino, detalle = match
+    return build_output_row(ruta_nombre, RUTAS[ruta_nombre], carrier, en_origen, en_destino, detalle)
+
+def carrier_unique_key(row):
+    """Clave de carrier único de una fila de salida (para el resumen)"""
+    return (row['BAN'], row['CARRIER'], row['CITY'], row['STATE_NORMALIZADO'], row['COUNTRY'])
+
+def add_row_to_groups(grupos, row):
+    """Agrega una fila de salida a CarrierGroups (la fila es la muestra del carrier)"""
+    grupos.add(row['RUTA'], carrier_unique_key(row), row, row['EMAIL'], row['PHONE'], row['DATA_ORIGIN'])
+
+def build_grouped_row(grupo, row):
+    """
+    Fila del archivo agrupado a partir de un CarrierGroup y la fila de salida de
+    su muestra (se devuelve la misma fila; EMAIL/PHONE/DATA_ORIGIN quedan fuera
+    porque write_grouped ignora las columnas que no son de grouped_fieldnames)
+    """
+    row['EMAILS'] = GROUP_SEPARATOR.join(grupo.emails)
+    row['PHONES'] = GROUP_SEPARATOR.join(grupo.phones)
+    row['DATA_ORIGINS'] = GROUP_SEPARATOR.join(grupo.origins)
+    row['REGISTROS'] = grupo.registros
+    return row
+
+def write_grouped(path, grupos, muestra_a_fila=dict):
+    """
+    Escribe una fila por carrier único y ruta, ordenadas por RUTA y CARRIER como
+    la salida normal (empates en orden de primera aparición). muestra_a_fila
+    convierte la muestra guardada en CarrierGroups en una fila de salida.
+    """
+    total = 0
+    with profiling.stage('write_grouped'), compressed_io.open_output(path) as f:
+        writer = csv.DictWriter(f, fieldnames=grouped_fieldnames(), extrasaction='ignore')
+        writer.writeheader()
+        for ruta in grupos.routes():
+            filas = [build_grouped_row(grupo, muestra_a_fila(grupo.muestra)) for grupo in grupos.groups(ruta)]
+            filas.sort(key=lambda row: _sortable((row['CARRIER'],)))
+            writer.writerows(filas)
+            total += len(filas)
+    print(f"✓ Archivo agrupado {path} generado con {total} carriers por ruta")
+
+def carrier_values(carrier):
+    """Valores de STORE_COLUMNS de una fila de Carriers.csv"""
+    return tuple(carrier.get(columna) for columna in STORE_COLUMNS)
+
+def new_store():
+    return CarrierStore(STORE_COLUMNS, encoded=STORE_ENCODED)
+
+def carrier_key(carrier):
+    """Clave de carrier único de una fila de Carriers.csv (igual que carrier_unique_key)"""
+    return (carrier['BAN'], carrier['COMPANY NAME'], carrier.get('CITY', ''),
+            normalize_state(carrier.get('STATE', ''), carrier.get('COUNTRY')), carrier.get('COUNTRY', ''))
+
+def store_unique_key(store, i):
+    """Clave de carrier único de la fila i del almacén (igual que carrier_unique_key)"""
+    return carrier_key(store.record(i))
+
+def match_location(carrier):
+    """
+    Devuelve [(ruta_nombre, en_origen, en_destino, detalle)] para cada ruta con
+    la que coincide el carrier. detalle es None en modo exacto y, en modo
+    --fuzzy/--radius-km, las columnas del mejor detalle de origen/destino.
+    """
+    matches = []
+    if FUZZY_INDEX is None and GEO_INDEX is None:
+        for ruta_nombre, ruta in COMPILED_ROUTES.items():
+            en_origen = carrier_matches_location(carrier, ruta.origen)
+            en_destino = carrier_matches_location(carrier, ruta.destino)
             if en_origen or en_destino:
-                # Contar carriers únicos para el resumen
-                carrier_key = (
-                    carrier['BAN'],
-                    carrier['COMPANY NAME'],
-                    carrier.get('CITY', ''),
-                    normalize_state(carrier.get('STATE', '')),
-                    carrier.get('COUNTRY', '')
-                )
-                carriers_unicos.add(carrier_key)
+                matches.append((ruta_nombre, en_origen, en_destino, None))
+        return matches
+
+    cercanos = nearby_route_points(carrier) if GEO_INDEX is not None else {}
+    for ruta_nombre, ruta in COMPILED_ROUTES.items():
+        en_origen = location_detail(carrier, ruta.origen, cercanos.get((ruta_nombre, 'origen')))
+        en_destino = location_detail(carrier, ruta.destino, cercanos.get((ruta_nombre, 'destino')))
+        if en_origen or en_destino:
+            detalle = max((d for d in (en_origen, en_destino) if d), key=_detail_rank)
+            matches.append((ruta_nombre, bool(en_origen), bool(en_destino), match_columns(detalle)))
+    return matches
+
+def crossing_matches(carrier, matches):
+    """
+    Coincidencias (modo --top) de las rutas que no están en 'matches' y tienen
+    al carrier en sus cruce_ciudades (carrier_in_crossing): un carrier en la
+    ciudad de cruce sirve a la ruta aunque no esté en el origen ni en el destino
+    """
+    coinciden = {match[0] for match in matches}
+    return [(ruta_nombre, False, False, None) for ruta_nombre, ruta in COMPILED_ROUTES.items()
+            if ruta_nombre not in coinciden and carrier_in_crossing(carrier, ruta.cruce_ciudades)]
+
+def match_roles(carrier, match):
+    """
+    Papeles de una coincidencia de match_location o crossing_matches para el
+    puntaje: ORIGEN y DESTINO con _CIUDAD si además coincide la ciudad, y
+    CRUCE y CRUCE_CIUDAD si el carrier está en una de las cruce_ciudades de la
+    ruta (carrier_in_crossing)
+    """
+    ruta_nombre, en_origen, en_destino, _ = match
+    ruta = COMPILED_ROUTES[ruta_nombre]
+    ciudad = normalize_city(carrier.get('CITY'))
+    roles = []
+    for rol, location, coincide in (('ORIGEN', ruta.origen, en_origen), ('DESTINO', ruta.destino, en_destino)):
+        if coincide:
+            roles.append(rol)
+            if ciudad and ciudad in location.ciudades:
+                roles.append(rol + '_CIUDAD')
+    if carrier_in_crossing(carrier, ruta.cruce_ciudades):
+        roles.extend(('CRUCE', 'CRUCE_CIUDAD'))
+    return roles
+
+def match_chunk(path, inicio, fin, columnas, todos=False, cruces=False):
+    """
+    Worker: analiza un rango de bytes de Carriers.csv y devuelve los carriers que
+    coinciden (o todos los carriers si 'todos', para poder guardar el almacén);
+    'cruces' como en iter_matches
+    """
+    cache_antes = normalization_cache.stats()
+    total_carriers = 0
+    matches = []
+    registros = lazy_csv.read_records(path, STORE_COLUMNS + MATCH_COLUMNS if todos else MATCH_COLUMNS,
+                                      fieldnames=columnas, start=inicio, end=fin)
+    carriers = carrier_rows(profiling.iterate('parse', registros))
+    for row, rutas_carrier in profiling.iterate('match', iter_matches(carriers, cruces)):
+        total_carriers += 1
+        if rutas_carrier or todos:
+            matches.append((carrier_values(row), rutas_carrier))
+    return total_carriers, matches, normalization_cache.stats_since(cache_antes), profiling.take()
+
+def iter_chunk_matches(args, todos=False, cruces=False, valores=False):
+    """
+    Genera (carriers leídos, [(carrier, coincidencias de match_location)]) por chunk,
+    en orden; con 'valores', cada carrier es la tupla de STORE_COLUMNS tal como la
+    devuelve el worker (sin armar el dict)
+    """
+    columnas, inicio_datos = csv_chunks.read_header(args.input)
+    chunks = csv_chunks.map_chunks(args.input, match_chunk, args.workers,
+                                   start=inicio_datos, extra_args=(columnas, todos, cruces),
+                                   initializer=init_worker,
+                                   initargs=(args.cache_size, args.fuzzy_threshold if args.fuzzy else None,
+                                             args.radius_km, args.gazetteer, bool(args.profile),
+                                             args.profile_cprofile))
+    for total_carriers, matches, cache_stats, perfil in profiling.iterate('workers', chunks):
+        normalization_cache.add_worker_stats(cache_stats)
+        profiling.merge(perfil)
+        if valores:
+            yield total_carriers, matches
+        else:
+            yield total_carriers, [(dict(zip(STORE_COLUMNS, fila)), rutas_carrier)
+                                   for fila, rutas_carrier in matches]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analiza carriers y los mapea con 12 rutas específicas")
+    parser.add_argument('--input', default=ARCHIVO_CARRIERS, help="archivo Carriers.csv (puede estar comprimido con gzip, bz2 o xz)")
+    parser.add_argument('--output', default=ARCHIVO_SALIDA,
+                        help="archivo CSV de resultados (.gz, .bz2 o .xz para comprimirlo)")
+    parser.add_argument('--cache-size', type=int, default=normalization_cache.DEFAULT_MAXSIZE,
+                        help="entradas máximas de la caché de normalización")
+    parser.add_argument('--streaming', action='store_true',
+                        help="una sola pasada sobre el archivo con memoria acotada")
+    parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help="filas por run del ordenamiento externo (modo streaming)")
+    parser.add_argument('--tmpdir', default=None,
+                        help="directorio para los runs temporales (modo streaming)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos para leer y analizar Carriers.csv por chunks")
+    parser.add_argument('--store-cache', default=None,
+                        help="caché binaria de carriers parseados (por defecto <input>.store)")
+    parser.add_argument('--no-store-cache', action='store_true',
+                        help="no leer ni escribir la caché binaria de carriers")
+    parser.add_argument('--incremental', action='store_true',
+                        help="analizar solo filas agregadas/modificadas desde la corrida anterior")
+    parser.add_argument('--verify', action='store_true',
+                        help="(modo incremental) comparar el resultado con una reconstrucción completa")
+    parser.add_argument('--fuzzy', action='store_true',
+                        help="aceptar ciudades parecidas a las de las rutas (errores de escritura, acentos)")
+    parser.add_argument('--fuzzy-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="similitud mínima de trigramas (0-1) para el modo --fuzzy")
+    parser.add_argument('--radius-km', type=float, default=None,
+                        help="aceptar carriers a esta distancia de un origen/destino "
+                             "(una ubicación de RUTAS puede fijar su propio 'radio_km')")
+    parser.add_argument('--gazetteer', default=GAZETTEER_PATH,
+                        help="CSV de coordenadas de ciudades para --radius-km")
+    parser.add_argument('--grouped-output', default=None, metavar='CSV',
+                        help="además, escribir una fila por carrier único y ruta con sus emails/teléfonos")
+    parser.add_argument('--sqlite', default=None, metavar='DB',
+                        help="cargar Carriers.csv en esta base SQLite (se reutiliza mientras no cambie) "
+                             "y responder cada ruta con consultas indexadas")
+    parser.add_argument('--sqlite-batch-size', type=int, default=sqlite_store.DEFAULT_BATCH_SIZE,
+                        help="filas por lote al cargar la base SQLite")
+    parser.add_argument('--diff', default=None, metavar='DIR',
+                        help="conservar la salida anterior como <output>.prev y escribir en DIR las filas "
+                             "agregadas/eliminadas/cambiadas por (RUTA, BAN, EMAIL) y el resumen por ruta")
+    parser.add_argument('--top', type=int, default=None, metavar='K',
+                        help="escribir solo los K carriers únicos de mayor puntaje por ruta, con su mejor fila "
+                             "(ciudad > estado, origen y destino > un lado). Un carrier en una ciudad de "
+                             "cruce de la ruta (misma ciudad, estado y país) suma puntos y, aunque no "
+                             "esté en el origen ni en el destino, entra con UBICACION_EN_RUTA CRUCE")
+    parser.add_argument('--profile', default=None, metavar='JSON',
+                        help="guardar tiempos por etapa y contadores en este archivo JSON")
+    parser.add_argument('--profile-cprofile', default=None, metavar='PSTATS',
+                        help="(con --profile) volcado de cProfile de la etapa de coincidencias "
+                             "(con --workers, sumando la de todos los procesos worker)")
+    args = parser.parse_args(argv)
+    if args.diff and args.incremental:
+        # El modo incremental lee la salida anterior desde --output
+        parser.error("--diff no se puede combinar con --incremental")
+    if args.radius_km is not None and args.radius_km <= 0:
+        parser.error("--radius-km debe ser mayor que 0")
+    if args.top is not None:
+        if args.top < 1:
+            parser.error("--top debe ser al menos 1")
+        incompatibles = [opcion for opcion, activa in (('--incremental', args.incremental),
+                                                       ('--sqlite', args.sqlite),
+                                                       ('--grouped-output', args.grouped_output)) if activa]
+        if incompatibles:
+            parser.error(f"--top no se puede combinar con {', '.join(incompatibles)}")
+    if args.sqlite:
+        incompatibles = [opcion for opcion, activa in (('--streaming', args.streaming),
+                                                       ('--incremental', args.incremental),
+                                                       ('--fuzzy', args.fuzzy),
+                                                       ('--radius-km', args.radius_km is not None)) if activa]
+        if incompatibles:
+            parser.error(f"--sqlite no se puede combinar con {', '.join(incompatibles)}")
+    return args
+
+def store_cache_path(args):
+    """Ruta de la caché binaria de carriers, o None si está desactivada"""
+    if args.no_store_cache:
+        return None
+    return args.store_cache or args.input + '.store'
+
+def load_carriers(args):
+    """
+    Devuelve (almacén de carriers, total de carriers). Si la caché binaria sigue
+    correspondiendo a Carriers.csv se carga con mmap sin parsear el CSV; si no,
+    se parsea el archivo y se regenera la caché.
+    """
+    ruta_cache = store_cache_path(args)
+    if ruta_cache:
+        with profiling.stage('load_cache'):
+            store = load_store(ruta_cache, args.input, STORE_COLUMNS, STORE_ENCODED)
+        if store is not None:
+            print(f"Carriers cargados desde la caché {ruta_cache}")
+            return store, len(store)
+        with profiling.stage('fingerprint'):
+            huella = file_fingerprint(args.input)
+
+    # Carriers en un almacén columnar en lugar de un dict por fila
+    store = new_store()
+    with profiling.stage('store'):
+        if args.workers > 1:
+            # Los workers filtran en paralelo; sin caché solo llegan al almacén los que coinciden
+            total_carriers = 0
+            for carriers_chunk, matches in iter_chunk_matches(args, todos=bool(ruta_cache), valores=True):
+                total_carriers += carriers_chunk
+                for fila, _ in matches:
+                    store.append(fila)
+        else:
+            # Leer el archivo CSV (solo carriers)
+            for carrier in iter_carriers(args.input, STORE_COLUMNS):
+                store.append(carrier_values(carrier.campos))
+            total_carriers = len(store)
+
+    # Solo se guarda si el archivo no cambió mientras se leía
+    if ruta_cache and fingerprint_matches(huella, args.input):
+        try:
+            with profiling.stage('save_cache'):
+                save_store(store, ruta_cache, huella)
+            print(f"Caché de carriers guardada en {ruta_cache}")
+        except OSError as e:
+            print(f"No se pudo guardar la caché de carriers: {e}")
+
+    return store, total_carriers
+
+def run_in_memory(args):
+    print("Leyendo archivo carriers.csv...")
+
+    store, total_carriers = load_carriers(args)
+    profiling.set_counter('rows_carrier', total_carriers)
+
+    print(f"Total de registros de carriers encontrados: {total_carriers}")
+
+    resultados, grupos = match_routes(store, contactos=bool(args.grouped_output))
+    write_results(args, store, resultados, grupos)
 
+def match_routes(store, contactos=False):
+    """
+    Analiza todas las rutas contra el almacén. El resultado solo depende de
+    CITY/STATE/COUNTRY, así que se evalúa una vez por combinación distinta.
+    Devuelve {ruta: [(fila, coincidencia)]} en el orden del archivo y los
+    CarrierGroups por ruta y carrier único, armados en la misma pasada
+    (con emails/teléfonos solo si contactos es verdadero).
+    """
+    with profiling.stage('group'):
+        ubicaciones, representantes = store.combined_codes(('CITY', 'STATE', 'COUNTRY'))
+    with profiling.stage('match'):
+        rutas_por_ubicacion = [match_location(store.record(i)) for i in representantes]
+        # Parte de la clave de carrier único que depende solo de la ubicación
+        claves_ubicacion = [store_unique_key(store, i)[2:] for i in representantes]
+    profiling.set_counter('distinct_locations', len(representantes))
+
+    grupos = CarrierGroups(contacts=contactos)
+    with profiling.stage('group_carriers'):
+        bans, nombres = store.column('BAN'), store.column('COMPANY NAME')
+        if contactos:
+            emails, phones, origenes = store.column('EMAIL'), store.column('PHONE #'), store.column('DATA ORIGIN')
+        resultados = defaultdict(list)
+        for i, ubicacion in enumerate(ubicaciones):
+            rutas_carrier = rutas_por_ubicacion[ubicacion]
+            if not rutas_carrier:
+                continue
+            clave = (bans[i], nombres[i]) + claves_ubicacion[ubicacion]
+            for match in rutas_carrier:
                 # Agregar TODOS los registros del carrier (incluyendo diferentes emails)
-                ubicacion = "ORIGEN" if en_origen else ""
-                ubicacion += " y " if (en_origen and en_destino) else ""
-                ubicacion += "DESTINO" if en_destino else ""
-
-                resultados[ruta_nombre].append({
-                    'RUTA': ruta_nombre,
-                    'DESCRIPCION_RUTA': ruta_info['descripcion'],
-                    'TIPO_RUTA': ruta_info['tipo'],
-                    'BAN': carrier['BAN'],
-                    'CARRIER': carrier['COMPANY NAME'],
-                    'CITY': carrier.get('CITY', ''),
-                    'STATE': carrier.get('STATE', ''),
-                    'STATE_NORMALIZADO': normalize_state(carrier.get('STATE', '')),
-                    'COUNTRY': carrier.get('COUNTRY', ''),
-                    'UBICACION_EN_RUTA': ubicacion,
-                    'EMAIL': carrier.get('EMAIL', ''),
-                    'PHONE': carrier.get('PHONE #', ''),
-                    'DATA_ORIGIN': carrier.get('DATA ORIGIN', '')
-                })
-                registros_agregados += 1
-
-        print(f"  Carriers únicos: {len(carriers_unicos)}")
-        print(f"  Registros totales (inc. múltiples contactos): {registros_agregados}")
+                resultados[match[0]].append((i, match))
+                if contactos:
+                    grupos.add(match[0], clave, (i, match), emails[i], phones[i], origenes[i])
+                else:
+                    grupos.add(match[0], clave, (i, match))
+
+    if profiling.enabled():
+        for ruta_nombre, matches in resultados.items():
+            por_ubicacion = Counter(route_location(m[1], m[2]) for _, m in matches)
+            for ubicacion, n in por_ubicacion.items():
+                count_route_matches(ruta_nombre, ubicacion, n)
+
+    for ruta_nombre in RUTAS:
+        print(f"\nAnalizando {ruta_nombre}...")
+        print(f"  Carriers únicos: {grupos.unique_count(ruta_nombre)}")
+        print(f"  Registros totales (inc. múltiples contactos): {len(resultados.get(ruta_nombre, []))}")
 
+    return resultados, grupos
+
+def write_results(args, store, resultados, grupos):
+    """Ordena, escribe carriers_12_rutas.csv e imprime el resumen por ruta"""
     # Generar archivo de salida
     print("\nGenerando archivo carriers_12_rutas.csv...")
 
     output_rows = []
     for ruta in sorted(resultados.keys()):
-        output_rows.extend(resultados[ruta])
+        output_rows.extend((ruta, i, match) for i, match in resultados[ruta])
 
     if output_rows:
         # Ordenar por RUTA y CARRIER
-        output_rows.sort(key=lambda x: (x['RUTA'], x['CARRIER']))
-
-        # Escribir CSV
-        with open('/home/user/carriers-fr8/carriers_12_rutas.csv', 'w', encoding='utf-8', newline='') as f:
-            fieldnames = ['RUTA', 'DESCRIPCION_RUTA', 'TIPO_RUTA', 'BAN', 'CARRIER', 'CITY',
-                         'STATE', 'STATE_NORMALIZADO', 'COUNTRY', 'UBICACION_EN_RUTA',
-                         'EMAIL', 'PHONE', 'DATA_ORIGIN']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+        with profiling.stage('sort'):
+            nombres = store.column('COMPANY NAME')
+            output_rows.sort(key=lambda x: (x[0], nombres[x[1]]))
+
+        # Escribir CSV (las filas de salida se construyen al escribir)
+        with profiling.stage('write'), compressed_io.open_output(args.output) as f:
+            writer = csv.DictWriter(f, fieldnames=output_fieldnames())
             writer.writeheader()
-            writer.writerows(output_rows)
+            writer.writerows(build_match_row(store.record(i), match) for _, i, match in output_rows)
 
         print(f"✓ Archivo generado con {len(output_rows)} registros totales")
 
@@ -282,14 +882,437 @@ def main():
         print("(Incluye múltiples contactos por carrier cuando están disponibles)\n")
         for ruta in sorted(resultados.keys()):
             registros = len(resultados[ruta])
-            # Contar carriers únicos
-            carriers_unicos = set()
-            for r in resultados[ruta]:
-                key = (r['BAN'], r['CARRIER'], r['CITY'], r['STATE_NORMALIZADO'], r['COUNTRY'])
-                carriers_unicos.add(key)
-            print(f"{ruta}: {len(carriers_unicos)} carriers únicos, {registros} registros totales")
+            print(f"{ruta}: {grupos.unique_count(ruta)} carriers únicos, {registros} registros totales")
     else:
         print("No se encontraron coincidencias")
 
+    if args.grouped_output:
+        write_grouped(args.grouped_output, grupos, lambda muestra: build_match_row(store.record(muestra[0]), muestra[1]))
+
+def _sortable(valores):
+    """Hace comparables tuplas que pueden contener None (DictReader en filas cortas)"""
+    return tuple((v is None, v or '') for v in valores)
+
+def run_streaming(args):
+    """
+    Lee cada carrier una sola vez, lo compara contra todas las rutas y envía las
+    coincidencias a un ordenamiento externo, de modo que la memoria no depende del
+    tamaño del archivo. El archivo generado es el mismo que en run_in_memory.
+    """
+    print("Leyendo archivo carriers.csv en modo streaming...")
+
+    fieldnames = output_fieldnames()
+    ruta_idx = fieldnames.index('RUTA')
+    carrier_idx = fieldnames.index('CARRIER')
+
+    # Mismo orden que output_rows.sort(key=(RUTA, CARRIER)): el merge externo es estable
+    filas = ExternalSorter(key=lambda fila: _sortable((fila[ruta_idx], fila[carrier_idx])),
+                           run_size=args.run_size, tmpdir=args.tmpdir)
+    # Claves (RUTA, carrier único) para contar carriers únicos sin un set en memoria;
+    # con --grouped-output se agrupa por hash (memoria proporcional a los carriers únicos)
+    claves = ExternalSorter(run_size=args.run_size, tmpdir=args.tmpdir)
+    grupos = CarrierGroups() if args.grouped_output else None
+    registros_por_ruta = defaultdict(int)
+    total_carriers = 0
+
+    if args.workers > 1:
+        fuente = iter_chunk_matches(args)
+    else:
+        matches = profiling.iterate('match', iter_matches(iter_carriers(args.input)))
+        fuente = ((1, [carrier_match]) for carrier_match in matches)
+
+    perfil = profiling.enabled()
+    with filas, claves:
+        with profiling.stage('sort'):
+            for carriers_leidos, matches in fuente:
+                total_carriers += carriers_leidos
+                for carrier, rutas_carrier in matches:
+                    for match in rutas_carrier:
+                        row = build_match_row(carrier, match)
+                        filas.add([row[campo] for campo in fieldnames])
+                        if grupos is not None:
+                            add_row_to_groups(grupos, row)
+                        else:
+                            claves.add((row['RUTA'], _sortable(carrier_unique_key(row))))
+                        registros_por_ruta[row['RUTA']] += 1
+                        if perfil:
+                            count_route_matches(row['RUTA'], row['UBICACION_EN_RUTA'])
+
+        profiling.set_counter('rows_carrier', total_carriers)
+        print(f"Total de registros de carriers encontrados: {total_carriers}")
+
+        if not filas.count:
+            print("No se encontraron coincidencias")
+            return
+
+        print("\nGenerando archivo carriers_12_rutas.csv...")
+        with profiling.stage('write'), compressed_io.open_output(args.output) as f:
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+            for fila in filas.sorted():
+                writer.writerow(fila)
+
+        print(f"✓ Archivo generado con {filas.count} registros totales")
+
+        # Resumen por ruta
+        carriers_unicos = defaultdict(int)
+        if grupos is not None:
+            for ruta in grupos.routes():
+                carriers_unicos[ruta] = grupos.unique_count(ruta)
+        else:
+            with profiling.stage('count_unique'):
+                for (ruta, _), _ in itertools.groupby(claves.sorted()):
+                    carriers_unicos[ruta] += 1
+
+    print("\n=== RESUMEN POR RUTA ===")
+    print("(Incluye múltiples contactos por carrier cuando están disponibles)\n")
+    for ruta in sorted(registros_por_ruta.keys()):
+        print(f"{ruta}: {carriers_unicos[ruta]} carriers únicos, {registros_por_ruta[ruta]} registros totales")
+
+    if grupos is not None:
+        write_grouped(args.grouped_output, grupos)
+
+def run_top(args):
+    """
+    Modo --top K: lee cada carrier una sola vez, puntúa cada coincidencia según
+    sus papeles en la ruta (match_roles, incluidas las ciudades de cruce) y
+    conserva por ruta solo los K carriers únicos (clave de CarrierGroups) de
+    mayor puntaje en un heap acotado, cada uno con su mejor fila. Memoria y
+    ordenamiento son O(rutas × K), sin importar el tamaño de Carriers.csv. Las
+    filas salen por RUTA y puntaje descendente; los empates, por CARRIER y
+    orden del archivo como en la salida normal.
+    """
+    print(f"Leyendo archivo carriers.csv (los {args.top} mejores carriers por ruta)...")
+
+    mejores = TopK(args.top)
+    registros_por_ruta = defaultdict(int)
+    total_carriers = 0
+    posicion = 0
+
+    if args.workers > 1:
+        fuente = iter_chunk_matches(args, cruces=True)
+    else:
+        matches = profiling.iterate('match', iter_matches(iter_carriers(args.input), cruces=True))
+        fuente = ((1, [carrier_match]) for carrier_match in matches)
+
+    with profiling.stage('rank'):
+        for carriers_leidos, matches in fuente:
+            total_carriers += carriers_leidos
+            for carrier, rutas_carrier in matches:
+                # Con workers solo llegan los carriers que coinciden; el orden relativo se conserva
+                posicion += 1
+                for match in rutas_carrier:
+                    orden = (_sortable((carrier['COMPANY NAME'],)), posicion)
+                    mejores.add(match[0], match_score(match_roles(carrier, match)), orden, (carrier, match),
+                                clave=carrier_key(carrier))
+                    registros_por_ruta[match[0]] += 1
+
+    profiling.set_counter('rows_carrier', total_carriers)
+    print(f"Total de registros de carriers encontrados: {total_carriers}")
+
+    if not registros_por_ruta:
+        print("No se encontraron coincidencias")
+        return
+
+    print("\nGenerando archivo carriers_12_rutas.csv...")
+    escritos = 0
+    with profiling.stage('write'), compressed_io.open_output(args.output) as f:
+        writer = csv.DictWriter(f, fieldnames=output_fieldnames() + [SCORE_FIELD])
+        writer.writeheader()
+        for ruta in mejores.groups():
+            for puntaje, (carrier, match) in mejores.items(ruta):
+                row = build_match_row(carrier, match)
+                row[SCORE_FIELD] = puntaje
+                writer.writerow(row)
+                escritos += 1
+                if profiling.enabled():
+                    count_route_matches(ruta, row['UBICACION_EN_RUTA'])
+
+    print(f"✓ Archivo generado con {escritos} registros totales")
+    print("\n=== RESUMEN POR RUTA ===")
+    print(f"(Los {args.top} carriers de mayor puntaje por ruta)\n")
+    for ruta in mejores.groups():
+        filas = mejores.items(ruta)
+        print(f"{ruta}: {len(filas)} carriers de {registros_por_ruta[ruta]} registros, "
+              f"puntaje {filas[-1][0]}-{filas[0][0]}")
+
+def sqlite_values(carrier):
+    """Valores de STORE_COLUMNS y SQLITE_NORMALIZED de una fila de Carriers.csv"""
+    return carrier_values(carrier) + (normalize_country(carrier.get('COUNTRY')),
+                                      normalize_state(carrier.get('STATE'), carrier.get('COUNTRY')),
+                                      normalize_city(carrier.get('CITY')))
+
+def sqlite_location_condition(location):
+    """
+    Condición SQL (y sus parámetros) equivalente a carrier_matches_location para
+    una RouteLocation: mismo país y mismo estado o misma ciudad normalizados.
+    Se escribe como OR de dos ramas para que cada una use su índice.
+    """
+    paises = location.paises
+    estados = sorted(location.estados)
+    ciudades = sorted(location.ciudades)
+
+    conocidos = sorted(p for p in paises if p is not None)
+    condicion_pais = f"NORM_COUNTRY IN ({', '.join('?' * len(conocidos))})" if conocidos else "0"
+    if None in paises:
+        condicion_pais = f"({condicion_pais} OR NORM_COUNTRY IS NULL)"
+
+    ramas = []
+    parametros = []
+    for columna, valores in (('NORM_STATE', estados), ('NORM_CITY', ciudades)):
+        if valores:
+            ramas.append(f"({condicion_pais} AND {columna} IN ({', '.join('?' * len(valores))}))")
+            parametros.extend(conocidos + valores)
+    return f"({' OR '.join(ramas) or '0'})", parametros
+
+def load_sqlite(args):
+    """Devuelve (conexión, total de carriers); carga la base si no existe o ya no corresponde"""
+    reglas = incremental.rules_fingerprint(ESTADO_MAPPING, CODIGOS_ESTADO)
+    columnas = STORE_COLUMNS + SQLITE_NORMALIZED
+    with profiling.stage('sqlite_open'):
+        abierta = sqlite_store.open_sqlite(args.sqlite, args.input, columnas, reglas)
+    if abierta is not None:
+        print(f"Carriers cargados desde la base SQLite {args.sqlite}")
+        return abierta
+
+    print(f"Cargando carriers en la base SQLite {args.sqlite}...")
+    huella = file_fingerprint(args.input)
+    with profiling.stage('sqlite_load'):
+        sqlite_store.build_sqlite(args.sqlite, (sqlite_values(carrier.campos) for carrier in iter_carriers(args.input, STORE_COLUMNS)),
+                                  columnas, SQLITE_INDEXES, huella, reglas, args.sqlite_batch_size)
+    abierta = sqlite_store.open_sqlite(args.sqlite, args.input, columnas, reglas)
+    if abierta is None:
+        raise SystemExit(f"{args.input} cambió mientras se cargaba en SQLite; vuelve a ejecutar")
+    return abierta
+
+def run_sqlite(args):
+    """
+    Responde cada ruta con una consulta indexada sobre la base SQLite, que
+    devuelve las filas ya ordenadas por CARRIER y orden del archivo: la memoria
+    no depende del tamaño de Carriers.csv y cada ruta cuesta según sus
+    coincidencias. El archivo generado es el mismo que en run_in_memory.
+    """
+    print("Leyendo archivo carriers.csv con el backend SQLite...")
+    conn, total_carriers = load_sqlite(args)
+    profiling.set_counter('rows_carrier', total_carriers)
+    print(f"Total de registros de carriers encontrados: {total_carriers}")
+
+    columnas = ', '.join(sqlite_store.quote(columna) for columna in STORE_COLUMNS)
+    grupos = CarrierGroups(contacts=bool(args.grouped_output))
+    perfil = profiling.enabled()
+    registros = 0
+    print("\nGenerando archivo carriers_12_rutas.csv...")
+    with conn, contextlib.ExitStack() as archivos:
+        writer = None
+        for ruta_nombre in sorted(RUTAS):
+            ruta_info, ruta = RUTAS[ruta_nombre], COMPILED_ROUTES[ruta_nombre]
+            en_origen, parametros_origen = sqlite_location_condition(ruta.origen)
+            en_destino, parametros_destino = sqlite_location_condition(ruta.destino)
+            consulta = (f"SELECT {columnas}, {en_origen}, {en_destino} FROM carriers "
+                        f"WHERE {en_origen} OR {en_destino} "
+                        f'ORDER BY "COMPANY NAME" IS NULL, "COMPANY NAME", pos')
+            parametros = (parametros_origen + parametros_destino) * 2
+            for fila in profiling.iterate('query', conn.execute(consulta, parametros)):
+                row = build_output_row(ruta_nombre, ruta_info, dict(zip(STORE_COLUMNS, fila)),
+                                       bool(fila[-2]), bool(fila[-1]))
+                if writer is None:
+                    # El archivo se crea con la primera coincidencia, como en run_in_memory
+                    f = archivos.enter_context(compressed_io.open_output(args.output))
+                    writer = csv.DictWriter(f, fieldnames=output_fieldnames())
+                    writer.writeheader()
+                with profiling.stage('write'):
+                    writer.writerow(row)
+                add_row_to_groups(grupos, row)
+                registros += 1
+                if perfil:
+                    count_route_matches(ruta_nombre, row['UBICACION_EN_RUTA'])
+
+    if not registros:
+        print("No se encontraron coincidencias")
+        return
+    print(f"✓ Archivo generado con {registros} registros totales")
+    print("\n=== RESUMEN POR RUTA ===")
+    print("(Incluye múltiples contactos por carrier cuando están disponibles)\n")
+    for ruta in grupos.routes():
+        print(f"{ruta}: {grupos.unique_count(ruta)} carriers únicos, {grupos.record_count(ruta)} registros totales")
+    if args.grouped_output:
+        write_grouped(args.grouped_output, grupos)
+
+def carrier_signature(valores):
+    """Firma (BAN + hash) de una fila de Carriers.csv con valores en orden de STORE_COLUMNS"""
+    return incremental.row_signature(valores[0], valores)
+
+def output_row_signature(row):
+    """Firma de la fila de Carriers.csv que generó una fila de carriers_12_rutas.csv"""
+    valores = [row[campo] for campo in OUTPUT_STORE_FIELDS]
+    return incremental.row_signature(valores[0], valores)
+
+def run_incremental(args):
+    """
+    Regenera carriers_12_rutas.csv a partir de la salida anterior: solo las filas
+    agregadas o modificadas desde la última corrida (según BAN + hash de contenido)
+    se comparan contra RUTAS, y las filas de carriers eliminados se descartan.
+    El archivo resultante es el mismo que el de una reconstrucción completa.
+    """
+    reglas = incremental.rules_fingerprint(RUTAS, ESTADO_MAPPING, CODIGOS_ESTADO, match_settings())
+    ruta_estado = args.output + '.state'
+    anteriores = incremental.load_state(ruta_estado, reglas, args.output)
+
+    # Filas de la salida anterior con la firma de su fila de origen
+    previas = []
+    if anteriores is None:
+        print("Sin estado previo válido: se analizarán todas las filas")
+        anteriores = Counter()
+    else:
+        with profiling.stage('read_previous'), compressed_io.open_input(args.output, newline='') as f:
+            previas = [(output_row_signature(row), row) for row in csv.DictReader(f)]
+    firmas_previas = {firma for firma, _ in previas}
+
+    print("Leyendo archivo carriers.csv en modo incremental...")
+    nuevas = Counter()
+    posiciones = defaultdict(list)  # firma → posiciones en el archivo (solo firmas en la salida previa)
+    filas = []                      # (posición en el archivo, fila de salida)
+    analizadas = 0
+    with profiling.stage('diff'):
+        for posicion, carrier in enumerate(iter_carriers(args.input, STORE_COLUMNS)):
+            valores = carrier_values(carrier.campos)
+            firma = carrier_signature(valores)
+            nuevas[firma] += 1
+            if firma in firmas_previas:
+                posiciones[firma].append(posicion)
+            if nuevas[firma] > anteriores[firma]:
+                # Fila agregada o modificada: es la única que se compara contra las rutas
+                analizadas += 1
+                with profiling.stage('match'):
+                    rutas_carrier = match_location(carrier.campos)
+                for match in rutas_carrier:
+                    filas.append((posicion, build_match_row(carrier.campos, match)))
+
+        # Filas previas que siguen vigentes, con su posición actual en el archivo
+        ocurrencias = Counter()
+        for firma, row in previas:
+            k = ocurrencias[(row['RUTA'], firma)]
+            ocurrencias[(row['RUTA'], firma)] += 1
+            if k < min(anteriores[firma], nuevas[firma]):
+                filas.append((posiciones[firma][k], row))
+
+    agregadas, eliminadas, bans_modificados = incremental.changed_bans(anteriores, nuevas)
+    profiling.set_counter('rows_carrier', sum(nuevas.values()))
+    profiling.set_counter('rows_analyzed', analizadas)
+    print(f"Total de registros de carriers encontrados: {sum(nuevas.values())}")
+    print(f"  Filas nuevas o modificadas: {agregadas} (analizadas: {analizadas})")
+    print(f"  Filas eliminadas o reemplazadas: {eliminadas}")
+    print(f"  Carriers (BAN) modificados: {bans_modificados}")
+
+    # Mismo orden que la reconstrucción completa: RUTA, CARRIER y orden del archivo
+    with profiling.stage('sort'):
+        filas.sort(key=lambda x: (x[1]['RUTA'], x[1]['CARRIER'], x[0]))
+    if profiling.enabled():
+        for _, row in filas:
+            count_route_matches(row['RUTA'], row['UBICACION_EN_RUTA'])
+
+    print("\nGenerando archivo carriers_12_rutas.csv...")
+    with profiling.stage('write'), compressed_io.open_output(args.output) as f:
+        writer = csv.DictWriter(f, fieldnames=output_fieldnames())
+        writer.writeheader()
+        writer.writerows(row for _, row in filas)
+    with profiling.stage('save_state'):
+        incremental.save_state(ruta_estado, reglas, args.output, nuevas)
+
+    print(f"✓ Archivo generado con {len(filas)} registros totales")
+    # Las filas ya están en orden de archivo dentro de cada (RUTA, CARRIER)
+    grupos = CarrierGroups(contacts=bool(args.grouped_output))
+    with profiling.stage('group_carriers'):
+        for _, row in filas:
+            add_row_to_groups(grupos, row)
+    print("\n=== RESUMEN POR RUTA ===")
+    print("(Incluye múltiples contactos por carrier cuando están disponibles)\n")
+    for ruta in grupos.routes():
+        print(f"{ruta}: {grupos.unique_count(ruta)} carriers únicos, {grupos.record_count(ruta)} registros totales")
+    if args.grouped_output:
+        write_grouped(args.grouped_output, grupos)
+
+    if args.verify:
+        # La reconstrucción de verificación no cuenta en el perfil de esta corrida
+        with profiling.stage('verify'), profiling.suspended():
+            verify_incremental(args)
+
+def verify_incremental(args):
+    """Reconstruye todo en un archivo temporal y lo compara con la salida incremental"""
+    print("\nVerificando contra una reconstrucción completa...")
+    fd, temporal = tempfile.mkstemp(suffix='.csv' + compressed_io.compressed_suffix(args.output), dir=os.path.dirname(os.path.abspath(args.output)))
+    os.close(fd)
+    try:
+        completa = argparse.Namespace(**vars(args))
+        completa.output = temporal
+        completa.grouped_output = None
+        run_in_memory(completa)
+        if compressed_io.same_content(args.output, temporal):
+            print("✓ Verificación: la salida incremental coincide con la reconstrucción completa")
+        else:
+            print("✗ Verificación: la salida incremental NO coincide con la reconstrucción completa")
+            raise SystemExit(1)
+    finally:
+        os.unlink(temporal)
+
+def previous_output_path(path):
+    """Ruta donde --diff conserva la salida anterior: carriers_12_rutas.prev.csv(.gz)"""
+    sufijo = compressed_io.compressed_suffix(path)
+    base, extension = os.path.splitext(path[:len(path) - len(sufijo)])
+    return f"{base}.prev{extension}{sufijo}"
+
+def keep_previous_output(args):
+    """
+    Mueve la salida anterior a previous_output_path (sin copiarla) antes de
+    regenerarla. Si no hay salida anterior, tampoco se usa una .prev vieja.
+    """
+    previo = previous_output_path(args.output)
+    if os.path.exists(args.output):
+        os.replace(args.output, previo)
+    elif os.path.exists(previo):
+        os.unlink(previo)
+    return previo
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1 and compressed_io.input_compression(args.input):
+        # Los chunks son rangos de bytes: un archivo comprimido se lee en un solo proceso
+        print("Entrada comprimida: se lee en un solo proceso (la descompresión corre en un hilo aparte)")
+        args.workers = 1
+    normalization_cache.configure(args.cache_size)
+    if args.profile:
+        profiling.enable(args.profile_cprofile)
+    if args.fuzzy:
+        configure_fuzzy(args.fuzzy_threshold)
+    if args.radius_km is not None:
+        configure_geo(args.radius_km, args.gazetteer, verbose=True)
+
+    previo = keep_previous_output(args) if args.diff else None
+
+    if args.incremental:
+        run_incremental(args)
+    elif args.top is not None:
+        run_top(args)
+    elif args.streaming:
+        run_streaming(args)
+    elif args.sqlite:
+        run_sqlite(args)
+    else:
+        run_in_memory(args)
+
+    if previo is not None and (os.path.exists(previo) or os.path.exists(args.output)):
+        resumen = diff_results.diff_results(previo, args.output, args.diff, args.run_size, args.tmpdir)
+        diff_results.print_summary(resumen, args.diff)
+
+    normalization_cache.print_stats()
+
+    if args.profile:
+        profiling.set_counter('rows_read', profiling.get_counter('rows_carrier')
+                              + profiling.get_counter('rows_not_carrier'))
+        mode = ('incremental' if args.incremental else 'top' if args.top is not None
+                else 'streaming' if args.streaming else 'sqlite' if args.sqlite else 'in_memory')
+        profiling.write_report(args.profile, script='analyze_carriers_routes', input=args.input,
+                               mode=mode, workers=args.workers)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de analyze_carriers.py y analyze_carriers_routes.py (completo y por etapa)
+"""
+
+import argparse
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_carriers
+import analyze_carriers_routes
+import vector_match
+from carrier_store import CarrierStore
+from generar_carriers import generar, parse_rows
+
+# Tamaños estándar del archivo sintético
+SIZES = ('10k', '1M', '10M')
+
+# Procesos de los casos *.workers (al menos 2 para que se use el modo por chunks)
+WORKERS = max(2, os.cpu_count() or 1)
+
+# Tolerancia por defecto contra el baseline (fracción de filas/s que se puede perder)
+DEFAULT_TOLERANCE = 0.10
+
+@contextlib.contextmanager
+def silencio():
+    """Descarta lo que imprimen los scripts mientras se mide"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    with silencio():
+        funcion(*args)
+    return time.perf_counter() - inicio
+
+def routes_args(entrada, salida, *extra):
+    return analyze_carriers_routes.parse_args(['--input', entrada, '--output', salida,
+                                               '--no-store-cache', *extra])
+
+# Etapas de analyze_carriers.py
+
+def ac_leer(entrada):
+    store = CarrierStore(analyze_carriers.CAMPOS_CARRIER, encoded=analyze_carriers.CAMPOS_CODIFICADOS)
+    with open(entrada, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) >= 10:
+                store.append(analyze_carriers.carrier_desde_fila(row))
+    return store
+
+def ac_parse(entrada, salida):
+    return cronometrar(ac_leer, entrada)
+
+def ac_match(entrada, salida):
+    store = ac_leer(entrada)
+    indice = analyze_carriers.IndiceRutas(analyze_carriers.rutas)
+    estados, ciudades, paises = store.column('estado'), store.column('ciudad'), store.column('pais')
+
+    def analizar():
+        for i in range(len(store)):
+            indice.analizar_ubicacion(estados[i], ciudades[i], paises[i])
+    return cronometrar(analizar)
+
+def ac_match_numpy(entrada, salida):
+    store = ac_leer(entrada)
+    indice = analyze_carriers.IndiceRutas(analyze_carriers.rutas)
+    return cronometrar(vector_match.match_store, indice, store.column('estado'), store.column('ciudad'),
+                       analyze_carriers.normalizar_texto)
+
+def ac_total(entrada, salida):
+    return cronometrar(analyze_carriers.main, ['--input', entrada, '--output', salida])
+
+def ac_numpy(entrada, salida):
+    return cronometrar(analyze_carriers.main, ['--input', entrada, '--output', salida, '--engine', 'numpy'])
+
+def ac_workers(entrada, salida):
+    return cronometrar(analyze_carriers.main, ['--input', entrada, '--output', salida,
+                                               '--workers', str(WORKERS)])
+
+# Etapas de analyze_carriers_routes.py
+
+def routes_parse(entrada, salida):
+    return cronometrar(analyze_carriers_routes.load_carriers, routes_args(entrada, salida))
+
+def routes_match(entrada, salida):
+    with silencio():
+        store, _ = analyze_carriers_routes.load_carriers(routes_args(entrada, salida))
+    return cronometrar(analyze_carriers_routes.match_routes, store)
+
+def routes_write(entrada, salida):
+    args = routes_args(entrada, salida)
+    with silencio():
+        store, _ = analyze_carriers_routes.load_carriers(args)
+        resultados, grupos = analyze_carriers_routes.match_routes(store)
+    return cronometrar(analyze_carriers_routes.write_results, args, store, resultados, grupos)
+
+def routes_total(entrada, salida):
+    return cronometrar(analyze_carriers_routes.main, ['--input', entrada, '--output', salida, '--no-store-cache'])
+
+def routes_streaming(entrada, salida):
+    return cronometrar(analyze_carriers_routes.main, ['--input', entrada, '--output', salida,
+                                                      '--no-store-cache', '--streaming'])
+
+def routes_workers(entrada, salida):
+    return cronometrar(analyze_carriers_routes.main, ['--input', entrada, '--output', salida, '--no-store-cache',
+                                                      '--workers', str(WORKERS)])
+
+CASOS = {
+    'analyze_carriers': ac_total,
+    'analyze_carriers.workers': ac_workers,
+    'analyze_carriers.parse': ac_parse,
+    'analyze_carriers.match': ac_match,
+    'routes': routes_total,
+    'routes.streaming': routes_streaming,
+    'routes.workers': routes_workers,
+    'routes.parse': routes_parse,
+    'routes.match': routes_match,
+    'routes.write': routes_write,
+}
+
+# Motor vectorizado de analyze_carriers.py (solo si NumPy está instalado), para comparar
+# con analyze_carriers y analyze_carriers.match
+if vector_match.available():
+    CASOS.update({
+        'analyze_carriers.numpy': ac_numpy,
+        'analyze_carriers.match.numpy': ac_match_numpy,
+    })
+
+def peak_rss_mb():
+    """Pico de memoria residente de este proceso y sus hijos (workers), en MB"""
+    pico = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return pico / (1 << 20) if sys.platform == 'darwin' else pico / 1024
+
+def ejecutar_caso(caso, entrada, salida):
+    """Corre un caso en un proceso nuevo, para que el pico de memoria sea solo suyo"""
+    resultado = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', caso,
+                                '--input', entrada, '--output', salida],
+                               check=True, capture_output=True, text=True)
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+def datos_sinteticos(filas, semilla, directorio):
+    """Ruta del Carriers.csv sintético de ese tamaño (se genera solo la primera vez)"""
+    path = os.path.join(directorio, f"carriers_{filas}_{semilla}.csv")
+    if not os.path.exists(path):
+        print(f"Generando {path}...")
+        temporal = path + '.tmp'
+        generar(temporal, filas, semilla)
+        os.replace(temporal, path)
+    return path
+
+def comparar(resultados, baseline, tolerancia):
+    """Imprime la comparación contra el baseline y devuelve los casos que empeoraron"""
+    previos = {(r['case'], r['rows']): r for r in baseline.get('results', [])}
+    regresiones = []
+    print("\nComparación contra el baseline:")
+    for r in resultados:
+        previo = previos.get((r['case'], r['rows']))
+        if previo is None:
+            continue
+        cambio = r['rows_per_sec'] / previo['rows_per_sec'] - 1
+        marca = ''
+        if cambio < -tolerancia:
+            marca = '  ← REGRESIÓN'
+            regresiones.append(r['case'])
+        print(f"  {r['case']:<26} {r['rows']:>10} filas: {previo['rows_per_sec']:>10.0f} → "
+              f"{r['rows_per_sec']:>10.0f} filas/s ({cambio:+.1%}){marca}")
+    return regresiones
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--sizes', default='10k', help=f"tamaños separados por coma ({', '.join(SIZES)})")
+    parser.add_argument('--cases', default=','.join(CASOS), help="casos a medir, separados por coma")
+    parser.add_argument('--seed', type=int, default=1, help="semilla del archivo sintético")
+    parser.add_argument('--repeat', type=int, default=1, help="repeticiones por caso (se toma la mejor)")
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(),
+                        help="directorio para los archivos sintéticos (se reutilizan)")
+    parser.add_argument('--input', default=None, help="usar este Carriers.csv en lugar del sintético")
+    parser.add_argument('--results', default='benchmark_results.json', help="archivo JSON de resultados")
+    parser.add_argument('--baseline', default=None, help="JSON de resultados anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="pérdida de filas/s aceptada contra el baseline (0.10 = 10%%)")
+    parser.add_argument('--output', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.child:
+        segundos = CASOS[args.child](args.input, args.output)
+        print(json.dumps({'seconds': segundos, 'peak_rss_mb': peak_rss_mb()}))
+        return
+
+    casos = [c.strip() for c in args.cases.split(',') if c.strip()]
+    desconocidos = [c for c in casos if c not in CASOS]
+    if desconocidos:
+        raise SystemExit(f"Casos desconocidos: {', '.join(desconocidos)}")
+
+    if args.input:
+        entradas = [args.input]
+    else:
+        entradas = [datos_sinteticos(parse_rows(t), args.seed, args.data_dir) for t in args.sizes.split(',')]
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        salida = os.path.join(directorio, 'carriers_12_rutas.csv')
+        for entrada in entradas:
+            with open(entrada, 'r', encoding='utf-8', newline='') as f:
+                filas = sum(1 for _ in csv.reader(f)) - 1
+            for caso in casos:
+                mediciones = [ejecutar_caso(caso, entrada, salida) for _ in range(args.repeat)]
+                segundos = min(m['seconds'] for m in mediciones)
+                r = {
+                    'case': caso,
+                    'rows': filas,
+                    'seconds': round(segundos, 4),
+                    'rows_per_sec': round(filas / segundos, 1) if segundos else 0.0,
+                    'peak_rss_mb': round(max(m['peak_rss_mb'] for m in mediciones), 1),
+                }
+                resultados.append(r)
+                print(f"{caso:<26} {filas:>10} filas  {r['seconds']:>9.3f} s  "
+                      f"{r['rows_per_sec']:>10.0f} filas/s  {r['peak_rss_mb']:>8.1f} MB")
+
+    reporte = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': resultados,
+    }
+    with open(args.results, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.results}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regresiones = comparar(resultados, baseline, args.tolerance)
+        if regresiones:
+            print(f"\n✗ {len(regresiones)} caso(s) más lentos que el baseline")
+            raise SystemExit(1)
+        print("\n✓ Sin regresiones contra el baseline")
+
+if __name__ == "__main__":
+    main()
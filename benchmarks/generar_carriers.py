@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Genera un Carriers.csv sintético con distribuciones parecidas a las reales
+"""
+
+import argparse
+import csv
+import random
+
+COLUMNAS = ['BAN', 'COMPANY TYPE', 'COMPANY NAME', 'CONTACT NAME', 'EMAIL', 'PHONE #',
+            'ADDRESS', 'CITY', 'STATE', 'COUNTRY', 'DATA ORIGIN']
+
+# (ciudad, variantes de estado, país, peso). Unas pocas ciudades concentran la
+# mayoría de los carriers y el mismo estado aparece escrito de varias formas.
+UBICACIONES = [
+    ('Laredo', ['TX', 'Texas', 'tx', 'Texas '], 'United States', 60),
+    ('Houston', ['TX', 'Texas'], 'United States', 55),
+    ('Dallas', ['TX', 'Texas'], 'United States', 45),
+    ('San Antonio', ['TX', 'Texas'], 'United States', 35),
+    ('El Paso', ['TX', 'Texas'], 'United States', 30),
+    ('McAllen', ['TX'], 'United States', 20),
+    ('Carrollton', ['TX'], 'United States', 6),
+    ('Sweetwater', ['TX'], 'United States', 2),
+    ('Los Angeles', ['CA', 'California'], 'United States', 40),
+    ('Pico Rivera', ['CA'], 'United States', 4),
+    ('Chicago', ['IL', 'Illinois'], 'United States', 35),
+    ('Atlanta', ['GA', 'Georgia'], 'United States', 25),
+    ('Kansas City', ['MO', 'Missouri'], 'United States', 10),
+    ('Independence', ['MO'], 'United States', 3),
+    ('Detroit', ['MI', 'Michigan'], 'United States', 12),
+    ('Saint Clair', ['MI'], 'United States', 1),
+    ('New York', ['NY', 'New York'], 'United States', 15),
+    ('Monterrey', ['NL', 'Nuevo León', 'Nuevo Leon'], 'Mexico', 30),
+    ('San Nicolás de los Garza', ['NL', 'Nuevo León'], 'Mexico', 8),
+    ('General Escobedo', ['NL', 'Nuevo Leon'], 'Mexico', 5),
+    ('Nuevo Laredo', ['TM', 'Tamaulipas'], 'Mexico', 25),
+    ('Reynosa', ['TM', 'Tamaulipas'], 'Mexico', 12),
+    ('Ciudad de México', ['CDMX', 'DF'], 'Mexico', 30),
+    ('Cuautitlán', ['EM', 'Estado de México', 'EDOMX'], 'Mexico', 8),
+    ('Cuautitlán Izcalli', ['EM', 'EDOMX'], 'Mexico', 6),
+    ('Tultitlán', ['EM', 'MX'], 'Mexico', 5),
+    ('Tlalnepantla', ['EDOMX', 'Estado de México'], 'Mexico', 8),
+    ('Toluca', ['EM'], 'Mexico', 6),
+    ('San Mateo Atenco', ['EM'], 'Mexico', 1),
+    ('Ciudad López Mateos', ['EDOMX'], 'Mexico', 2),
+    ('El Pino', ['MX'], 'Mexico', 1),
+    ('Guadalajara', ['JAL', 'Jalisco'], 'Mexico', 20),
+    ('Querétaro', ['QRO', 'Querétaro', 'Queretaro'], 'Mexico', 12),
+    ('San Juan del Río', ['QRO', 'Queretaro'], 'Mexico', 4),
+    ('Morelia', ['MICH', 'Michoacán', 'MI'], 'Mexico', 6),
+    ('Ramos Arizpe', ['COAH', 'Coahuila'], 'Mexico', 5),
+    ('Saltillo', ['COAH'], 'Mexico', 10),
+    ('Hidalgo del Parral', ['CHIH'], 'Mexico', 2),
+    ('Ciudad Juárez', ['CHIH', 'Chihuahua'], 'Mexico', 15),
+    ('Puebla', ['PU', 'Puebla'], 'Mexico', 10),
+    ('Toronto', ['ON', 'Ontario'], 'Canada', 15),
+    ('Brantford', ['ON'], 'Canada', 2),
+    ('Montreal', ['QC', 'Quebec'], 'Canada', 10),
+    ('Vancouver', ['BC'], 'Canada', 8),
+    ('', [''], '', 6),
+    ('None', ['None'], 'None', 2),
+]
+
+TIPOS = ['CARRIER'] * 85 + ['BROKER'] * 10 + ['SHIPPER'] * 5
+ORIGENES = ['FMCSA', 'DAT', 'Truckstop', 'Manual']
+NOMBRES = ['Transportes', 'Fletes', 'Logistics', 'Trucking', 'Express', 'Freight', 'Carga']
+SUFIJOS = ['SA de CV', 'Inc', 'LLC', 'Ltd', '']
+
+def parse_rows(texto):
+    """Convierte '10k', '1M', '10M' o un número en cantidad de filas"""
+    texto = texto.strip().upper()
+    multiplicador = {'K': 1000, 'M': 1000000}.get(texto[-1:], 1)
+    if multiplicador != 1:
+        texto = texto[:-1]
+    return int(float(texto) * multiplicador)
+
+def generar(path, filas, semilla=1):
+    """
+    Escribe 'filas' registros en path. Cada BAN tiene de 1 a 4 contactos (misma
+    empresa y ubicación, distinto email/teléfono), como en el archivo real.
+    """
+    rnd = random.Random(semilla)
+    ciudades = [u[:3] for u in UBICACIONES]
+    pesos = [u[3] for u in UBICACIONES]
+    escritas = 0
+    ban = 100000
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNAS)
+        while escritas < filas:
+            ban += 1
+            ciudad, estados, pais = rnd.choices(ciudades, pesos)[0]
+            estado = rnd.choice(estados)
+            tipo = rnd.choice(TIPOS)
+            nombre = f"{rnd.choice(NOMBRES)} {rnd.choice(NOMBRES)} {ban}"
+            sufijo = rnd.choice(SUFIJOS)
+            if sufijo:
+                nombre = f"{nombre}, {sufijo}"
+            origen = rnd.choice(ORIGENES)
+            contactos = min(rnd.choices([1, 2, 3, 4], [55, 25, 12, 8])[0], filas - escritas)
+            for contacto in range(contactos):
+                direccion = f"Calle {rnd.randint(1, 999)}"
+                if rnd.random() < 0.05:
+                    direccion += f"\nInt. {rnd.randint(1, 20)}"
+                row = [ban, tipo, nombre, f"Contacto {contacto + 1}",
+                       f"ops{contacto}@carrier{ban}.com", f"+1 555 {rnd.randint(0, 9999999):07d}",
+                       direccion, ciudad, estado, pais, origen]
+                if rnd.random() < 0.005:
+                    row = row[:rnd.randint(3, 9)]  # filas incompletas
+                writer.writerow(row)
+            escritas += contactos
+    return escritas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', default='10k', help="filas a generar (p. ej. 10k, 1M, 10M)")
+    parser.add_argument('--seed', type=int, default=1, help="semilla del generador")
+    parser.add_argument('--output', required=True, help="archivo CSV de salida")
+    args = parser.parse_args(argv)
+    filas = generar(args.output, parse_rows(args.rows), args.seed)
+    print(f"{filas} filas escritas en {args.output}")
+
+if __name__ == "__main__":
+    main()
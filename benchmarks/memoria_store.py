@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara la memoria de un dict por fila contra el almacén columnar (CarrierStore)
+"""
+
+import argparse
+import csv
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_carriers
+import analyze_carriers_routes
+from carrier_store import CarrierStore
+
+def medir(cargar):
+    """Devuelve (filas, bytes retenidos por la estructura que devuelve cargar())"""
+    gc.collect()
+    tracemalloc.start()
+    estructura = cargar()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(estructura), actual
+
+def filas_csv(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from csv.reader(f)
+
+def dicts_analyze_carriers(path):
+    return [dict(zip(analyze_carriers.CAMPOS_CARRIER, analyze_carriers.carrier_desde_fila(row)))
+            for row in filas_csv(path) if len(row) >= 10]
+
+def store_analyze_carriers(path):
+    store = CarrierStore(analyze_carriers.CAMPOS_CARRIER, encoded=analyze_carriers.CAMPOS_CODIFICADOS)
+    for row in filas_csv(path):
+        if len(row) >= 10:
+            store.append(analyze_carriers.carrier_desde_fila(row))
+    return store
+
+def dicts_routes(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(analyze_carriers_routes.carrier_rows(csv.DictReader(f)))
+
+def store_routes(path):
+    store = analyze_carriers_routes.new_store()
+    for carrier in analyze_carriers_routes.iter_carriers(path, analyze_carriers_routes.STORE_COLUMNS):
+        store.append(analyze_carriers_routes.carrier_values(carrier.campos))
+    return store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', required=True, help="archivo Carriers.csv")
+    args = parser.parse_args(argv)
+
+    casos = [
+        ('analyze_carriers', dicts_analyze_carriers, store_analyze_carriers),
+        ('analyze_carriers_routes', dicts_routes, store_routes),
+    ]
+    for nombre, dicts, store in casos:
+        filas, bytes_dicts = medir(lambda: dicts(args.input))
+        _, bytes_store = medir(lambda: store(args.input))
+        print(f"{nombre}: {filas} filas")
+        print(f"  dict por fila:  {bytes_dicts / 1e6:8.1f} MB ({bytes_dicts / max(filas, 1):.0f} B/fila)")
+        print(f"  CarrierStore:   {bytes_store / 1e6:8.1f} MB ({bytes_store / max(filas, 1):.0f} B/fila)")
+        print(f"  reducción:      {1 - bytes_store / max(bytes_dicts, 1):.1%}")
+
+if __name__ == "__main__":
+    main()
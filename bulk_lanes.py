@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mapea carriers contra miles de lanes leídas de un archivo (JSON o CSV)
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import compressed_io
+import normalization_cache
+import profiling
+from analyze_carriers_routes import ARCHIVO_CARRIERS, OUTPUT_FIELDNAMES, build_output_row, load_carriers
+from lane_index import LANE_ROLES, LaneIndex, roles_label
+
+ARCHIVO_SALIDA = '/home/user/carriers-fr8/carriers_lanes.csv'
+
+# Columnas del CSV de lanes: LANE, DESCRIPCION, TIPO y <PAPEL>_<PARTE> (p. ej. ORIGEN_CIUDAD)
+LANE_PARTS = ('ciudad', 'estado', 'pais')
+
+# Columnas del resumen por lane (--summary)
+SUMMARY_FIELDNAMES = ['LANE', 'CARRIERS_UNICOS', 'REGISTROS']
+
+def lane_from_csv_row(row):
+    """Lane con la forma de RUTAS a partir de una fila del CSV de lanes"""
+    lane = {'descripcion': row.get('DESCRIPCION') or '', 'tipo': row.get('TIPO') or ''}
+    for campo, rol in LANE_ROLES:
+        ubicacion = {parte: (row.get(f"{rol}_{parte.upper()}") or '').strip() for parte in LANE_PARTS}
+        if any(ubicacion.values()):
+            lane[campo] = ubicacion
+    return lane
+
+def load_lanes(path):
+    """
+    Lee las lanes de un JSON con la forma de RUTAS ({nombre: lane} o una lista de
+    lanes con 'nombre') o de un CSV con columnas LANE, DESCRIPCION, TIPO,
+    ORIGEN_CIUDAD, ORIGEN_ESTADO, ORIGEN_PAIS, DESTINO_* y CRUCE_* (opcionales)
+    """
+    sin_compresion = path[:len(path) - len(compressed_io.compressed_suffix(path))]
+    with compressed_io.open_input(path, newline='') as f:
+        if sin_compresion.lower().endswith('.json'):
+            datos = json.load(f)
+            if isinstance(datos, list):
+                pares = [(lane.get('nombre'), lane) for lane in datos]
+            else:
+                pares = list(datos.items())
+        else:
+            pares = [(row.get('LANE'), lane_from_csv_row(row)) for row in csv.DictReader(f)]
+
+    lanes = {}
+    for n, (nombre, lane) in enumerate(pares, 1):
+        if not nombre:
+            raise SystemExit(f"{path}: la lane {n} no tiene nombre")
+        if nombre in lanes:
+            raise SystemExit(f"{path}: lane repetida: {nombre}")
+        if not any(lane.get(campo) for campo, _ in LANE_ROLES):
+            raise SystemExit(f"{path}: la lane {nombre} no tiene origen, destino ni cruce")
+        for campo, _ in LANE_ROLES:
+            ubicacion = lane.get(campo)
+            if ubicacion and not ubicacion.get('pais'):
+                raise SystemExit(f"{path}: la lane {nombre} no tiene país de {campo}")
+        lanes[nombre] = dict(lane, descripcion=lane.get('descripcion', ''), tipo=lane.get('tipo', ''))
+    return lanes
+
+def match_lanes(index, lanes):
+    """
+    Genera (lane, filas en orden de salida, {código de ubicación: papeles}) por
+    lane en orden de nombre; cada lane se resuelve con búsquedas en el índice
+    """
+    for nombre in sorted(lanes):
+        filas, roles = index.lane_rows(lanes[nombre])
+        yield nombre, filas, roles
+
+def location_columns(index, ubicacion, papeles):
+    """Valores de CITY, STATE, STATE_NORMALIZADO, COUNTRY y UBICACION_EN_RUTA de una ubicación"""
+    row = build_output_row('', {'descripcion': '', 'tipo': ''}, index.store.record(index.filas[ubicacion][0]),
+                           'ORIGEN' in papeles, 'DESTINO' in papeles)
+    return row['CITY'], row['STATE'], row['STATE_NORMALIZADO'], row['COUNTRY'], roles_label(papeles)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', default=ARCHIVO_CARRIERS,
+                        help="archivo Carriers.csv (puede estar comprimido con gzip, bz2 o xz)")
+    parser.add_argument('--lanes', required=True, help="archivo de lanes (.json o .csv)")
+    parser.add_argument('--output', default=ARCHIVO_SALIDA,
+                        help="archivo CSV de resultados (.gz, .bz2 o .xz para comprimirlo)")
+    parser.add_argument('--summary', default=None, metavar='CSV',
+                        help="escribir carriers únicos y registros por lane en este CSV")
+    parser.add_argument('--cache-size', type=int, default=normalization_cache.DEFAULT_MAXSIZE,
+                        help="entradas máximas de la caché de normalización")
+    parser.add_argument('--store-cache', default=None,
+                        help="caché binaria de carriers parseados (por defecto <input>.store)")
+    parser.add_argument('--no-store-cache', action='store_true',
+                        help="no leer ni escribir la caché binaria de carriers")
+    parser.add_argument('--profile', default=None, metavar='JSON',
+                        help="guardar tiempos por etapa y contadores en este archivo JSON")
+    args = parser.parse_args(argv)
+    # load_carriers lee todo el archivo en un solo proceso
+    args.workers = 1
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    normalization_cache.configure(args.cache_size)
+    if args.profile:
+        profiling.enable()
+
+    with profiling.stage('load_lanes'):
+        lanes = load_lanes(args.lanes)
+    print(f"Lanes leídas de {args.lanes}: {len(lanes)}")
+
+    print("Leyendo archivo carriers.csv...")
+    store, total_carriers = load_carriers(args)
+    print(f"Total de registros de carriers encontrados: {total_carriers}")
+    with profiling.stage('index'):
+        index = LaneIndex(store)
+        index.rank()
+
+    columnas = [store.column(columna) for columna in ('BAN', 'COMPANY NAME', 'EMAIL', 'PHONE #', 'DATA ORIGIN')]
+    bans, nombres, emails, phones, origenes = columnas
+    resumen = []
+    registros = 0
+    print(f"\nGenerando archivo {os.path.basename(args.output)}...")
+    with profiling.stage('write'), compressed_io.open_output(args.output) as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_FIELDNAMES)
+        for nombre, filas, roles in profiling.iterate('match', match_lanes(index, lanes)):
+            lane = lanes[nombre]
+            # Columnas de la ubicación (CITY ... UBICACION_EN_RUTA) una vez por ubicación de la lane
+            por_ubicacion = {ubicacion: location_columns(index, ubicacion, papeles)
+                             for ubicacion, papeles in roles.items()}
+            unicos = set()
+            for i in filas:
+                ubicacion = index.ubicaciones[i]
+                # Mismas columnas que build_output_row, en el orden de OUTPUT_FIELDNAMES
+                writer.writerow([nombre, lane['descripcion'], lane['tipo'], bans[i], nombres[i],
+                                 *por_ubicacion[ubicacion], emails[i], phones[i], origenes[i]])
+                unicos.add((bans[i], nombres[i]) + index.claves_ubicacion[ubicacion])
+            resumen.append({'LANE': nombre, 'CARRIERS_UNICOS': len(unicos), 'REGISTROS': len(filas)})
+            registros += len(filas)
+
+    con_carriers = sum(1 for r in resumen if r['REGISTROS'])
+    print(f"✓ Archivo generado con {registros} registros totales")
+    print(f"  Lanes con carriers: {con_carriers} de {len(lanes)}")
+    profiling.set_counter('lanes', len(lanes))
+    profiling.set_counter('rows_carrier', total_carriers)
+    profiling.set_counter('rows_written', registros)
+
+    if args.summary:
+        with compressed_io.open_output(args.summary) as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(resumen)
+        print(f"✓ Resumen por lane guardado en {args.summary}")
+
+    normalization_cache.print_stats()
+    if args.profile:
+        profiling.write_report(args.profile, script='bulk_lanes', input=args.input, lanes=args.lanes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agrupación por hash de las coincidencias por ruta y carrier único
+"""
+
+from collections import defaultdict
+
+class CarrierGroup:
+    """Un carrier único dentro de una ruta: su primera fila y sus contactos distintos"""
+
+    __slots__ = ('muestra', 'registros', 'emails', 'phones', 'origins')
+
+    def __init__(self, muestra):
+        self.muestra = muestra
+        self.registros = 0
+        # dicts como conjuntos ordenados: conservan el orden de aparición
+        self.emails = {}
+        self.phones = {}
+        self.origins = {}
+
+class CarrierGroups:
+    """
+    Tabla hash ruta → clave de carrier único → CarrierGroup, llenada en una sola
+    pasada sobre las coincidencias. La memoria, el resumen y la salida agrupada
+    dependen del número de carriers únicos, no del número de filas.
+
+    Con contacts=False solo se cuentan registros (para el resumen) y no se
+    guardan emails, teléfonos ni orígenes.
+    """
+
+    def __init__(self, contacts=True):
+        self.contacts = contacts
+        self._rutas = defaultdict(dict)
+
+    def add(self, ruta, clave, muestra, email=None, phone=None, origin=None):
+        """Registra una fila; muestra solo se guarda para la primera fila del carrier"""
+        grupos = self._rutas[ruta]
+        grupo = grupos.get(clave)
+        if grupo is None:
+            grupo = grupos[clave] = CarrierGroup(muestra)
+        grupo.registros += 1
+        if self.contacts:
+            if email:
+                grupo.emails[email] = None
+            if phone:
+                grupo.phones[phone] = None
+            if origin:
+                grupo.origins[origin] = None
+
+    def routes(self):
+        return sorted(self._rutas)
+
+    def unique_count(self, ruta):
+        return len(self._rutas.get(ruta, ()))
+
+    def record_count(self, ruta):
+        return sum(grupo.registros for grupo in self._rutas.get(ruta, {}).values())
+
+    def groups(self, ruta):
+        """Grupos de una ruta en orden de primera aparición"""
+        return list(self._rutas.get(ruta, {}).values())
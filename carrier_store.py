@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén columnar de carriers con columnas codificadas por diccionario
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+class DictionaryColumn:
+    """Columna codificada: un código entero por fila y una tabla de valores distintos"""
+
+    __slots__ = ('codes', 'values', '_index')
+
+    def __init__(self):
+        self.codes = array('I')
+        self.values = []
+        self._index = {}
+
+    def encode(self, value):
+        """Devuelve el código de un valor, agregándolo a la tabla si es nuevo"""
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._index[value] = code
+        return code
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __len__(self):
+        return len(self.codes)
+
+class CarrierRecord:
+    """Vista de una fila del almacén con la interfaz de lectura de un dict"""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, campo):
+        return self.store._columns[campo][self.index]
+
+    def get(self, campo, default=None):
+        columna = self.store._columns.get(campo)
+        if columna is None:
+            return default
+        return columna[self.index]
+
+    def __contains__(self, campo):
+        return campo in self.store._columns
+
+class CarrierStore:
+    """
+    Tabla de carriers por columnas. Las columnas de baja cardinalidad (ciudad,
+    estado, país, origen de datos) se guardan como códigos enteros en un array
+    y el resto como listas de cadenas, en lugar de un dict por fila.
+    """
+
+    def __init__(self, columns, encoded=()):
+        self.columns = tuple(columns)
+        self._columns = {
+            nombre: DictionaryColumn() if nombre in encoded else []
+            for nombre in self.columns
+        }
+        self._ordered = [self._columns[nombre] for nombre in self.columns]
+        self._len = 0
+
+    @classmethod
+    def from_columns(cls, columnas, length):
+        """Crea un almacén a partir de columnas ya construidas (p. ej. cargadas con mmap)"""
+        store = cls(columnas.keys())
+        store._columns = dict(columnas)
+        store._ordered = [store._columns[nombre] for nombre in store.columns]
+        store._len = length
+        return store
+
+    def append(self, valores):
+        """Agrega una fila con los valores en el orden de self.columns"""
+        for columna, valor in zip(self._ordered, valores):
+            columna.append(valor)
+        self._len += 1
+        return self._len - 1
+
+    def __len__(self):
+        return self._len
+
+    def column(self, nombre):
+        return self._columns[nombre]
+
+    def record(self, i):
+        return CarrierRecord(self, i)
+
+    def values(self, i):
+        """Valores de la fila i en el orden de self.columns"""
+        return tuple(columna[i] for columna in self._ordered)
+
+    def combined_codes(self, nombres):
+        """
+        Asigna un código a cada combinación distinta de las columnas codificadas
+        indicadas. Devuelve (código por fila, primera fila de cada combinación),
+        para evaluar algo una vez por combinación en lugar de una vez por fila.
+        """
+        columnas = [self._columns[nombre].codes for nombre in nombres]
+        codigos = array('I')
+        representantes = []
+        combinaciones = {}
+        for i, clave in enumerate(zip(*columnas)):
+            codigo = combinaciones.get(clave)
+            if codigo is None:
+                codigo = len(representantes)
+                combinaciones[clave] = codigo
+                representantes.append(i)
+            codigos.append(codigo)
+        return codigos, representantes
+
+# Persistencia del almacén en un archivo binario que se carga con mmap:
+#   MAGIC | secciones de datos | metadatos JSON | longitud de los metadatos (uint64)
+STORE_MAGIC = b'CFR8STORE\x01'
+_FOOTER = struct.Struct('<Q')
+
+class MappedStringColumn:
+    """Columna de texto de solo lectura sobre un mmap: blob UTF-8 + offsets"""
+
+    __slots__ = ('_blob', '_offsets', '_nulls')
+
+    def __init__(self, blob, offsets, nulls=None):
+        self._blob = blob
+        self._offsets = offsets
+        self._nulls = nulls
+
+    def __getitem__(self, i):
+        if self._nulls is not None and self._nulls[i]:
+            return None
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+def file_fingerprint(path, content_hash=True):
+    """Tamaño, mtime y (opcionalmente) hash BLAKE2b del contenido de un archivo"""
+    stat = os.stat(path)
+    huella = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if content_hash:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                digest.update(bloque)
+        huella['blake2b'] = digest.hexdigest()
+    return huella
+
+def fingerprint_matches(huella, path):
+    """
+    Verifica que el archivo fuente siga siendo el de la huella: un tamaño distinto
+    lo invalida; con el mismo tamaño y mtime se acepta sin leerlo, y si solo
+    cambió el mtime se compara el hash del contenido.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != huella.get('size'):
+        return False
+    if stat.st_mtime_ns == huella.get('mtime_ns'):
+        return True
+    return file_fingerprint(path)['blake2b'] == huella.get('blake2b')
+
+def save_store(store, path, huella):
+    """Escribe el almacén en 'path' (de forma atómica) junto con la huella de su fuente"""
+    directorio = os.path.dirname(os.path.abspath(path))
+    fd, temporal = tempfile.mkstemp(prefix='.carriers-store-', dir=directorio)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(STORE_MAGIC)
+            columnas = []
+            for nombre in store.columns:
+                columna = store.column(nombre)
+                if isinstance(columna, DictionaryColumn):
+                    columnas.append({'name': nombre, 'kind': 'dict', 'values': columna.values,
+                                     'codes': _write_array(f, columna.codes)})
+                else:
+                    columnas.append(dict(_write_strings(f, columna), name=nombre, kind='str'))
+            metadatos = json.dumps({
+                'source': huella,
+                'rows': len(store),
+                'byteorder': sys.byteorder,
+                'columns': columnas,
+            }).encode('utf-8')
+            f.write(metadatos)
+            f.write(_FOOTER.pack(len(metadatos)))
+        os.replace(temporal, path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+
+def _write_array(f, valores):
+    """Escribe un array alineado a 8 bytes y devuelve (offset, longitud en bytes)"""
+    f.write(b'\0' * (-f.tell() % 8))
+    inicio = f.tell()
+    valores.tofile(f)
+    return inicio, f.tell() - inicio
+
+def _write_strings(f, columna):
+    """Escribe una columna de texto como blob UTF-8 + offsets (+ máscara de None)"""
+    offsets = array('Q', [0])
+    nulls = bytearray()
+    inicio_blob = f.tell()
+    for valor in columna:
+        if valor is None:
+            nulls.append(1)
+            valor = ''
+        else:
+            nulls.append(0)
+        datos = valor.encode('utf-8')
+        f.write(datos)
+        offsets.append(offsets[-1] + len(datos))
+    seccion = {'blob': (inicio_blob, offsets[-1]), 'offsets': _write_array(f, offsets)}
+    if any(nulls):
+        seccion['nulls'] = (f.tell(), len(nulls))
+        f.write(nulls)
+    return seccion
+
+def load_store(path, source_path, columns=None, encoded=()):
+    """
+    Carga con mmap un almacén guardado con save_store. Devuelve None si no
+    existe, está dañado, su archivo fuente cambió desde que se generó o (si se
+    indican 'columns' y 'encoded', como en CarrierStore) se guardó con otras
+    columnas o codificaciones. Las columnas quedan de solo lectura y
+    respaldadas por el archivo.
+    """
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    with f:
+        try:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # archivo vacío
+            return None
+
+    try:
+        if mapa[:len(STORE_MAGIC)] != STORE_MAGIC:
+            return None
+        (largo,) = _FOOTER.unpack_from(mapa, len(mapa) - _FOOTER.size)
+        inicio_meta = len(mapa) - _FOOTER.size - largo
+        metadatos = json.loads(bytes(mapa[inicio_meta:inicio_meta + largo]).decode('utf-8'))
+    except (struct.error, ValueError):
+        return None
+    if metadatos.get('byteorder') != sys.byteorder:
+        return None
+    if columns is not None:
+        esperadas = [(nombre, 'dict' if nombre in encoded else 'str') for nombre in columns]
+        if [(meta['name'], meta['kind']) for meta in metadatos['columns']] != esperadas:
+            return None
+    if not fingerprint_matches(metadatos['source'], source_path):
+        return None
+
+    vista = memoryview(mapa)
+    def seccion(rango, formato=None):
+        inicio, largo = rango
+        datos = vista[inicio:inicio + largo]
+        return datos.cast(formato) if formato else datos
+
+    columnas = {}
+    for meta in metadatos['columns']:
+        if meta['kind'] == 'dict':
+            columna = DictionaryColumn()
+            columna.codes = seccion(meta['codes'], 'I')
+            columna.values = meta['values']
+            columna._index = {valor: codigo for codigo, valor in enumerate(columna.values)}
+        else:
+            columna = MappedStringColumn(seccion(meta['blob']), seccion(meta['offsets'], 'Q'),
+                                         seccion(meta['nulls']) if 'nulls' in meta else None)
+        columnas[meta['name']] = columna
+
+    return CarrierStore.from_columns(columnas, metadatos['rows'])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API de librería: coincidencias de carriers contra rutas sin pasar por archivos CSV
+
+    from carriers_api import match_carriers, read_carriers
+    for m in match_carriers(read_carriers('Carriers.csv'), RUTAS):
+        print(m.route, m.carrier['COMPANY NAME'], m.match_type)
+
+Acepta rutas en los dos formatos del repositorio:
+  - 'rutas' de analyze_carriers.py: listas de estados/ciudades por rol y cruce
+    opcional; coincidencia por subcadenas (IndiceRutas), con radio opcional.
+  - 'RUTAS' de analyze_carriers_routes.py: ubicaciones {ciudad, estado, pais}
+    con valores separados por |; coincidencia exacta normalizada
+    (carrier_matches_location). Una ruta puede tener además 'cruce'.
+"""
+
+import csv
+from collections import namedtuple
+
+import compressed_io
+from analyze_carriers import IndiceRutas
+from analyze_carriers_routes import carrier_matches_location, carrier_rows, compile_location
+from gazetteer import GAZETTEER_PATH
+from lane_index import LANE_ROLES, roles_label
+
+# Una coincidencia: carrier es el registro recibido, tal cual. match_type es el
+# tipo de analyze_carriers.py ('ORIGEN, ORIGEN_CIUDAD', ...) o UBICACION_EN_RUTA
+# de analyze_carriers_routes.py ('ORIGEN y DESTINO', ...); distance_km solo se
+# llena en coincidencias por radio.
+CarrierMatch = namedtuple('CarrierMatch', ['route', 'carrier', 'match_type', 'distance_km'])
+
+# Columna de Carriers.csv → campo equivalente de analyze_carriers.py
+FIELD_ALIASES = {'STATE': 'estado', 'CITY': 'ciudad', 'COUNTRY': 'pais'}
+
+def route_format(routes):
+    """'rutas' (formato de analyze_carriers.py) o 'RUTAS' (formato de analyze_carriers_routes.py)"""
+    formatos = set()
+    for nombre, info in routes.items():
+        origen = info.get('origen')
+        if isinstance(origen, dict):
+            formatos.add('RUTAS')
+        elif isinstance(origen, (list, tuple)):
+            formatos.add('rutas')
+        else:
+            raise ValueError(f"{nombre}: 'origen' debe ser una lista de estados o una ubicación")
+    if len(formatos) > 1:
+        raise ValueError("las rutas mezclan los formatos de analyze_carriers.py y analyze_carriers_routes.py")
+    return formatos.pop() if formatos else 'rutas'
+
+def location_of(carrier):
+    """(estado, ciudad, país) de un registro con columnas de Carriers.csv o campos de analyze_carriers.py"""
+    return tuple(carrier.get(columna, carrier.get(campo)) for columna, campo in FIELD_ALIASES.items())
+
+class RouteMatcher:
+    """
+    Rutas compiladas una sola vez. match(carrier) devuelve
+    [(ruta, tipo_coincidencia, distancia_km)]; el resultado solo depende de la
+    ubicación del carrier y se memoriza por (estado, ciudad, país).
+    """
+
+    def __init__(self, routes, radius_km=None, gazetteer_path=GAZETTEER_PATH):
+        self.routes = routes
+        self.format = route_format(routes)
+        self.memo = {}
+        self.indice = None
+        self.ubicaciones = None
+        if self.format == 'rutas':
+            self.indice = IndiceRutas(routes, radius_km, gazetteer_path)
+        elif radius_km is not None:
+            raise ValueError("radius_km solo se admite con rutas en el formato de analyze_carriers.py")
+        else:
+            # Ubicaciones compiladas por ruta: [(papel, RouteLocation)]
+            self.ubicaciones = {nombre: [(rol, compile_location(info[campo])) for campo, rol in LANE_ROLES
+                                         if info.get(campo)]
+                                for nombre, info in routes.items()}
+
+    def match(self, carrier):
+        ubicacion = location_of(carrier)
+        resultado = self.memo.get(ubicacion)
+        if resultado is None:
+            if self.indice is not None:
+                estado, ciudad, pais = ubicacion
+                resultado = tuple(self.indice.analizar_ubicacion(estado or '', ciudad or '', pais or ''))
+            else:
+                resultado = self._match_locations(dict(zip(('STATE', 'CITY', 'COUNTRY'), ubicacion)))
+            self.memo[ubicacion] = resultado
+        return resultado
+
+    def _match_locations(self, carrier):
+        """Como match_location de analyze_carriers_routes.py (modo exacto), para estas rutas"""
+        resultado = []
+        for nombre, ubicaciones in self.ubicaciones.items():
+            roles = [rol for rol, ubicacion in ubicaciones if carrier_matches_location(carrier, ubicacion)]
+            if roles:
+                resultado.append((nombre, roles_label(roles), None))
+        return tuple(resultado)
+
+def match_carriers(carriers, routes, radius_km=None, gazetteer_path=GAZETTEER_PATH):
+    """
+    Genera un CarrierMatch por cada (carrier, ruta) que coincide, en el orden de
+    'carriers' y de las rutas. carriers puede ser cualquier iterable de dicts
+    (p. ej. filas de csv.DictReader o de read_carriers); routes, un RouteMatcher
+    o un dict de rutas en cualquiera de los dos formatos.
+    """
+    matcher = routes if isinstance(routes, RouteMatcher) else RouteMatcher(routes, radius_km, gazetteer_path)
+    for carrier in carriers:
+        for ruta, tipo, distancia in matcher.match(carrier):
+            yield CarrierMatch(ruta, carrier, tipo, distancia)
+
+def read_carriers(path, carriers_only=True):
+    """
+    Genera las filas de Carriers.csv (comprimido o no) como dicts; con
+    carriers_only solo las de COMPANY TYPE = CARRIER, como analyze_carriers_routes.py
+    """
+    with compressed_io.open_input(path) as f:
+        reader = csv.DictReader(f)
+        yield from carrier_rows(reader) if carriers_only else reader
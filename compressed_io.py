@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura y escritura transparente de archivos CSV comprimidos (.gz, .bz2, .xz)
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+# Formato → función que abre el archivo comprimido en modo binario
+OPENERS = {
+    'gz': lambda path, modo: gzip.GzipFile(path, modo, mtime=0),  # mtime fijo: salida reproducible
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+# Bytes mágicos de cada formato (para la entrada no se confía en la extensión)
+MAGIC = ((b'\x1f\x8b', 'gz'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'))
+
+# Extensión → formato (para decidir si se comprime la salida)
+EXTENSIONS = {'.gz': 'gz', '.bz2': 'bz2', '.xz': 'xz'}
+
+# Tamaño de los bloques descomprimidos y cuántos puede adelantar el hilo lector
+BLOCK_SIZE = 1 << 20
+READ_AHEAD_BLOCKS = 8
+
+def input_compression(path):
+    """Formato de compresión de un archivo según sus primeros bytes, o None"""
+    with open(path, 'rb') as f:
+        inicio = f.read(6)
+    for magic, formato in MAGIC:
+        if inicio.startswith(magic):
+            return formato
+    return None
+
+def output_compression(path):
+    """Formato de compresión que corresponde a la extensión de path, o None"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def compressed_suffix(path):
+    """Extensión de compresión de path ('' si no tiene), p. ej. para archivos temporales"""
+    extension = os.path.splitext(path)[1]
+    return extension if output_compression(path) else ''
+
+class ThreadedReader(io.RawIOBase):
+    """
+    Descomprime en un hilo aparte y entrega los bloques por una cola acotada, de
+    modo que la descompresión (zlib, bz2 y lzma liberan el GIL) se solapa con el
+    parseo y las coincidencias. Los errores del hilo se relanzan al leer.
+    """
+
+    def __init__(self, fileobj, block_size=BLOCK_SIZE, read_ahead=READ_AHEAD_BLOCKS):
+        super().__init__()
+        self._cola = queue.Queue(read_ahead)
+        self._pendiente = memoryview(b'')
+        self._fin = False
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._leer, args=(fileobj, block_size),
+                                      name='decompress', daemon=True)
+        self._hilo.start()
+
+    def _poner(self, elemento):
+        # Con timeout para que close() pueda detener un hilo bloqueado con la cola llena
+        while not self._detener.is_set():
+            try:
+                self._cola.put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _leer(self, fileobj, block_size):
+        try:
+            with fileobj:
+                while not self._detener.is_set():
+                    bloque = fileobj.read(block_size)
+                    if not bloque:
+                        break
+                    self._poner(bloque)
+        except Exception as e:
+            self._poner(e)
+            return
+        self._poner(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        if not self._pendiente:
+            if self._fin:
+                return 0
+            elemento = self._cola.get()
+            if isinstance(elemento, Exception):
+                self._fin = True
+                raise elemento
+            if not elemento:
+                self._fin = True
+                return 0
+            self._pendiente = memoryview(elemento)
+        n = min(len(destino), len(self._pendiente))
+        destino[:n] = self._pendiente[:n]
+        self._pendiente = self._pendiente[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._detener.set()
+            self._hilo.join()
+        super().close()
+
+def open_input(path, newline=None):
+    """
+    Abre un CSV para lectura como open(path, 'r', encoding='utf-8'); si está
+    comprimido se descomprime al vuelo en un hilo aparte
+    """
+    formato = input_compression(path)
+    if formato is None:
+        return open(path, 'r', encoding='utf-8', newline=newline)
+    return io.TextIOWrapper(open_binary_input(path), encoding='utf-8', newline=newline)
+
+def open_binary_input(path):
+    """Como open_input, pero en modo binario (los bytes descomprimidos si está comprimido)"""
+    formato = input_compression(path)
+    if formato is None:
+        return open(path, 'rb')
+    return io.BufferedReader(ThreadedReader(OPENERS[formato](path, 'rb')), BLOCK_SIZE)
+
+def open_output(path, newline=''):
+    """Abre un CSV para escritura; se comprime si la extensión es .gz, .bz2 o .xz"""
+    formato = output_compression(path)
+    if formato is None:
+        return open(path, 'w', encoding='utf-8', newline=newline)
+    return io.TextIOWrapper(OPENERS[formato](path, 'wb'), encoding='utf-8', newline=newline)
+
+def same_content(path_a, path_b, block_size=BLOCK_SIZE):
+    """Compara el contenido (descomprimido) de dos archivos"""
+    with open_input(path_a, newline='') as a, open_input(path_b, newline='') as b:
+        while True:
+            bloque = a.read(block_size)
+            if bloque != b.read(block_size):
+                return False
+            if not bloque:
+                return True
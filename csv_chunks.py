@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura paralela de Carriers.csv por rangos de bytes alineados a registros
+"""
+
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Tamaño de bloque para buscar los límites de registro
+BLOCK_SIZE = 1 << 20
+
+# Chunks por worker: más de uno para repartir mejor la carga entre procesos
+CHUNKS_PER_WORKER = 4
+
+# Tamaño máximo de un chunk: en archivos grandes hay más chunks, no chunks más grandes
+MAX_CHUNK_SIZE = 64 << 20
+
+# Chunks enviados al pool por worker cuyos resultados todavía no se consumieron
+IN_FLIGHT_PER_WORKER = 2
+
+def record_boundaries(f, objetivos, block_size=BLOCK_SIZE):
+    """
+    Para cada offset objetivo devuelve el inicio del primer registro en o después
+    de él, es decir, la posición siguiente a un salto de línea que no está dentro
+    de un campo entre comillas. Recorre el archivo una sola vez contando comillas
+    (paridad), lo que supone el entrecomillado estándar del módulo csv.
+    """
+    limites = []
+    pendientes = iter(sorted(objetivos))
+    objetivo = next(pendientes, None)
+    offset = 0    # offset absoluto del bloque actual
+    paridad = 0   # paridad de comillas antes de 'pos'
+
+    f.seek(0)
+    while objetivo is not None:
+        datos = f.read(block_size)
+        if not datos:
+            break
+        pos = 0
+        while objetivo is not None:
+            inicio = max(objetivo - offset, pos)
+            if inicio >= len(datos):
+                break
+            paridad ^= datos.count(b'"', pos, inicio) & 1
+            pos = inicio
+
+            # Primer salto de línea fuera de comillas a partir de 'pos'
+            limite = None
+            while True:
+                nl = datos.find(b'\n', pos)
+                if nl == -1:
+                    break
+                paridad ^= datos.count(b'"', pos, nl) & 1
+                pos = nl + 1
+                if paridad == 0:
+                    limite = offset + pos
+                    break
+            if limite is None:
+                break
+
+            limites.append(limite)
+            objetivo = next(pendientes, None)
+
+        paridad ^= datos.count(b'"', pos) & 1
+        offset += len(datos)
+
+    # Objetivos sin límite posterior: el registro llega hasta el final del archivo
+    tamano = os.fstat(f.fileno()).st_size
+    while objetivo is not None:
+        limites.append(tamano)
+        objetivo = next(pendientes, None)
+    return limites
+
+def read_header(path):
+    """Devuelve (columnas del header, offset del primer registro de datos)"""
+    with open(path, 'rb') as f:
+        inicio_datos = record_boundaries(f, [0])[0]
+        f.seek(0)
+        texto = f.read(inicio_datos).decode('utf-8')
+    columnas = next(csv.reader(io.StringIO(texto, newline=None)), [])
+    return columnas, inicio_datos
+
+def chunk_ranges(path, chunks, start=0):
+    """Divide [start, fin del archivo) en hasta 'chunks' rangos alineados a registros"""
+    tamano = os.path.getsize(path)
+    if chunks <= 1 or tamano - start <= 0:
+        return [(start, tamano)] if tamano > start else []
+
+    paso = (tamano - start) / chunks
+    objetivos = [start + int(paso * i) for i in range(1, chunks)]
+    with open(path, 'rb') as f:
+        limites = record_boundaries(f, objetivos)
+
+    rangos = []
+    inicio = start
+    for limite in limites + [tamano]:
+        if limite > inicio:
+            rangos.append((inicio, limite))
+            inicio = limite
+    return rangos
+
+def read_chunk(path, inicio, fin):
+    """Abre un rango de bytes como texto, igual que open(path, encoding='utf-8')"""
+    with open(path, 'rb') as f:
+        f.seek(inicio)
+        datos = f.read(fin - inicio)
+    return io.TextIOWrapper(io.BytesIO(datos), encoding='utf-8')
+
+def map_chunks(path, worker, workers, start=0, extra_args=(), initializer=None, initargs=()):
+    """
+    Aplica worker(path, inicio, fin, *extra_args) a cada chunk del archivo en un
+    pool de procesos y genera los resultados en el orden de los chunks, de modo
+    que el resultado combinado es el mismo que el de una lectura secuencial.
+    Solo hay IN_FLIGHT_PER_WORKER chunks por worker enviados y sin consumir, de
+    modo que la memoria no depende del tamaño del archivo.
+    """
+    chunks = max(workers * CHUNKS_PER_WORKER, -(-(os.path.getsize(path) - start) // MAX_CHUNK_SIZE))
+    rangos = chunk_ranges(path, chunks, start)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        futuros = deque()
+        for inicio, fin in rangos:
+            if len(futuros) >= workers * IN_FLIGHT_PER_WORKER:
+                yield futuros.popleft().result()
+            futuros.append(pool.submit(worker, path, inicio, fin, *extra_args))
+        while futuros:
+            yield futuros.popleft().result()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara dos corridas de carriers_12_rutas.csv por (RUTA, BAN, EMAIL) con memoria acotada
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import os
+
+import compressed_io
+import profiling
+from external_sort import DEFAULT_RUN_SIZE, ExternalSorter
+
+# Columnas que identifican una fila entre corridas
+KEY_FIELDS = ('RUTA', 'BAN', 'EMAIL')
+
+# Archivos que se escriben en el directorio de salida
+ADDED_FILE = 'agregados.csv'
+REMOVED_FILE = 'eliminados.csv'
+CHANGED_FILE = 'cambiados.csv'
+SUMMARY_FILE = 'resumen.csv'
+
+# Columnas de cambiados.csv: una fila por columna que cambió
+CHANGED_FIELDNAMES = list(KEY_FIELDS) + ['COLUMNA', 'ANTES', 'DESPUES']
+SUMMARY_FIELDNAMES = ['RUTA', 'AGREGADOS', 'ELIMINADOS', 'CAMBIADOS', 'SIN_CAMBIOS']
+
+def row_hash(valores):
+    """Firma del contenido completo de una fila"""
+    return hashlib.blake2b('\x1f'.join(valores).encode('utf-8'), digest_size=12).digest()
+
+def read_header(path):
+    """Columnas de un CSV de resultados, o None si no existe (una corrida sin coincidencias)"""
+    if not os.path.exists(path):
+        return None
+    with compressed_io.open_input(path, newline='') as f:
+        return next(csv.reader(f), None)
+
+def sorted_rows(path, fieldnames, run_size, tmpdir):
+    """
+    Genera (clave, firma, valores) de las filas de un archivo de resultados
+    ordenadas por clave y firma, con un ordenamiento externo: solo run_size
+    filas a la vez en memoria
+    """
+    if fieldnames is None:
+        return
+    posiciones = [fieldnames.index(campo) for campo in KEY_FIELDS]
+    filas = ExternalSorter(key=lambda registro: registro[:2], run_size=run_size, tmpdir=tmpdir)
+    with filas:
+        with compressed_io.open_input(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for valores in profiling.iterate('parse', reader):
+                # Filas cortas o largas se igualan al header para poder compararlas
+                valores = (valores + [''] * len(fieldnames))[:len(fieldnames)]
+                filas.add((tuple(valores[i] for i in posiciones), row_hash(valores), valores))
+        yield from filas.sorted()
+
+def merge_groups(previas, actuales):
+    """
+    Merge de dos secuencias ordenadas por clave: genera (clave, filas previas,
+    filas actuales) por clave; solo se guarda en memoria un grupo a la vez
+    """
+    grupos_previos = itertools.groupby(previas, key=lambda registro: registro[0])
+    grupos_actuales = itertools.groupby(actuales, key=lambda registro: registro[0])
+    previo = next(grupos_previos, None)
+    actual = next(grupos_actuales, None)
+    while previo is not None or actual is not None:
+        if actual is None or (previo is not None and previo[0] < actual[0]):
+            yield previo[0], list(previo[1]), []
+            previo = next(grupos_previos, None)
+        elif previo is None or actual[0] < previo[0]:
+            yield actual[0], [], list(actual[1])
+            actual = next(grupos_actuales, None)
+        else:
+            yield previo[0], list(previo[1]), list(actual[1])
+            previo = next(grupos_previos, None)
+            actual = next(grupos_actuales, None)
+
+def compare_group(previas, actuales):
+    """
+    Compara las filas de una clave (ordenadas por firma): las firmas en ambos
+    lados no cambiaron; las que sobran se emparejan en orden como cambios y
+    el resto son altas o bajas. Devuelve (sin cambios, [(antes, después)],
+    eliminadas, agregadas).
+    """
+    i = j = iguales = 0
+    solo_previas, solo_actuales = [], []
+    while i < len(previas) and j < len(actuales):
+        if previas[i][1] == actuales[j][1]:
+            iguales += 1
+            i += 1
+            j += 1
+        elif previas[i][1] < actuales[j][1]:
+            solo_previas.append(previas[i][2])
+            i += 1
+        else:
+            solo_actuales.append(actuales[j][2])
+            j += 1
+    solo_previas.extend(registro[2] for registro in previas[i:])
+    solo_actuales.extend(registro[2] for registro in actuales[j:])
+    pares = min(len(solo_previas), len(solo_actuales))
+    cambios = list(zip(solo_previas[:pares], solo_actuales[:pares]))
+    return iguales, cambios, solo_previas[pares:], solo_actuales[pares:]
+
+def diff_results(previo, actual, directorio, run_size=DEFAULT_RUN_SIZE, tmpdir=None):
+    """
+    Compara la salida anterior con la nueva y escribe en 'directorio' las filas
+    agregadas y eliminadas (completas), los cambios (una fila por columna) y el
+    resumen por ruta. Devuelve {ruta: {'AGREGADOS': n, ...}}.
+    """
+    columnas_previas, columnas_actuales = read_header(previo), read_header(actual)
+    columnas = columnas_actuales or columnas_previas
+    if columnas is None:
+        raise SystemExit(f"No existe {previo} ni {actual}")
+    if columnas_previas is not None and columnas_actuales is not None and columnas_previas != columnas_actuales:
+        raise SystemExit(f"{previo} y {actual} no tienen las mismas columnas")
+    faltantes = [campo for campo in KEY_FIELDS if campo not in columnas]
+    if faltantes:
+        raise SystemExit(f"Faltan las columnas {', '.join(faltantes)} en {actual}")
+    posiciones = [columnas.index(campo) for campo in KEY_FIELDS]
+
+    os.makedirs(directorio, exist_ok=True)
+    resumen = {}
+    with profiling.stage('diff'), \
+            compressed_io.open_output(os.path.join(directorio, ADDED_FILE)) as f_agregados, \
+            compressed_io.open_output(os.path.join(directorio, REMOVED_FILE)) as f_eliminados, \
+            compressed_io.open_output(os.path.join(directorio, CHANGED_FILE)) as f_cambiados:
+        agregados, eliminados, cambiados = csv.writer(f_agregados), csv.writer(f_eliminados), csv.writer(f_cambiados)
+        agregados.writerow(columnas)
+        eliminados.writerow(columnas)
+        cambiados.writerow(CHANGED_FIELDNAMES)
+
+        previas = sorted_rows(previo, columnas_previas, run_size, tmpdir)
+        actuales = sorted_rows(actual, columnas_actuales, run_size, tmpdir)
+        for clave, filas_previas, filas_actuales in merge_groups(previas, actuales):
+            iguales, cambios, bajas, altas = compare_group(filas_previas, filas_actuales)
+            contadores = resumen.setdefault(clave[0], dict.fromkeys(SUMMARY_FIELDNAMES[1:], 0))
+            contadores['SIN_CAMBIOS'] += iguales
+            contadores['CAMBIADOS'] += len(cambios)
+            contadores['ELIMINADOS'] += len(bajas)
+            contadores['AGREGADOS'] += len(altas)
+            eliminados.writerows(bajas)
+            agregados.writerows(altas)
+            for antes, despues in cambios:
+                for k, campo in enumerate(columnas):
+                    if antes[k] != despues[k] and k not in posiciones:
+                        cambiados.writerow([*clave, campo, antes[k], despues[k]])
+
+    with compressed_io.open_output(os.path.join(directorio, SUMMARY_FILE)) as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_FIELDNAMES)
+        for ruta in sorted(resumen):
+            writer.writerow([ruta] + [resumen[ruta][campo] for campo in SUMMARY_FIELDNAMES[1:]])
+    return resumen
+
+def print_summary(resumen, directorio):
+    """Imprime los totales por ruta de diff_results"""
+    print("\n=== CAMBIOS CONTRA LA CORRIDA ANTERIOR ===")
+    for ruta in sorted(resumen):
+        c = resumen[ruta]
+        print(f"{ruta}: +{c['AGREGADOS']} -{c['ELIMINADOS']} ~{c['CAMBIADOS']} ({c['SIN_CAMBIOS']} sin cambios)")
+    total = {campo: sum(c[campo] for c in resumen.values()) for campo in SUMMARY_FIELDNAMES[1:]}
+    print(f"Total: {total['AGREGADOS']} agregados, {total['ELIMINADOS']} eliminados, "
+          f"{total['CAMBIADOS']} cambiados, {total['SIN_CAMBIOS']} sin cambios")
+    print(f"✓ Diferencias guardadas en {directorio}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--previous', required=True, help="carriers_12_rutas.csv de la corrida anterior")
+    parser.add_argument('--current', required=True, help="carriers_12_rutas.csv de la corrida nueva")
+    parser.add_argument('--output-dir', required=True,
+                        help=f"directorio para {ADDED_FILE}, {REMOVED_FILE}, {CHANGED_FILE} y {SUMMARY_FILE}")
+    parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help="filas por run del ordenamiento externo")
+    parser.add_argument('--tmpdir', default=None, help="directorio para los runs temporales")
+    parser.add_argument('--profile', default=None, metavar='JSON',
+                        help="guardar tiempos por etapa y contadores en este archivo JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        profiling.enable()
+    resumen = diff_results(args.previous, args.current, args.output_dir, args.run_size, args.tmpdir)
+    print_summary(resumen, args.output_dir)
+    if args.profile:
+        profiling.write_report(args.profile, script='diff_results', previous=args.previous, current=args.current)
+
+if __name__ == "__main__":
+    main()
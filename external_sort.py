@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ordenamiento externo: runs ordenados en disco y merge k-way con memoria acotada
+"""
+
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+
+# Registros por run en memoria antes de volcarlo a disco
+DEFAULT_RUN_SIZE = 100000
+
+def _read_run(f):
+    """Lee secuencialmente los registros de un run"""
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return
+
+class ExternalSorter:
+    """
+    Acumula registros con add() y los devuelve ordenados con sorted(), igual que
+    sorted(registros, key=key) (el orden es estable), pero con a lo sumo run_size
+    registros en memoria. Los registros deben poder serializarse con pickle.
+    """
+
+    def __init__(self, key=None, run_size=DEFAULT_RUN_SIZE, tmpdir=None):
+        self.key = key
+        self.run_size = run_size
+        self.tmpdir = tmpdir
+        self.count = 0
+        self._bloque = []
+        self._runs = []
+        self._directorio = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, registro):
+        self._bloque.append(registro)
+        self.count += 1
+        if len(self._bloque) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        """Ordena el bloque en memoria y lo vuelca a un run en disco"""
+        self._bloque.sort(key=self.key)
+        if self._directorio is None:
+            self._directorio = tempfile.mkdtemp(prefix='carriers-sort-', dir=self.tmpdir)
+        fd, ruta = tempfile.mkstemp(suffix='.run', dir=self._directorio)
+        with os.fdopen(fd, 'wb') as f:
+            # Un pickle independiente por registro: clear_memo() en un solo Pickler
+            # desalinea el memo del Unpickler y cruza referencias entre registros
+            for registro in self._bloque:
+                pickle.dump(registro, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._runs.append(ruta)
+        self._bloque = []
+
+    def sorted(self):
+        """Genera todos los registros ordenados y libera los runs al terminar"""
+        try:
+            # Todo cupo en un solo bloque: no hace falta pasar por disco
+            if not self._runs:
+                self._bloque.sort(key=self.key)
+                yield from self._bloque
+                return
+
+            if self._bloque:
+                self._spill()
+
+            archivos = [open(ruta, 'rb') for ruta in self._runs]
+            try:
+                # heapq.merge desempata por posición del run, lo que mantiene la estabilidad
+                yield from heapq.merge(*(_read_run(f) for f in archivos), key=self.key)
+            finally:
+                for f in archivos:
+                    f.close()
+        finally:
+            self.close()
+
+    def close(self):
+        """Elimina los runs temporales"""
+        self._bloque = []
+        self._runs = []
+        if self._directorio is not None:
+            shutil.rmtree(self._directorio, ignore_errors=True)
+            self._directorio = None
+
+def external_sort(registros, key=None, run_size=DEFAULT_RUN_SIZE, tmpdir=None):
+    """Equivalente a sorted(registros, key=key) con memoria acotada"""
+    sorter = ExternalSorter(key=key, run_size=run_size, tmpdir=tmpdir)
+    for registro in registros:
+        sorter.add(registro)
+    yield from sorter.sorted()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de trigramas para coincidencia aproximada de ciudades
+"""
+
+import functools
+import re
+import unicodedata
+from collections import defaultdict
+
+# Similitud mínima (coeficiente de Dice sobre trigramas) por defecto
+DEFAULT_THRESHOLD = 0.8
+
+def fold(texto):
+    """Minúsculas, sin acentos y solo letras/dígitos separados por un espacio"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r'[\W_]+', ' ', texto).strip()
+
+def trigrams(texto):
+    """Trigramas del texto con relleno, para que inicio y fin de palabra cuenten"""
+    relleno = f"  {texto} "
+    return frozenset(relleno[i:i + 3] for i in range(len(relleno) - 2))
+
+class TrigramIndex:
+    """
+    Índice invertido trigrama → nombres canónicos. lookup() solo compara contra
+    los nombres que comparten algún trigrama con la consulta, así el costo no
+    depende de cuántos nombres haya en total, y memoriza cada consulta. Las
+    grafías que se pliegan igual ('Querétaro' y 'Queretaro') comparten trigramas
+    y se reportan todas.
+    """
+
+    def __init__(self, nombres, threshold=DEFAULT_THRESHOLD, cache_size=65536):
+        self.threshold = threshold
+        self._nombres = []     # id → nombres canónicos con el mismo plegado
+        self._trigramas = []   # id → trigramas del nombre plegado
+        self._postings = defaultdict(list)
+        vistos = {}
+        for nombre in nombres:
+            plegado = fold(nombre)
+            if not plegado:
+                continue
+            if plegado in vistos:
+                grafias = self._nombres[vistos[plegado]]
+                if nombre not in grafias:
+                    grafias.append(nombre)
+                continue
+            vistos[plegado] = len(self._nombres)
+            self._nombres.append([nombre])
+            self._trigramas.append(trigrams(plegado))
+            for trigrama in self._trigramas[-1]:
+                self._postings[trigrama].append(vistos[plegado])
+        self.lookup = functools.lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, texto):
+        """Devuelve {nombre canónico: similitud} de los nombres con similitud >= threshold"""
+        plegado = fold(texto)
+        if not plegado:
+            return {}
+        consulta = trigrams(plegado)
+        comunes = defaultdict(int)
+        for trigrama in consulta:
+            for nombre_id in self._postings.get(trigrama, ()):
+                comunes[nombre_id] += 1
+
+        resultado = {}
+        for nombre_id, compartidos in comunes.items():
+            similitud = 2 * compartidos / (len(consulta) + len(self._trigramas[nombre_id]))
+            if similitud >= self.threshold:
+                for nombre in self._nombres[nombre_id]:
+                    resultado[nombre] = similitud
+        return resultado
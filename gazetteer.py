@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gazetteer local de coordenadas de ciudades e índice espacial por celdas
+"""
+
+import csv
+import functools
+import math
+import os
+from collections import defaultdict
+
+from fuzzy_index import TrigramIndex, fold
+
+# Gazetteer incluido en el proyecto: city,state,state_codes,country,lat,lon
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+
+# Radio por defecto alrededor de cada punto de ruta
+DEFAULT_RADIUS_KM = 25.0
+
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia de gran círculo en km entre dos puntos (grados)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class Gazetteer:
+    """
+    Ciudades con coordenadas, indexadas por (país, ciudad) plegados. Una ciudad
+    se ubica solo si el estado (nombre o abreviación) no la contradice y, sin
+    estado, solo si el nombre no es ambiguo dentro del país.
+    """
+
+    def __init__(self, path=GAZETTEER_PATH, cache_size=65536):
+        self.path = path
+        self._ciudades = defaultdict(list)  # (país, ciudad) → [(estados, nombre, lat, lon)]
+        nombres = []
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                estados = {fold(row['state'])}
+                estados.update(fold(codigo) for codigo in row['state_codes'].split('|') if codigo)
+                entrada = (frozenset(estados), row['city'], float(row['lat']), float(row['lon']))
+                self._ciudades[(fold(row['country']), fold(row['city']))].append(entrada)
+                nombres.append(row['city'])
+        self._nombres = TrigramIndex(nombres)
+        self.locate = functools.lru_cache(maxsize=cache_size)(self._locate)
+
+    def _candidatas(self, ciudad, pais, estado):
+        if pais:
+            entradas = self._ciudades.get((fold(pais), fold(ciudad)), [])
+        else:
+            entradas = [e for (_, c), lista in self._ciudades.items() if c == fold(ciudad) for e in lista]
+        if estado:
+            estado = fold(estado)
+            entradas = [e for e in entradas if estado in e[0]]
+        return entradas
+
+    def _locate(self, ciudad, pais, estado=None):
+        """(nombre, lat, lon) de la ciudad, o None si no está o es ambigua"""
+        if not ciudad:
+            return None
+        entradas = self._candidatas(ciudad, pais, estado)
+        if len(entradas) != 1:
+            return None
+        _, nombre, lat, lon = entradas[0]
+        return nombre, lat, lon
+
+    def resolve(self, ciudad, pais=None, estado=None):
+        """
+        Como locate(), pero si el nombre no está tal cual prueba el nombre más
+        parecido del gazetteer (para los nombres de ciudades escritos en las rutas)
+        """
+        ubicacion = self.locate(ciudad, pais, estado)
+        if ubicacion is None:
+            candidatas = self._nombres.lookup(ciudad or '')
+            for _, nombre in sorted(((s, n) for n, s in candidatas.items()), reverse=True):
+                ubicacion = self.locate(nombre, pais, estado)
+                if ubicacion is not None:
+                    break
+        return ubicacion
+
+class GridIndex:
+    """
+    Índice espacial de puntos en celdas de lat/lon. Cada punto tiene su propio
+    radio; within() solo revisa las celdas que cubre el radio máximo alrededor
+    de la consulta, no todos los puntos.
+    """
+
+    def __init__(self, cell_km=DEFAULT_RADIUS_KM):
+        assert cell_km > 0, "el tamaño de celda debe ser positivo"
+        self.cell_deg = cell_km / KM_POR_GRADO
+        self.max_radio_km = 0.0
+        self._celdas = defaultdict(list)  # (fila, columna) → [(lat, lon, radio_km, valor)]
+        self._len = 0
+
+    def _celda(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def add(self, lat, lon, radio_km, valor):
+        self._celdas[self._celda(lat, lon)].append((lat, lon, radio_km, valor))
+        self.max_radio_km = max(self.max_radio_km, radio_km)
+        self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def within(self, lat, lon):
+        """[(distancia_km, valor)] de los puntos cuyo radio alcanza (lat, lon), del más cercano al más lejano"""
+        if not self._len:
+            return []
+        delta_lat = self.max_radio_km / KM_POR_GRADO
+        # Un grado de longitud se achica con la latitud: se usa la del borde más alejado del ecuador
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat) + delta_lat)))
+        delta_lon = min(180.0, delta_lat / cos_lat)
+        fila_min, col_min = self._celda(lat - delta_lat, lon - delta_lon)
+        fila_max, col_max = self._celda(lat + delta_lat, lon + delta_lon)
+
+        encontrados = []
+        for fila in range(fila_min, fila_max + 1):
+            for columna in range(col_min, col_max + 1):
+                for p_lat, p_lon, radio_km, valor in self._celdas.get((fila, columna), ()):
+                    distancia = haversine_km(lat, lon, p_lat, p_lon)
+                    if distancia <= radio_km:
+                        encontrados.append((distancia, valor))
+        encontrados.sort(key=lambda x: x[0])
+        return encontrados
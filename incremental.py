@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estado entre corridas para regenerar carriers_12_rutas.csv de forma incremental
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+
+STATE_VERSION = 1
+
+def row_signature(ban, valores):
+    """
+    Firma de una fila: BAN + hash del contenido, en una sola cadena para que el
+    estado de millones de filas ocupe poca memoria. None se trata como '' porque
+    así se escribe en el CSV de salida, y la firma debe poder recalcularse
+    tanto desde Carriers.csv como desde una fila de la salida anterior.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update('\x1f'.join('' if v is None else v for v in valores).encode('utf-8'))
+    return f"{'' if ban is None else ban}\x1f{digest.hexdigest()}"
+
+def signature_ban(firma):
+    """BAN de una firma creada con row_signature"""
+    return firma.rpartition('\x1f')[0]
+
+def rules_fingerprint(*reglas):
+    """Hash de las definiciones que afectan el resultado (rutas, mapeos de estados)"""
+    datos = json.dumps(reglas, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(datos.encode('utf-8'), digest_size=16).hexdigest()
+
+def output_fingerprint(path):
+    """Tamaño y mtime del archivo de salida, o None si no existe"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def load_state(path, reglas, salida):
+    """
+    Devuelve el Counter de firmas de la corrida anterior, o None si no hay estado
+    o ya no sirve: cambiaron las reglas o el archivo de salida no es el que se
+    generó en esa corrida.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if estado.get('version') != STATE_VERSION or estado.get('rules') != reglas:
+        return None
+    if estado.get('output') != output_fingerprint(salida):
+        return None
+    return Counter(estado['rows'])
+
+def save_state(path, reglas, salida, firmas):
+    """Guarda (de forma atómica) las firmas de esta corrida y la huella de la salida"""
+    estado = {
+        'version': STATE_VERSION,
+        'rules': reglas,
+        'output': output_fingerprint(salida),
+        'rows': firmas,
+    }
+    fd, temporal = tempfile.mkstemp(prefix='.carriers-state-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(temporal, path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+
+def changed_bans(anteriores, nuevas):
+    """Cuenta filas agregadas, eliminadas y BAN con filas en ambos lados (modificados)"""
+    agregadas = nuevas - anteriores
+    eliminadas = anteriores - nuevas
+    bans_modificados = set(map(signature_ban, agregadas)) & set(map(signature_ban, eliminadas))
+    return sum(agregadas.values()), sum(eliminadas.values()), len(bans_modificados)
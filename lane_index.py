@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de carriers por (país, estado) y (país, ciudad) para resolver lanes por búsqueda
+"""
+
+import heapq
+import time
+from array import array
+from collections import defaultdict
+from itertools import islice
+
+from analyze_carriers_routes import (_sortable, compile_location, normalize_city, normalize_country, normalize_state,
+                                     store_unique_key)
+from carrier_groups import CarrierGroups
+
+# Papeles de una ubicación en una lane, en el orden en que se reportan
+LANE_ROLES = (('origen', 'ORIGEN'), ('cruce', 'CRUCE'), ('destino', 'DESTINO'))
+
+def roles_label(roles):
+    """Valor de UBICACION_EN_RUTA para una lista de papeles ('ORIGEN y DESTINO', ...)"""
+    return " y ".join(roles)
+
+class LaneIndex:
+    """
+    Índice inmutable de un almacén de carriers. Como en carrier_matches_location,
+    un carrier está en una ubicación si coincide el país y el estado normalizado o
+    la ciudad normalizada; por eso se indexan las combinaciones distintas de
+    CITY/STATE/COUNTRY por (país, estado) y por (país, ciudad). Resolver una lane
+    cuesta según sus valores y sus coincidencias, no según el total de carriers.
+    """
+
+    def __init__(self, store, origen=None):
+        self.store = store
+        self.origen = origen  # (size, mtime_ns) de Carriers.csv al cargarlo
+        self.cargado = time.time()
+        self.ubicaciones, representantes = store.combined_codes(('CITY', 'STATE', 'COUNTRY'))
+        self.filas = [[] for _ in representantes]
+        for i, ubicacion in enumerate(self.ubicaciones):
+            self.filas[ubicacion].append(i)
+        self.por_estado = defaultdict(list)
+        self.por_ciudad = defaultdict(list)
+        self.claves_ubicacion = []
+        for ubicacion, i in enumerate(representantes):
+            carrier = store.record(i)
+            pais = normalize_country(carrier.get('COUNTRY'))
+            estado = normalize_state(carrier.get('STATE'), pais)
+            ciudad = normalize_city(carrier.get('CITY'))
+            if estado:
+                self.por_estado[(pais, estado)].append(ubicacion)
+            if ciudad:
+                self.por_ciudad[(pais, ciudad)].append(ubicacion)
+            self.claves_ubicacion.append(store_unique_key(store, i)[2:])
+        self._rango = None
+        self._grupos = None
+
+    def __len__(self):
+        return len(self.store)
+
+    def locations(self, location):
+        """Códigos de ubicación de carriers que coinciden con una ubicación de RUTAS"""
+        compilada = compile_location(location)
+        ubicaciones = set()
+        for pais in compilada.paises:
+            for estado in compilada.estados:
+                ubicaciones.update(self.por_estado.get((pais, estado), ()))
+            for ciudad in compilada.ciudades:
+                ubicaciones.update(self.por_ciudad.get((pais, ciudad), ()))
+        return ubicaciones
+
+    def lane_roles(self, lane):
+        """{código de ubicación: [papeles]} de una lane {'origen', 'destino', 'cruce'}"""
+        roles = defaultdict(list)
+        for campo, rol in LANE_ROLES:
+            if lane.get(campo):
+                for ubicacion in self.locations(lane[campo]):
+                    roles[ubicacion].append(rol)
+        return roles
+
+    def rank(self):
+        """
+        Posición de cada fila en el orden (CARRIER, orden del archivo) de
+        carriers_12_rutas.csv; se calcula una vez y ordena las filas de cada
+        lane comparando enteros. En la misma pasada arma los carriers únicos
+        de cada clave de ubicación en ese orden, que query mezcla.
+        """
+        if self._rango is None:
+            store = self.store
+            bans, nombres = store.column('BAN'), store.column('COMPANY NAME')
+            emails, phones, origenes = store.column('EMAIL'), store.column('PHONE #'), store.column('DATA ORIGIN')
+            orden = sorted(range(len(store)), key=lambda i: _sortable((nombres[i],)))
+            rango = array('I', bytes(4 * len(orden)))
+            for posicion, i in enumerate(orden):
+                rango[i] = posicion
+
+            # Un carrier único no cambia de clave de ubicación (CITY, estado normalizado,
+            # COUNTRY) y todas las ubicaciones de una clave coinciden con las mismas lanes,
+            # así que los grupos de cada clave no se mezclan con los de otra
+            claves = {}
+            clave_de = [claves.setdefault(clave, len(claves)) for clave in self.claves_ubicacion]
+            grupos = CarrierGroups()
+            for i in orden:
+                ubicacion = self.ubicaciones[i]
+                clave = (bans[i], nombres[i]) + self.claves_ubicacion[ubicacion]
+                grupos.add(clave_de[ubicacion], clave, i, emails[i], phones[i], origenes[i])
+            por_clave = []
+            for k in range(len(claves)):
+                lista = grupos.groups(k)
+                por_clave.append((lista, sum(grupo.registros for grupo in lista)))
+            self._grupos = (clave_de, por_clave)
+            self._rango = rango  # se publica completo (el servicio consulta desde varios hilos)
+        return self._rango
+
+    def lane_rows(self, lane):
+        """(filas que coinciden en orden de salida, {código de ubicación: [papeles]})"""
+        roles = self.lane_roles(lane)
+        filas = [i for ubicacion in roles for i in self.filas[ubicacion]]
+        filas.sort(key=self.rank().__getitem__)
+        return filas, roles
+
+    def query(self, lane, limit=None):
+        """
+        Carriers de una lane (cada ubicación con ciudad, estado y país, admitiendo
+        valores separados por |), agrupados por carrier único y ordenados por
+        nombre como en carriers_12_rutas.csv
+        """
+        rango = self.rank()
+        clave_de, por_clave = self._grupos
+        roles = self.lane_roles(lane)
+        listas = [por_clave[k] for k in {clave_de[ubicacion] for ubicacion in roles}]
+
+        # Mezcla de los grupos ya ordenados de cada clave: solo se recorren los que se devuelven
+        ordenados = heapq.merge(*(grupos for grupos, _ in listas), key=lambda grupo: rango[grupo.muestra])
+        store = self.store
+        carriers = []
+        for grupo in islice(ordenados, limit):
+            carrier = store.record(grupo.muestra)
+            carriers.append({
+                'BAN': carrier['BAN'],
+                'CARRIER': carrier['COMPANY NAME'],
+                'CITY': carrier.get('CITY', ''),
+                'STATE': carrier.get('STATE', ''),
+                'STATE_NORMALIZADO': normalize_state(carrier.get('STATE', ''), carrier.get('COUNTRY')),
+                'COUNTRY': carrier.get('COUNTRY', ''),
+                'UBICACION_EN_RUTA': roles_label(roles[self.ubicaciones[grupo.muestra]]),
+                'EMAILS': list(grupo.emails),
+                'PHONES': list(grupo.phones),
+                'DATA_ORIGINS': list(grupo.origins),
+                'REGISTROS': grupo.registros,
+            })
+        return {'total': sum(len(grupos) for grupos, _ in listas),
+                'registros': sum(registros for _, registros in listas), 'carriers': carriers}
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servicio local de consulta de lanes sobre un índice de carriers en memoria
+"""
+
+import argparse
+import csv
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import compressed_io
+import normalization_cache
+from analyze_carriers_routes import ARCHIVO_CARRIERS, STORE_COLUMNS, load_carriers
+from lane_index import LANE_ROLES, LaneIndex
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Segundos entre revisiones de cambios en Carriers.csv
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+# Carriers por respuesta si la consulta no indica 'limit'
+DEFAULT_LIMIT = 1000
+
+# Columnas sin las que Carriers.csv no se carga
+REQUIRED_COLUMNS = ('COMPANY TYPE',) + STORE_COLUMNS
+
+class QueryError(ValueError):
+    """Consulta mal formada (se responde con 400)"""
+
+def parse_lane(datos):
+    """Valida una consulta {'origen', 'destino', 'cruce', 'limit'} (JSON o query string)"""
+    if not isinstance(datos, dict):
+        raise QueryError("la consulta debe ser un objeto JSON")
+    lane = {}
+    for campo, _ in LANE_ROLES:
+        location = datos.get(campo)
+        if location is None:
+            continue
+        if not isinstance(location, dict) or not all(isinstance(v, str) for v in location.values()):
+            raise QueryError(f"'{campo}' debe tener ciudad, estado y pais como texto")
+        if not location.get('pais'):
+            raise QueryError(f"'{campo}' necesita 'pais'")
+        lane[campo] = location
+    if not lane:
+        raise QueryError("se necesita al menos origen, destino o cruce")
+    limit = datos.get('limit', DEFAULT_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise QueryError("'limit' debe ser un entero") from None
+    if limit < 0:
+        raise QueryError("'limit' debe ser un entero")
+    return lane, limit
+
+def lane_from_query_string(query):
+    """?origen_ciudad=Morelia&origen_estado=MICH&origen_pais=Mexico&destino_ciudad=...&limit=10"""
+    valores = {clave: lista[-1] for clave, lista in parse_qs(query).items()}
+    datos = {}
+    for campo, _ in LANE_ROLES:
+        location = {parte: valores[f"{campo}_{parte}"] for parte in ('ciudad', 'estado', 'pais')
+                    if f"{campo}_{parte}" in valores}
+        if location:
+            datos[campo] = location
+    if 'limit' in valores:
+        datos['limit'] = valores['limit']
+    return datos
+
+def missing_columns(path):
+    """Columnas de REQUIRED_COLUMNS que no están en el header de Carriers.csv"""
+    with compressed_io.open_input(path, newline='') as f:
+        header = next(csv.reader(f), [])
+    return [columna for columna in REQUIRED_COLUMNS if columna not in header]
+
+class LaneService:
+    """
+    Mantiene el LaneIndex vigente y lo reemplaza en segundo plano cuando cambia
+    Carriers.csv. Las consultas toman la referencia al índice una sola vez, así
+    que las que están en curso terminan con el índice anterior. Una recarga que
+    falla (columnas faltantes, archivo sin carriers) deja el índice anterior y
+    el motivo en reload_error.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.index = None
+        self.recargas = 0
+        self.error = None
+        self._fallido = None  # (tamaño, mtime) de la última versión que no se pudo cargar
+        self._detener = threading.Event()
+
+    def _stat(self):
+        stat = os.stat(self.args.input)
+        return stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        origen = self._stat()
+        faltantes = missing_columns(self.args.input)
+        if faltantes:
+            raise ValueError(f"a {self.args.input} le faltan las columnas {', '.join(faltantes)}")
+        store, _ = load_carriers(self.args)
+        index = LaneIndex(store, origen)
+        if not len(index) and self.index is not None:
+            # Un archivo truncado o a medio escribir no reemplaza un índice con carriers
+            raise ValueError(f"{self.args.input} no tiene carriers")
+        index.rank()
+        print(f"Índice listo: {len(index)} carriers, {len(index.filas)} ubicaciones distintas")
+        self.index = index
+
+    def watch(self):
+        """Hilo de recarga: revisa el tamaño/mtime de Carriers.csv cada reload_interval segundos"""
+        while not self._detener.wait(self.args.reload_interval):
+            stat = None
+            try:
+                stat = self._stat()
+                if stat in (self.index.origen, self._fallido):
+                    continue
+                print(f"{self.args.input} cambió; recargando...")
+                self.load()
+                self.recargas += 1
+                self.error = None
+                self._fallido = None
+            except Exception as e:
+                # Se sigue sirviendo el índice anterior (p. ej. el archivo se está reescribiendo);
+                # la misma versión del archivo no se vuelve a intentar
+                self._fallido = stat
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"No se pudo recargar {self.args.input}: {self.error}")
+
+    def start_watcher(self):
+        hilo = threading.Thread(target=self.watch, name='lane-reload', daemon=True)
+        hilo.start()
+        return hilo
+
+    def stop(self):
+        self._detener.set()
+
+    def health(self):
+        index = self.index
+        return {
+            'input': self.args.input,
+            'carriers': len(index),
+            'locations': len(index.filas),
+            'loaded_at': index.cargado,
+            'reloads': self.recargas,
+            'reload_error': self.error,
+        }
+
+    def query(self, datos):
+        lane, limit = parse_lane(datos)
+        inicio = time.perf_counter()
+        respuesta = self.index.query(lane, limit)
+        respuesta['elapsed_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+        return respuesta
+
+class LaneRequestHandler(BaseHTTPRequestHandler):
+    """GET /health, GET /lanes?origen_ciudad=... y POST /lanes con un JSON como los de RUTAS"""
+
+    server_version = 'carriers-fr8-lanes/1'
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _consultar(self, datos):
+        try:
+            self._responder(200, self.server.service.query(datos))
+        except QueryError as e:
+            self._responder(400, {'error': str(e)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._responder(200, self.server.service.health())
+        elif url.path == '/lanes':
+            self._consultar(lane_from_query_string(url.query))
+        else:
+            self._responder(404, {'error': 'no encontrado'})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/lanes':
+            self._responder(404, {'error': 'no encontrado'})
+            return
+        longitud = int(self.headers.get('Content-Length') or 0)
+        try:
+            datos = json.loads(self.rfile.read(longitud) or b'{}')
+        except ValueError:
+            self._responder(400, {'error': 'JSON inválido'})
+            return
+        self._consultar(datos)
+
+    def address_string(self):
+        # En un socket Unix client_address es una cadena vacía
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, formato, *args):
+        if not self.server.quiet:
+            super().log_message(formato, *args)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, quiet=False):
+    """Servidor HTTP (TCP o socket Unix) que atiende cada consulta en un hilo"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, LaneRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), LaneRequestHandler)
+    server.service = service
+    server.quiet = quiet
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', default=ARCHIVO_CARRIERS, help="archivo Carriers.csv")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="dirección donde escuchar")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="puerto HTTP")
+    parser.add_argument('--socket', default=None, help="escuchar en este socket Unix en lugar de TCP")
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="segundos entre revisiones de cambios en Carriers.csv")
+    parser.add_argument('--cache-size', type=int, default=normalization_cache.DEFAULT_MAXSIZE,
+                        help="entradas máximas de la caché de normalización")
+    parser.add_argument('--store-cache', default=None,
+                        help="caché binaria de carriers parseados (por defecto <input>.store)")
+    parser.add_argument('--no-store-cache', action='store_true',
+                        help="no leer ni escribir la caché binaria de carriers")
+    parser.add_argument('--quiet', action='store_true', help="no registrar cada consulta")
+    args = parser.parse_args(argv)
+    # load_carriers lee todo el archivo en un solo proceso
+    args.workers = 1
+    return args
+
+def _terminar(signum, frame):
+    # SIGTERM termina igual que Ctrl+C (cierra el servidor y borra el socket)
+    raise KeyboardInterrupt
+
+def main(argv=None):
+    args = parse_args(argv)
+    normalization_cache.configure(args.cache_size)
+
+    service = LaneService(args)
+    service.load()
+    service.start_watcher()
+    server = make_server(service, args.host, args.port, args.socket, args.quiet)
+    direccion = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Atendiendo consultas de lanes en {direccion} (Ctrl+C para terminar)")
+    signal.signal(signal.SIGTERM, _terminar)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
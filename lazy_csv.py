@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura perezosa de CSV con proyección de columnas: de cada registro solo se
+separan las columnas que se piden y el resto queda como la línea original hasta que se usa
+"""
+
+import csv
+import io
+import itertools
+import mmap
+import operator
+
+import compressed_io
+
+# Bytes por ventana: cada ventana termina en un salto de línea y se separa en líneas de una vez
+WINDOW_SIZE = 1 << 20
+
+# Marca de columna todavía no separada del registro
+_FALTA = object()
+
+def _windows(leer, tamano=WINDOW_SIZE):
+    """
+    Ventanas de bytes que terminan justo después de un salto de línea (salvo la
+    última), con los saltos de línea traducidos como en modo texto (\\r\\n y \\r → \\n)
+    """
+    resto = b''
+    while True:
+        bloque = leer(tamano)
+        if not bloque:
+            if resto:
+                yield resto.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            return
+        if resto:
+            bloque = resto + bloque
+        # Lo que sigue al último \n (incluido un \r que puede ser la mitad de un \r\n) pasa al próximo bloque
+        corte = bloque.rfind(b'\n') + 1
+        resto = bloque[corte:]
+        if corte:
+            ventana = bloque[:corte]
+            if b'\r' in ventana:
+                ventana = ventana.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            yield ventana
+
+def _lines(texto):
+    """Líneas de una ventana, cada una con su \\n (solo \\n separa líneas, como en csv)"""
+    return io.StringIO(texto).readlines()
+
+def _records(ventanas):
+    """
+    Genera los registros de un CSV: el texto de cada línea de una ventana sin
+    comillas (que se separa por comas sin más) y la lista de campos de
+    csv.reader en las ventanas con comillas, donde un campo puede tener comas y
+    saltos de línea. Mismo resultado que csv.reader sobre el archivo en modo texto.
+    """
+    pendientes = []
+    cargadas = 0  # líneas entregadas al csv.reader
+
+    def entrada():
+        # Las ventanas con comillas que elige el ciclo principal y, si un campo
+        # entre comillas sigue abierto al final de una, las que siguen
+        nonlocal cargadas
+        while True:
+            if pendientes:
+                yield pendientes.pop()
+                continue
+            ventana = next(ventanas, None)
+            if ventana is None:
+                return
+            lineas = _lines(str(ventana, 'utf-8'))
+            cargadas += len(lineas)
+            yield lineas
+
+    # Un solo csv.reader para todo el archivo; line_num dice cuándo terminó la ventana
+    lector = csv.reader(itertools.chain.from_iterable(entrada()))
+    for ventana in ventanas:
+        # Una sola decodificación por ventana
+        texto = str(ventana, 'utf-8')
+        if '"' not in texto:
+            lineas = texto.split('\n')
+            # La ventana termina en salto de línea salvo al final del archivo
+            if not lineas[-1]:
+                lineas.pop()
+            yield from lineas
+            continue
+        lineas = _lines(texto)
+        cargadas += len(lineas)
+        pendientes.append(lineas)
+        for registro in lector:
+            yield registro
+            if lector.line_num >= cargadas:
+                break
+
+def _split_line(linea):
+    """Campos de una línea sin comillas (como csv.reader: una línea vacía no tiene campos)"""
+    return linea.split(',') if linea else []
+
+def _getter(posiciones):
+    """Como operator.itemgetter(*posiciones), pero siempre devuelve una tupla"""
+    if len(posiciones) == 1:
+        posicion, = posiciones
+        return lambda campos: (campos[posicion],)
+    if not posiciones:
+        return lambda campos: ()
+    return operator.itemgetter(*posiciones)
+
+class LazyRecord:
+    """
+    Registro de read_records con la interfaz de lectura de un dict, como las filas
+    de csv.DictReader (columnas que faltan en filas cortas = None). 'campos' es un
+    dict con las columnas ya separadas: al principio, las proyectadas; la
+    primera vez que se pide otra se separa el registro completo.
+    """
+
+    __slots__ = ('campos', '_crudo', '_fieldnames')
+
+    def __init__(self, campos, crudo, fieldnames):
+        self.campos = campos
+        self._crudo = crudo
+        self._fieldnames = fieldnames
+
+    def _completar(self):
+        crudo = self._crudo
+        if crudo is None:
+            return
+        if type(crudo) is str:
+            crudo = _split_line(crudo)
+        # Con nombres repetidos gana la última columna, igual que en DictReader
+        self.campos.update(itertools.zip_longest(self._fieldnames, crudo[:len(self._fieldnames)]))
+        self._crudo = None
+
+    def __getitem__(self, campo):
+        valor = self.campos.get(campo, _FALTA)
+        if valor is _FALTA:
+            self._completar()
+            valor = self.campos[campo]
+        return valor
+
+    def get(self, campo, default=None):
+        valor = self.campos.get(campo, _FALTA)
+        if valor is _FALTA:
+            self._completar()
+            valor = self.campos.get(campo, default)
+        return valor
+
+    def __contains__(self, campo):
+        return campo in self.campos or campo in self._fieldnames
+
+class _Source:
+    """Ventanas de un archivo: sobre mmap si no está comprimido; si no, descomprimido en secuencia"""
+
+    def __init__(self, path, start=0, end=None):
+        self._archivo = None
+        self._mapa = None
+        if compressed_io.input_compression(path) is not None:
+            if start or end is not None:
+                raise ValueError("un archivo comprimido solo se lee completo")
+            self._archivo = compressed_io.open_binary_input(path)
+            return
+        with open(path, 'rb') as f:
+            tamano = f.seek(0, io.SEEK_END)
+            if tamano:
+                self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mapa.seek(min(start, tamano))
+        self._restantes = max((tamano if end is None else min(end, tamano)) - start, 0)
+
+    def _leer_mapa(self, n):
+        n = min(n, self._restantes)
+        self._restantes -= n
+        return self._mapa.read(n)
+
+    def windows(self):
+        if self._archivo is not None:
+            return _windows(self._archivo.read)
+        if self._mapa is None:
+            return iter(())
+        return _windows(self._leer_mapa)
+
+    def close(self):
+        if self._archivo is not None:
+            self._archivo.close()
+        if self._mapa is not None:
+            self._mapa.close()
+
+def read_records(path, columnas, fieldnames=None, start=0, end=None):
+    """
+    Como csv.DictReader(open(path)): genera un LazyRecord por registro, sin las
+    líneas vacías, con las columnas de 'columnas' ya separadas. Si no se
+    indica fieldnames, el primer registro es el header.
+    """
+    fuente = _Source(path, start, end)
+    try:
+        registros = _records(fuente.windows())
+        if fieldnames is None:
+            header = next(registros, [])
+            fieldnames = _split_line(header) if type(header) is str else header
+        fieldnames = list(fieldnames)
+        posiciones = {nombre: i for i, nombre in enumerate(fieldnames)}
+        proyeccion = sorted((posiciones[nombre], nombre) for nombre in set(columnas) if nombre in posiciones)
+        nombres = tuple(nombre for _, nombre in proyeccion)
+        extraer = _getter([i for i, _ in proyeccion])
+        maximo = proyeccion[-1][0] + 1 if proyeccion else 0
+        for registro in registros:
+            if not registro:
+                continue
+            campos = registro.split(',', maximo) if type(registro) is str else registro
+            if len(campos) >= maximo:
+                yield LazyRecord(dict(zip(nombres, extraer(campos))), registro, fieldnames)
+            else:
+                # Fila corta: las columnas que faltan quedan en None, como en DictReader
+                largo = len(campos)
+                yield LazyRecord({nombre: campos[i] if i < largo else None for i, nombre in proyeccion},
+                                 registro, fieldnames)
+    finally:
+        fuente.close()
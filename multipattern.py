@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de múltiples patrones (Aho-Corasick) para los alias de estados y ciudades
+"""
+
+from collections import deque
+
+class AhoCorasick:
+    """
+    Autómata de Aho-Corasick. Cada patrón lleva asociado un valor; search()
+    devuelve la unión de los valores de todos los patrones contenidos en un
+    texto recorriéndolo una sola vez, sin importar cuántos patrones haya.
+    """
+
+    def __init__(self):
+        self._goto = [{}]     # nodo → {carácter: nodo siguiente}
+        self._fail = [0]      # nodo → nodo del sufijo propio más largo en el trie
+        self._out = [set()]   # nodo → valores de los patrones que terminan aquí
+        self._compiled = False
+
+    def add(self, patron, valor):
+        """Agrega un patrón al trie (invalida la compilación anterior)"""
+        if self._compiled:
+            self._out = [set(valores) for valores in self._out]
+            self._compiled = False
+        nodo = 0
+        for c in patron:
+            siguiente = self._goto[nodo].get(c)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+                self._goto[nodo][c] = siguiente
+            nodo = siguiente
+        self._out[nodo].add(valor)
+
+    def compile(self):
+        """Calcula los enlaces de fallo (BFS) y propaga las salidas por ellos"""
+        cola = deque()
+        for hijo in self._goto[0].values():
+            self._fail[hijo] = 0
+            cola.append(hijo)
+        while cola:
+            nodo = cola.popleft()
+            for c, hijo in self._goto[nodo].items():
+                fallo = self._fail[nodo]
+                while fallo and c not in self._goto[fallo]:
+                    fallo = self._fail[fallo]
+                self._fail[hijo] = self._goto[fallo].get(c, 0)
+                self._out[hijo] |= self._out[self._fail[hijo]]
+                cola.append(hijo)
+        self._out = [frozenset(valores) for valores in self._out]
+        self._compiled = True
+
+    def search(self, texto):
+        """Unión de los valores de todos los patrones que aparecen en texto"""
+        if not self._compiled:
+            self.compile()
+        goto, fail, out = self._goto, self._fail, self._out
+        encontrados = set(out[0])  # patrón vacío: está contenido en cualquier texto
+        nodo = 0
+        for c in texto:
+            while nodo and c not in goto[nodo]:
+                nodo = fail[nodo]
+            nodo = goto[nodo].get(c, 0)
+            if out[nodo]:
+                encontrados |= out[nodo]
+        return encontrados
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché LRU acotada y compartida para las funciones de normalización de texto
+"""
+
+import functools
+import sys
+
+# Tamaño por defecto de cada caché (entradas distintas)
+DEFAULT_MAXSIZE = 65536
+
+# Todas las cachés registradas, por nombre, para configurarlas y reportarlas juntas
+_CACHES = {}
+
+# Hits/misses reportados por procesos worker, por nombre de caché
+_WORKER_STATS = {}
+
+class NormalizationCache:
+    """
+    Caché LRU (functools.lru_cache) de una función de normalización.
+    Los resultados de texto se internan para que las filas con la misma ciudad,
+    estado o país compartan una sola cadena canónica.
+
+    La función cacheada reemplaza al nombre original en el módulo donde se
+    definió, así configure() puede cambiar el tamaño sin tocar a los llamadores.
+    """
+
+    def __init__(self, funcion, maxsize=DEFAULT_MAXSIZE):
+        self.funcion = funcion
+        self.maxsize = maxsize
+        self.lru = None
+        self.resize(maxsize)
+
+    def _normalizar(self, *args):
+        valor = self.funcion(*args)
+        if isinstance(valor, str):
+            valor = sys.intern(valor)
+        return valor
+
+    def resize(self, maxsize):
+        """Reconstruye la caché con otro tamaño máximo (se pierden las entradas)"""
+        self.maxsize = maxsize
+        self.lru = functools.update_wrapper(functools.lru_cache(maxsize=maxsize)(self._normalizar),
+                                            self.funcion)
+        self.funcion.__globals__[self.funcion.__name__] = self.lru
+        return self.lru
+
+    def stats(self):
+        """Devuelve hits, misses, tamaño y tasa de aciertos"""
+        info = self.lru.cache_info()
+        consultas = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': self.maxsize,
+            'hit_rate': info.hits / consultas if consultas else 0.0,
+        }
+
+def cached(nombre, maxsize=DEFAULT_MAXSIZE):
+    """Decorador: registra la función en la caché compartida con el nombre dado"""
+    def decorador(funcion):
+        cache = NormalizationCache(funcion, maxsize)
+        _CACHES[nombre] = cache
+        return cache.lru
+    return decorador
+
+def configure(maxsize):
+    """Aplica el mismo tamaño máximo a todas las cachés registradas"""
+    for cache in _CACHES.values():
+        cache.resize(maxsize)
+
+def clear():
+    """Vacía todas las cachés registradas y reinicia sus contadores"""
+    for cache in _CACHES.values():
+        cache.lru.cache_clear()
+
+def stats():
+    """Estadísticas de todas las cachés registradas, por nombre (incluye workers)"""
+    resultado = {}
+    for nombre, cache in _CACHES.items():
+        datos = cache.stats()
+        externos = _WORKER_STATS.get(nombre)
+        if externos:
+            datos['hits'] += externos['hits']
+            datos['misses'] += externos['misses']
+            consultas = datos['hits'] + datos['misses']
+            datos['hit_rate'] = datos['hits'] / consultas if consultas else 0.0
+        resultado[nombre] = datos
+    return resultado
+
+def stats_since(anteriores):
+    """Hits/misses acumulados desde una llamada anterior a stats() (lado worker)"""
+    return {
+        nombre: {
+            'hits': datos['hits'] - anteriores.get(nombre, {}).get('hits', 0),
+            'misses': datos['misses'] - anteriores.get(nombre, {}).get('misses', 0),
+        }
+        for nombre, datos in stats().items()
+    }
+
+def add_worker_stats(parciales):
+    """Suma los hits/misses que devolvió un worker a las estadísticas de este proceso"""
+    for nombre, datos in parciales.items():
+        acumulado = _WORKER_STATS.setdefault(nombre, {'hits': 0, 'misses': 0})
+        acumulado['hits'] += datos['hits']
+        acumulado['misses'] += datos['misses']
+
+def print_stats():
+    """Imprime hits/misses de todas las cachés registradas"""
+    print("\nCaché de normalización:")
+    for nombre, datos in stats().items():
+        print(f"  {nombre}: {datos['hits']} hits, {datos['misses']} misses "
+              f"({datos['hit_rate']:.1%}), {datos['size']}/{datos['maxsize']} entradas")
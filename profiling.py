@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tiempos por etapa y contadores de una corrida (opción --profile)
+"""
+
+import contextlib
+import cProfile
+import json
+import pstats
+import time
+from collections import Counter
+
+import normalization_cache
+
+class Profiler:
+    """
+    Acumula el tiempo de pared exclusivo de cada etapa: si una etapa empieza
+    dentro de otra, el reloj de la exterior se pausa hasta que termina la
+    interior. Así iterate() puede medir, por ejemplo, el parseo del CSV que
+    ocurre dentro del bucle de coincidencias sin contarlo dos veces.
+
+    Si se indica cprofile_path, cProfile solo está activo dentro de las
+    etapas de hot_stages y el resultado se guarda con dump(). En un worker,
+    take() entrega además las estadísticas de cProfile y merge() las suma a
+    las del proceso principal.
+    """
+
+    def __init__(self, cprofile_path=None, hot_stages=('match',)):
+        self.inicio = time.perf_counter()
+        self.segundos = Counter()
+        self.llamadas = Counter()
+        self.contadores = {}
+        self.segundos_workers = Counter()  # tiempo por etapa sumado entre los procesos worker
+        self._pila = []  # [nombre, inicio del tramo actual]
+        self.cprofile_path = cprofile_path
+        self.hot_stages = frozenset(hot_stages)
+        self._cprofile = cProfile.Profile() if cprofile_path else None
+        self._cprofile_activo = False
+        self._cprofile_workers = []  # estadísticas de cProfile recibidas de los workers
+
+    def _cprofile_para(self, nombre):
+        """Activa o desactiva cProfile según la etapa que queda corriendo"""
+        if self._cprofile is None:
+            return
+        activar = nombre in self.hot_stages
+        if activar and not self._cprofile_activo:
+            self._cprofile.enable()
+        elif not activar and self._cprofile_activo:
+            self._cprofile.disable()
+        self._cprofile_activo = activar
+
+    def enter(self, nombre):
+        ahora = time.perf_counter()
+        if self._pila:
+            exterior = self._pila[-1]
+            self.segundos[exterior[0]] += ahora - exterior[1]
+        self._pila.append([nombre, ahora])
+        self.llamadas[nombre] += 1
+        self._cprofile_para(nombre)
+
+    def exit(self):
+        ahora = time.perf_counter()
+        nombre, desde = self._pila.pop()
+        self.segundos[nombre] += ahora - desde
+        if self._pila:
+            self._pila[-1][1] = ahora
+        self._cprofile_para(self._pila[-1][0] if self._pila else None)
+
+    @contextlib.contextmanager
+    def stage(self, nombre):
+        self.enter(nombre)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def iterate(self, nombre, iterable):
+        """Recorre iterable contando como etapa 'nombre' solo el tiempo de producir cada elemento"""
+        iterador = iter(iterable)
+        while True:
+            self.enter(nombre)
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield elemento
+
+    def count(self, nombre, n=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def set(self, nombre, valor):
+        self.contadores[nombre] = valor
+
+    def get(self, nombre):
+        return self.contadores.get(nombre, 0)
+
+    def take(self):
+        """Tiempos por etapa y contadores acumulados, reiniciándolos (lado worker)"""
+        parcial = {'stages': dict(self.segundos), 'counters': self.contadores}
+        if self._cprofile is not None:
+            # take() se llama fuera de toda etapa: cProfile no está activo
+            self._cprofile.create_stats()
+            parcial['cprofile'] = self._cprofile.stats
+            self._cprofile = cProfile.Profile()
+        self.segundos.clear()
+        self.llamadas.clear()
+        self.contadores = {}
+        return parcial
+
+    def merge(self, parcial):
+        """Suma lo que devolvió take() en un worker"""
+        for nombre, segundos in parcial['stages'].items():
+            self.segundos_workers[nombre] += segundos
+        for nombre, n in parcial['counters'].items():
+            self.count(nombre, n)
+        if parcial.get('cprofile') and self._cprofile is not None:
+            self._cprofile_workers.append(parcial['cprofile'])
+
+    def report(self):
+        total = time.perf_counter() - self.inicio
+        reporte = {
+            'total_seconds': round(total, 6),
+            'stages': {
+                nombre: {'seconds': round(segundos, 6), 'calls': self.llamadas[nombre],
+                         'share': round(segundos / total, 4) if total else 0.0}
+                for nombre, segundos in sorted(self.segundos.items(), key=lambda x: -x[1])
+            },
+            'counters': self.contadores,
+            'normalization_cache': normalization_cache.stats(),
+        }
+        if self.segundos_workers:
+            reporte['worker_stages'] = {nombre: {'seconds': round(segundos, 6)}
+                                        for nombre, segundos in self.segundos_workers.most_common()}
+        return reporte
+
+    def dump(self):
+        if self._cprofile is None:
+            return
+        self._cprofile.create_stats()
+        # pstats.Stats no acepta perfiles vacíos (p. ej. el del proceso principal con --workers)
+        perfiles = [perfil for perfil in [self._cprofile] + [_WorkerStats(stats) for stats in self._cprofile_workers]
+                    if perfil.stats]
+        if len(perfiles) > 1 or self._cprofile_workers:
+            pstats.Stats(*perfiles).dump_stats(self.cprofile_path)
+        else:
+            self._cprofile.dump_stats(self.cprofile_path)
+
+class _WorkerStats:
+    """Estadísticas de cProfile de un worker con la interfaz que pstats.Stats.add() espera de un perfil"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+# Perfil activo de la corrida; None = sin instrumentación
+_PROFILER = None
+
+def enable(cprofile_path=None, hot_stages=('match',)):
+    """Activa la instrumentación para el resto de la corrida"""
+    global _PROFILER
+    _PROFILER = Profiler(cprofile_path, hot_stages)
+    return _PROFILER
+
+def disable():
+    global _PROFILER
+    _PROFILER = None
+
+def enabled():
+    return _PROFILER is not None
+
+@contextlib.contextmanager
+def suspended():
+    """Desactiva la instrumentación dentro del bloque (p. ej. una corrida de verificación)"""
+    global _PROFILER
+    anterior, _PROFILER = _PROFILER, None
+    try:
+        yield
+    finally:
+        _PROFILER = anterior
+
+def stage(nombre):
+    """Context manager de una etapa (no hace nada sin --profile)"""
+    if _PROFILER is None:
+        return contextlib.nullcontext()
+    return _PROFILER.stage(nombre)
+
+def iterate(nombre, iterable):
+    """Ver Profiler.iterate; sin --profile devuelve el iterable tal cual"""
+    if _PROFILER is None:
+        return iterable
+    return _PROFILER.iterate(nombre, iterable)
+
+def count(nombre, n=1):
+    if _PROFILER is not None:
+        _PROFILER.count(nombre, n)
+
+def set_counter(nombre, valor):
+    if _PROFILER is not None:
+        _PROFILER.set(nombre, valor)
+
+def get_counter(nombre):
+    return _PROFILER.get(nombre) if _PROFILER is not None else 0
+
+def take():
+    """(worker) Tiempos y contadores desde la llamada anterior, o None sin --profile"""
+    if _PROFILER is None:
+        return None
+    return _PROFILER.take()
+
+def merge(parcial):
+    """Suma al perfil de este proceso lo que devolvió take() en un worker"""
+    if _PROFILER is not None and parcial:
+        _PROFILER.merge(parcial)
+
+def write_report(path, **meta):
+    """Escribe el reporte JSON (y el volcado de cProfile, si se pidió)"""
+    if _PROFILER is None:
+        return
+    reporte = dict(meta, **_PROFILER.report())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    _PROFILER.dump()
+    print(f"\nPerfil guardado en {path}")
+    if _PROFILER.cprofile_path:
+        print(f"Volcado de cProfile guardado en {_PROFILER.cprofile_path}")
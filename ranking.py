@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Puntaje de coincidencias por papel en la ruta y heap acotado de las K mejores por ruta
+"""
+
+import heapq
+from collections import defaultdict
+
+# Puntos por papel: coincidir por ciudad (<ROL> + <ROL>_CIUDAD) vale más que solo
+# por estado (<ROL>); estar en una ciudad de cruce es CRUCE + CRUCE_CIUDAD
+ROLE_POINTS = {
+    'ORIGEN': 2, 'ORIGEN_CIUDAD': 2,
+    'DESTINO': 2, 'DESTINO_CIUDAD': 2,
+    'CRUCE': 1, 'CRUCE_CIUDAD': 2,
+}
+# Bono por coincidir a la vez con origen y destino: supera a la mejor coincidencia de un solo lado
+BOTH_SIDES_BONUS = 5
+
+def match_score(roles):
+    """Puntaje de una coincidencia a partir de sus papeles ('ORIGEN', 'ORIGEN_CIUDAD', ...)"""
+    roles = set(roles)
+    puntaje = sum(ROLE_POINTS.get(rol, 0) for rol in roles)
+    if 'ORIGEN' in roles and 'DESTINO' in roles:
+        puntaje += BOTH_SIDES_BONUS
+    return puntaje
+
+class _Reversed:
+    """Invierte la comparación de un valor (en el heap, el peor elemento queda arriba)"""
+
+    __slots__ = ('valor',)
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def __lt__(self, otro):
+        return otro.valor < self.valor
+
+    def __eq__(self, otro):
+        return self.valor == otro.valor
+
+class TopK:
+    """
+    Las k entradas de mayor puntaje por grupo (ruta), en un min-heap acotado por
+    grupo: add() cuesta O(log k) y la memoria es O(grupos × k), sin importar
+    cuántas entradas se agreguen. Entre puntajes iguales gana el menor 'orden'
+    (que debe ser único, p. ej. (nombre, posición en el archivo)). Con 'clave',
+    cada clave ocupa un solo lugar por grupo: el de su mejor entrada.
+
+    Cuando una clave mejora su entrada, la anterior queda en el heap como
+    obsoleta (borrado perezoso): se descarta al llegar a la cima y el heap se
+    compacta cuando las obsoletas igualan a las vigentes.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heaps = defaultdict(list)
+        self._claves = defaultdict(dict)  # grupo → {clave: su entrada vigente en el heap}
+        self._vigentes = defaultdict(int)  # grupo → entradas vigentes en el heap
+
+    def add(self, grupo, puntaje, orden, item, clave=None):
+        heap = self._heaps[grupo]
+        claves = self._claves[grupo]
+        entrada = (puntaje, _Reversed(orden), item, clave)
+        if clave is not None and clave in claves:
+            # La clave ya tiene lugar: solo se reemplaza por una entrada mejor
+            if entrada[:2] > claves[clave][:2]:
+                claves[clave] = entrada
+                heapq.heappush(heap, entrada)
+                if len(heap) > 2 * max(self._vigentes[grupo], 1):
+                    heap[:] = [e for e in heap if _vigente(claves, e)]
+                    heapq.heapify(heap)
+            return
+        while heap and not _vigente(claves, heap[0]):
+            heapq.heappop(heap)
+        if self._vigentes[grupo] < self.k:
+            heapq.heappush(heap, entrada)
+            self._vigentes[grupo] += 1
+        elif entrada[:2] > heap[0][:2]:
+            saliente = heapq.heapreplace(heap, entrada)
+            if saliente[3] is not None:
+                del claves[saliente[3]]
+        else:
+            return
+        if clave is not None:
+            claves[clave] = entrada
+
+    def groups(self):
+        return sorted(self._heaps)
+
+    def items(self, grupo):
+        """[(puntaje, item)] de un grupo, de mayor a menor puntaje y luego por orden"""
+        claves = self._claves.get(grupo, {})
+        mejores = sorted((entrada for entrada in self._heaps.get(grupo, ()) if _vigente(claves, entrada)),
+                         key=lambda entrada: entrada[:2], reverse=True)
+        return [(puntaje, item) for puntaje, _, item, _ in mejores]
+
+def _vigente(claves, entrada):
+    """Si una entrada del heap sigue vigente (no la reemplazó una mejor de su clave)"""
+    return entrada[3] is None or claves.get(entrada[3]) is entrada
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén de carriers en un archivo SQLite indexado (para archivos que no caben en memoria)
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from urllib.parse import quote as url_quote
+
+from carrier_store import fingerprint_matches
+
+SQLITE_VERSION = 1
+
+# Filas por executemany al cargar la tabla
+DEFAULT_BATCH_SIZE = 10000
+
+def quote(nombre):
+    """Identificador SQL entre comillas (las columnas de Carriers.csv tienen espacios y #)"""
+    return '"' + nombre.replace('"', '""') + '"'
+
+def build_sqlite(path, filas, columnas, indices, huella, reglas, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Crea en 'path' (de forma atómica) la tabla carriers(pos, *columnas) con las
+    filas en orden del archivo, insertadas por lotes de batch_size. Los índices
+    (tuplas de columnas) se crean al final, que es más rápido que mantenerlos
+    durante la carga. Las columnas no tienen tipo: los valores se guardan tal
+    cual (texto o NULL). Devuelve el número de filas.
+    """
+    directorio = os.path.dirname(os.path.abspath(path))
+    fd, temporal = tempfile.mkstemp(prefix='.carriers-sqlite-', dir=directorio)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(temporal)
+        try:
+            # Base temporal: si algo falla se descarta, así que no hace falta journal
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f"CREATE TABLE carriers (pos INTEGER PRIMARY KEY, {', '.join(map(quote, columnas))})")
+            conn.execute('CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)')
+
+            insertar = f"INSERT INTO carriers VALUES (?{', ?' * len(columnas)})"
+            lote = []
+            total = 0
+            for valores in filas:
+                lote.append((total, *valores))
+                total += 1
+                if len(lote) >= batch_size:
+                    conn.executemany(insertar, lote)
+                    lote.clear()
+            if lote:
+                conn.executemany(insertar, lote)
+
+            for n, indice in enumerate(indices):
+                conn.execute(f"CREATE INDEX idx_carriers_{n} ON carriers ({', '.join(map(quote, indice))})")
+            conn.execute('ANALYZE')
+            conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('version', str(SQLITE_VERSION)),
+                ('source', json.dumps(huella)),
+                ('rules', reglas),
+                ('columns', json.dumps(list(columnas))),
+                ('rows', str(total)),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(temporal, path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+    return total
+
+def open_sqlite(path, source_path, columnas, reglas):
+    """
+    Abre en solo lectura una base creada con build_sqlite. Devuelve
+    (conexión, filas), o None si no existe, está dañada, tiene otras columnas o
+    reglas de normalización, o su archivo fuente cambió desde que se cargó.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{url_quote(os.path.abspath(path))}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        meta = dict(conn.execute('SELECT clave, valor FROM meta'))
+        valida = (meta.get('version') == str(SQLITE_VERSION)
+                  and meta.get('rules') == reglas
+                  and json.loads(meta.get('columns', 'null')) == list(columnas)
+                  and fingerprint_matches(json.loads(meta['source']), source_path))
+    except (sqlite3.Error, KeyError, ValueError):
+        valida = False
+    if not valida:
+        conn.close()
+        return None
+    return conn, int(meta['rows'])
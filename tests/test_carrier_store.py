@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché binaria de carrier_store.py: columnas y codificaciones guardadas
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carrier_store import CarrierStore, file_fingerprint, load_store, save_store
+
+COLUMNAS = ('BAN', 'CITY', 'EMAIL')
+
+class CarrierStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.fuente = os.path.join(directorio.name, 'Carriers.csv')
+        self.cache = self.fuente + '.store'
+        with open(self.fuente, 'w', encoding='utf-8') as f:
+            f.write('BAN,CITY,EMAIL\n1,Laredo,a@x.com\n')
+        store = CarrierStore(COLUMNAS, encoded=('CITY',))
+        store.append(('1', 'Laredo', 'a@x.com'))
+        store.append(('2', 'Laredo', None))
+        save_store(store, self.cache, file_fingerprint(self.fuente))
+
+    def test_same_columns_load(self):
+        store = load_store(self.cache, self.fuente, COLUMNAS, ('CITY',))
+        self.assertEqual([store.values(i) for i in range(len(store))],
+                         [('1', 'Laredo', 'a@x.com'), ('2', 'Laredo', None)])
+
+    def test_other_columns_or_encoding_rejected(self):
+        self.assertIsNone(load_store(self.cache, self.fuente, COLUMNAS + ('PHONE #',), ('CITY',)))
+        self.assertIsNone(load_store(self.cache, self.fuente, ('CITY', 'BAN', 'EMAIL'), ('CITY',)))
+        self.assertIsNone(load_store(self.cache, self.fuente, COLUMNAS, ('CITY', 'EMAIL')))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consultas de lane_index.py: carriers únicos en orden de carriers_12_rutas.csv
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_carriers_routes
+from lane_index import LaneIndex
+
+LANE = {'origen': {'ciudad': 'Laredo', 'estado': 'Texas', 'pais': 'United States'}}
+
+class LaneIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        store = analyze_carriers_routes.new_store()
+        for ban, nombre, email, ciudad, estado in [
+                ('2', 'B Trans', 'b@x.com', 'Austin', 'TX'),
+                ('1', 'A Trans', 'a1@x.com', 'Laredo', 'TX'),
+                ('3', 'C Trans', 'c@x.com', 'Laredo', 'Tamaulipas'),
+                ('1', 'A Trans', 'a2@x.com', 'Laredo', 'Texas'),
+                ('4', 'D Trans', 'd@x.com', 'Dallas', 'California')]:
+            store.append((ban, nombre, ciudad, estado, 'United States', email, '555', 'Manual'))
+        self.index = LaneIndex(store)
+
+    def test_query_merges_locations_in_name_order(self):
+        respuesta = self.index.query(LANE)
+        self.assertEqual((respuesta['total'], respuesta['registros']), (3, 4))
+        self.assertEqual([c['CARRIER'] for c in respuesta['carriers']], ['A Trans', 'B Trans', 'C Trans'])
+        self.assertEqual(respuesta['carriers'][0]['EMAILS'], ['a1@x.com', 'a2@x.com'])
+        self.assertEqual(respuesta['carriers'][0]['REGISTROS'], 2)
+
+    def test_query_limit(self):
+        respuesta = self.index.query(LANE, limit=2)
+        self.assertEqual(respuesta['total'], 3)
+        self.assertEqual([c['CARRIER'] for c in respuesta['carriers']], ['A Trans', 'B Trans'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lazy_csv.read_records contra csv.DictReader con campos entre comillas que
+cruzan ventanas (comas, comillas dobles y saltos de línea dentro del campo)
+"""
+
+import csv
+import gzip
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lazy_csv
+
+HEADER = 'BAN,COMPANY TYPE,COMPANY NAME,EMAIL,ADDRESS,CITY,STATE,COUNTRY'
+COLUMNAS = ('COMPANY TYPE', 'CITY', 'STATE', 'COUNTRY')
+
+# Tamaños de ventana menores que un registro, que cortan los campos entre comillas
+VENTANAS = (1, 2, 7, 64, 4096)
+
+def campo(aleatorio):
+    return aleatorio.choice([
+        'CARRIER', 'Laredo', 'Nuevo León', '', 'x y',
+        '"a,b"', '"dijo ""hola"""', '"línea 1\nlínea 2"', '"línea 1\r\nlínea 2"', '"\n"', '"x\ry"',
+        '12" llantas', 'a"b',
+    ])
+
+def texto_csv(semilla, salto):
+    """CSV con filas cortas, largas y vacías, y campos con comillas de varias líneas"""
+    aleatorio = random.Random(semilla)
+    lineas = [HEADER]
+    for _ in range(300):
+        columnas = aleatorio.choice([8] * 6 + [0, 3, 10])
+        lineas.append(','.join(campo(aleatorio) for _ in range(columnas)))
+    return salto.join(lineas) + aleatorio.choice(['', salto])
+
+class LazyCsvTest(unittest.TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def write(self, nombre, texto, comprimir=False):
+        path = os.path.join(self.directorio, nombre)
+        with (gzip.open if comprimir else open)(path, 'wb') as f:
+            f.write(texto.encode('utf-8'))
+        return path
+
+    def assertSameRecords(self, path, texto):
+        with open(os.path.join(self.directorio, 'referencia.csv'), 'w', encoding='utf-8', newline='') as f:
+            f.write(texto)
+        # Modo texto: los saltos de línea se traducen, como al leer Carriers.csv con open()
+        with open(f.name, encoding='utf-8') as f:
+            esperados = list(csv.DictReader(f))
+        for ventana in VENTANAS:
+            with self.subTest(path=os.path.basename(path), ventana=ventana), \
+                    mock.patch.object(lazy_csv._windows, '__defaults__', (ventana,)):
+                registros = list(lazy_csv.read_records(path, COLUMNAS))
+                self.assertEqual(len(registros), len(esperados))
+                for registro, esperado in zip(registros, esperados):
+                    for nombre in HEADER.split(','):
+                        self.assertEqual(registro.get(nombre), esperado[nombre])
+                        self.assertEqual(registro[nombre], esperado[nombre])
+                    self.assertIsNone(registro.get('NO EXISTE'))
+
+    def test_multiline_quoted_fields(self):
+        for semilla, salto in ((1, '\n'), (2, '\r\n'), (3, '\r')):
+            texto = texto_csv(semilla, salto)
+            self.assertSameRecords(self.write(f'carriers{semilla}.csv', texto), texto)
+
+    def test_compressed_input(self):
+        texto = texto_csv(4, '\n')
+        self.assertSameRecords(self.write('carriers.csv.gz', texto, comprimir=True), texto)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modos de analyze_carriers_routes.py: --streaming, --workers, --sqlite y la caché
+binaria deben escribir exactamente el mismo archivo que la corrida en memoria
+"""
+
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_carriers_routes
+
+HEADER = ['BAN', 'COMPANY TYPE', 'COMPANY NAME', 'CONTACT NAME', 'EMAIL', 'PHONE #', 'ADDRESS',
+          'CITY', 'STATE', 'COUNTRY', 'DATA ORIGIN']
+
+UBICACIONES = [
+    ('Laredo', 'Texas', 'United States'), ('Laredo', 'TX', 'United States'),
+    ('McAllen', 'TX', 'United States'), ('San Antonio', 'Texas', 'United States'),
+    ('Pico Rivera', 'CA', 'United States'), ('Independence', 'Missouri', 'United States'),
+    ('Monterrey', 'NL', 'Mexico'), ('San Nicolás de los Garza', 'Nuevo León', 'Mexico'),
+    ('Cuautitlán', 'Estado de México', 'Mexico'), ('Ramos Arizpe', 'Coahuila', 'Mexico'),
+    ('Brantford', 'ON', 'Canada'), ('Laredo', 'Tamaulipas', 'Mexico'),
+    ('Boise', 'Idaho', 'United States'), ('', '', ''),
+]
+
+def carriers_csv(path, filas=600, semilla=7):
+    """Carriers.csv con carriers repetidos, no carriers, comas y saltos de línea entre comillas"""
+    aleatorio = random.Random(semilla)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for n in range(filas):
+            ban = str(aleatorio.randint(1, 120))
+            ciudad, estado, pais = aleatorio.choice(UBICACIONES)
+            writer.writerow([
+                ban, aleatorio.choice(['CARRIER'] * 4 + ['BROKER']),
+                aleatorio.choice([f'Trans {ban}', f'Fletes, {ban} S.A.', f'"Ñandú" {ban}']),
+                'Juan', aleatorio.choice([f'c{ban}@x.com', f'd{n}@x.com', '']),
+                aleatorio.choice(['555-0100', '', f'555-{n:04d}']),
+                aleatorio.choice(['Calle 1', 'Calle 2\nBodega 3', '']),
+                ciudad, estado, pais, aleatorio.choice(['Manual', 'DAT', '']),
+            ])
+
+class RoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        self.entrada = os.path.join(self.directorio, 'Carriers.csv')
+        carriers_csv(self.entrada)
+
+    def run_main(self, nombre, *opciones):
+        """Bytes del archivo de salida de una corrida con 'opciones'"""
+        salida = os.path.join(self.directorio, nombre)
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze_carriers_routes.main(['--input', self.entrada, '--output', salida] + list(opciones))
+        with open(salida, 'rb') as f:
+            return f.read()
+
+    def test_modes_match_in_memory(self):
+        esperado = self.run_main('memoria.csv', '--no-store-cache')
+        self.assertGreater(esperado.count(b'\n'), 50)
+        modos = {
+            'streaming': ('--streaming', '--run-size', '37', '--tmpdir', self.directorio),
+            'workers': ('--workers', '2', '--no-store-cache'),
+            'sqlite': ('--sqlite', os.path.join(self.directorio, 'carriers.db')),
+        }
+        for modo, opciones in modos.items():
+            with self.subTest(modo=modo):
+                self.assertEqual(self.run_main(modo + '.csv', *opciones), esperado)
+
+    def test_store_cache_matches_in_memory(self):
+        esperado = self.run_main('memoria.csv', '--no-store-cache')
+        cache = os.path.join(self.directorio, 'carriers.store')
+        # Caché generada en un solo proceso y luego por los workers (con todos los carriers)
+        for generada, opciones in (('proceso', ()), ('workers', ('--workers', '2'))):
+            with self.subTest(generada=generada):
+                if os.path.exists(cache):
+                    os.unlink(cache)
+                self.assertEqual(self.run_main('guarda.csv', '--store-cache', cache, *opciones), esperado)
+                self.assertTrue(os.path.exists(cache))
+                self.assertEqual(self.run_main('carga.csv', '--store-cache', cache), esperado)
+
+if __name__ == "__main__":
+    unittest.main()
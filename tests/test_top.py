@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo --top de analyze_carriers_routes.py: ciudades de cruce y carriers únicos
+"""
+
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_carriers_routes
+from ranking import TopK, match_score
+
+HEADER = ['BAN', 'COMPANY TYPE', 'COMPANY NAME', 'CONTACT NAME', 'EMAIL', 'PHONE #', 'ADDRESS',
+          'CITY', 'STATE', 'COUNTRY', 'DATA ORIGIN']
+
+def carrier(ban, nombre, email, ciudad, estado, pais='United States'):
+    return [ban, 'CARRIER', nombre, 'Juan', email, '555-0000', 'Calle 1', ciudad, estado, pais, 'Manual']
+
+class TopTest(unittest.TestCase):
+
+    def run_top(self, filas, k):
+        """Filas del archivo de salida de --top K sobre un Carriers.csv con 'filas'"""
+        with tempfile.TemporaryDirectory() as directorio:
+            entrada = os.path.join(directorio, 'Carriers.csv')
+            salida = os.path.join(directorio, 'salida.csv')
+            with open(entrada, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(HEADER)
+                writer.writerows(filas)
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyze_carriers_routes.main(['--input', entrada, '--output', salida,
+                                              '--top', str(k), '--no-store-cache'])
+            with open(salida, newline='', encoding='utf-8') as f:
+                return list(csv.DictReader(f))
+
+    def test_crossing_city_matches_route(self):
+        # McAllen no está en el origen (CA) ni en el destino (EdoMex) de RUTA 3, pero es su ciudad de cruce
+        filas = self.run_top([carrier('1', 'Frontera', 'a@x.com', 'McAllen', 'Texas')], 5)
+        ruta_3 = [row for row in filas if row['RUTA'] == 'RUTA 3']
+        self.assertEqual(len(ruta_3), 1)
+        self.assertEqual(ruta_3[0]['UBICACION_EN_RUTA'], 'CRUCE')
+        self.assertEqual(int(ruta_3[0]['PUNTAJE']), match_score(['CRUCE', 'CRUCE_CIUDAD']))
+
+    def test_crossing_city_needs_state_and_country(self):
+        # Laredo es cruce de RUTA 3 y RUTA 4 solo en Texas, United States
+        filas = self.run_top([carrier('1', 'Laredo ON', 'a@x.com', 'Laredo', 'Ontario', 'Canada'),
+                              carrier('2', 'Laredo TAMPS', 'b@x.com', 'Laredo', 'Tamaulipas', 'Mexico'),
+                              carrier('3', 'Laredo TX', 'c@x.com', 'Laredo', 'TX')], 5)
+        cruces = {(row['RUTA'], row['CARRIER']) for row in filas if 'CRUCE' in row['UBICACION_EN_RUTA']}
+        self.assertEqual(cruces, {('RUTA 3', 'Laredo TX')})
+        ruta_4 = {row['CARRIER']: row for row in filas if row['RUTA'] == 'RUTA 4'}
+        self.assertEqual(sorted(ruta_4), ['Laredo TX'])
+        self.assertEqual(int(ruta_4['Laredo TX']['PUNTAJE']), match_score(['DESTINO', 'CRUCE', 'CRUCE_CIUDAD']))
+
+    def test_top_ranks_unique_carriers(self):
+        # Un carrier con varios emails ocupa un solo lugar del top
+        filas = [carrier('1', 'A Trans', f'a{i}@x.com', 'Pico Rivera', 'California') for i in range(5)]
+        filas += [carrier('2', 'B Trans', 'b@x.com', 'Pico Rivera', 'California'),
+                  carrier('3', 'C Trans', 'c@x.com', 'Pico Rivera', 'California')]
+        ruta_3 = [row for row in self.run_top(filas, 2) if row['RUTA'] == 'RUTA 3']
+        self.assertEqual([row['CARRIER'] for row in ruta_3], ['A Trans', 'B Trans'])
+        self.assertEqual(ruta_3[0]['EMAIL'], 'a0@x.com')
+
+    def test_topk_key_keeps_best_entry(self):
+        mejores = TopK(2)
+        mejores.add('R', 1, ('a', 1), 'a1', clave='a')
+        mejores.add('R', 3, ('a', 2), 'a2', clave='a')
+        mejores.add('R', 2, ('b', 3), 'b3', clave='b')
+        mejores.add('R', 2, ('a', 4), 'a4', clave='a')
+        mejores.add('R', 1, ('c', 5), 'c5', clave='c')
+        self.assertEqual(mejores.items('R'), [(3, 'a2'), (2, 'b3')])
+
+if __name__ == "__main__":
+    unittest.main()
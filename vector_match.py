@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor vectorizado (NumPy, opcional) para IndiceRutas sobre columnas codificadas por diccionario
+"""
+
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él solo queda el motor de Python
+    np = None
+
+# Filas por bloque de la matriz de roles (acota la memoria de los arrays temporales)
+BLOCK_ROWS = 1 << 20
+
+# Posición de cada rol en el código de coincidencia de una ruta: bit 2k = estado, 2k+1 = ciudad
+ROLE_SLOTS = {'ORIGEN': 0, 'DESTINO': 1, 'CRUCE': 2}
+
+def available():
+    return np is not None
+
+def _codes(columna):
+    """Códigos de una DictionaryColumn como array de NumPy, sin copiarlos"""
+    return np.frombuffer(columna.codes, dtype=f"u{columna.codes.itemsize}")
+
+def _role_table(valores, tabla, n_roles, normalizar, filtro=None):
+    """
+    Tabla booleana (valor distinto × rol): qué roles de la TablaAlias coinciden
+    con cada valor de la columna. La coincidencia por subcadenas se evalúa en
+    Python una sola vez por valor distinto.
+    """
+    resultado = np.zeros((len(valores), n_roles), dtype=bool)
+    for codigo, valor in enumerate(valores):
+        if not valor:
+            continue
+        texto = normalizar(valor)
+        if filtro is not None and not filtro(texto):
+            continue
+        roles = list(tabla.roles(texto))
+        if roles:
+            resultado[codigo, roles] = True
+    return resultado
+
+def _type_names(roles_ruta):
+    """Array código de coincidencia → TIPO_COINCIDENCIA de una ruta (como analizar_ubicacion)"""
+    nombres = np.empty(1 << (2 * len(ROLE_SLOTS)), dtype=object)
+    for codigo in range(1, len(nombres)):
+        tipos = []
+        for rol in roles_ruta:
+            k = ROLE_SLOTS[rol]
+            if codigo >> (2 * k) & 1:
+                tipos.append(rol)
+                if codigo >> (2 * k + 1) & 1:
+                    tipos.append(rol + '_CIUDAD')
+        nombres[codigo] = ', '.join(tipos)
+    return nombres
+
+def route_matrix(indice, estados, ciudades, normalizar):
+    """
+    Matriz carriers × rutas (uint8) con el código de coincidencia de cada fila
+    en cada ruta (0 = no coincide), y los nombres de las rutas por columna.
+    estados y ciudades son DictionaryColumn del almacén; cada rol de la ruta
+    ocupa dos bits: estado y, si el estado coincidió, ciudad.
+    """
+    rutas = list(dict.fromkeys(ruta for ruta, _ in indice.roles))
+    n_roles = len(indice.roles)
+    por_estado = _role_table(estados.values, indice.estados, n_roles, normalizar)
+    por_ciudad = _role_table(ciudades.values, indice.ciudades, n_roles, normalizar, filtro=bool)
+
+    # Columna de la ruta y bits de cada rol
+    columnas = np.array([rutas.index(ruta) for ruta, _ in indice.roles], dtype=np.intp)
+    bit_estado = np.array([1 << (2 * ROLE_SLOTS[rol]) for _, rol in indice.roles], dtype=np.uint8)
+    bit_ciudad = bit_estado << 1
+
+    codigos_estado, codigos_ciudad = _codes(estados), _codes(ciudades)
+    matriz = np.zeros((len(codigos_estado), len(rutas)), dtype=np.uint8)
+    for inicio in range(0, len(codigos_estado), BLOCK_ROWS):
+        fin = inicio + BLOCK_ROWS
+        coincide_estado = por_estado[codigos_estado[inicio:fin]]
+        # La ciudad solo cuenta en los roles cuyo estado ya coincidió
+        coincide_ciudad = por_ciudad[codigos_ciudad[inicio:fin]] & coincide_estado
+        bloque = matriz[inicio:fin]
+        for rol_id, columna in enumerate(columnas):
+            bloque[:, columna] |= (coincide_estado[:, rol_id] * bit_estado[rol_id]
+                                   | coincide_ciudad[:, rol_id] * bit_ciudad[rol_id])
+    return matriz, rutas
+
+def match_store(indice, estados, ciudades, normalizar):
+    """
+    {ruta: [(fila, tipo_coincidencia, None)]} en orden de filas: lo mismo que
+    analizar_ubicacion fila por fila, calculado sobre la matriz de roles
+    """
+    matriz, rutas = route_matrix(indice, estados, ciudades, normalizar)
+    carriers_por_ruta = {}
+    for columna, ruta in enumerate(rutas):
+        nombres = _type_names([rol for ruta_rol, rol in indice.roles if ruta_rol == ruta])
+        filas = np.flatnonzero(matriz[:, columna])
+        if len(filas):
+            tipos = nombres[matriz[filas, columna]].tolist()
+            carriers_por_ruta[ruta] = list(zip(filas.tolist(), tipos, repeat(None)))
+    return carriers_por_ruta